@@ -0,0 +1,185 @@
+"""Concurrent analysis engine for transcription text.
+
+The ChatGPT analyses run on the finished transcription (sentiment, entity
+extraction, ...) do not depend on each other, so they are submitted together
+and each result is handed back as soon as it arrives. `IncrementalAnalyzer`
+goes one step further and analyzes utterances in the background while the
+user is still talking, leaving only a cheap merge for the end of the session,
+and `map_reduce` spreads a long transcript's chunks over parallel calls.
+`stream_analyses` runs streaming analyses the same way but hands back every
+piece of text as it arrives, so the page can fill in token by token.
+"""
+import queue
+import threading
+import time
+from collections import namedtuple
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+from tracing import context_run
+
+DEFAULT_TIMEOUT = 60  # seconds allowed for a single analysis call
+
+# Shared across Streamlit reruns; the module is imported once per process.
+_executor = ThreadPoolExecutor(max_workers=8, thread_name_prefix="analysis")
+# IncrementalAnalyzer windows get their own pool: finish() itself runs as an
+# analysis on _executor, and with every worker there waiting in finish() the
+# windows it waits for could never start.
+_window_executor = ThreadPoolExecutor(max_workers=8, thread_name_prefix="analysis-window")
+
+AnalysisResult = namedtuple("AnalysisResult", ["name", "value", "error", "elapsed"])
+StreamEvent = namedtuple("StreamEvent", ["name", "delta", "done", "error", "first_token", "elapsed"])
+
+
+def _timeout_for(name, timeout):
+    """Return the timeout for one analysis from a number, a name -> seconds dict or None (the default)."""
+    if isinstance(timeout, dict):
+        return timeout.get(name, DEFAULT_TIMEOUT)
+    return DEFAULT_TIMEOUT if timeout is None else timeout
+
+
+def run_analyses(analyses, text, timeout=DEFAULT_TIMEOUT):
+    """Run every analysis on `text` at once and yield results in completion order.
+
+    `analyses` maps a name to a callable taking the text. `timeout` is either a
+    number of seconds applied to each call or a dict of per-name timeouts;
+    None, or a name missing from the dict, gets DEFAULT_TIMEOUT. Each call
+    yields an AnalysisResult; failures and timeouts are reported through its
+    `error` field instead of being raised.
+    """
+    start = time.monotonic()
+    pending = {}
+    for name, func in analyses.items():
+        future = _executor.submit(context_run(func), text)
+        pending[future] = (name, _timeout_for(name, timeout))
+
+    while pending:
+        next_deadline = start + min(limit for _, limit in pending.values())
+        done, _ = wait(pending, timeout=max(0, next_deadline - time.monotonic()),
+                       return_when=FIRST_COMPLETED)
+        now = time.monotonic()
+
+        for future in done:
+            name, _ = pending.pop(future)
+            error = future.exception()
+            value = None if error else future.result()
+            yield AnalysisResult(name, value, error, now - start)
+
+        for future, (name, limit) in list(pending.items()):
+            if now >= start + limit:
+                # The worker thread cannot be interrupted; its result is discarded.
+                future.cancel()
+                del pending[future]
+                error = TimeoutError(f"{name} timed out after {limit:g}s")
+                yield AnalysisResult(name, None, error, now - start)
+
+
+def stream_analyses(analyses, text, timeout=DEFAULT_TIMEOUT):
+    """Run streaming analyses on `text` at once and yield their pieces as they arrive.
+
+    `analyses` maps a name to a generator function taking the text and
+    yielding pieces of the response. Each piece is yielded as a StreamEvent
+    with `done` False; the last event of every analysis has `done` True and
+    carries its error (or TimeoutError), if any. `first_token` is the time
+    from the start to that analysis' first piece and `elapsed` the time to
+    this event. `timeout` is applied to the whole stream, as in run_analyses;
+    a stream that times out is closed at its next piece.
+    """
+    start = time.monotonic()
+    events = queue.Queue()
+    cancelled = {name: threading.Event() for name in analyses}
+
+    def produce(name, func):
+        stream = func(text)
+        try:
+            for delta in stream:
+                if cancelled[name].is_set():
+                    return
+                events.put((name, delta, None))
+        except Exception as e:
+            events.put((name, None, e))
+        else:
+            events.put((name, None, None))
+        finally:
+            stream.close()
+
+    deadlines = {}
+    for name, func in analyses.items():
+        _executor.submit(context_run(produce), name, func)
+        deadlines[name] = start + _timeout_for(name, timeout)
+    first_tokens = {}
+
+    while deadlines:
+        try:
+            name, delta, error = events.get(timeout=max(0, min(deadlines.values()) - time.monotonic()))
+        except queue.Empty:
+            pass
+        else:
+            now = time.monotonic()
+            if name in deadlines:
+                if delta:
+                    first_tokens.setdefault(name, now - start)
+                done = delta is None
+                if done:
+                    del deadlines[name]
+                yield StreamEvent(name, delta or "", done, error, first_tokens.get(name), now - start)
+
+        now = time.monotonic()
+        for name, deadline in list(deadlines.items()):
+            if now >= deadline:
+                cancelled[name].set()
+                del deadlines[name]
+                error = TimeoutError(f"{name} timed out after {deadline - start:g}s")
+                yield StreamEvent(name, "", True, error, first_tokens.get(name), now - start)
+
+
+class IncrementalAnalyzer:
+    """Analyze finalized utterances in the background, in windows of `window`.
+
+    `analyze` is called with the text of each window on a pool of its own, so
+    `finish` may itself run as an analysis on the shared pool; `merge`
+    combines the per-window results into one when the session ends. Windows
+    whose analysis failed are left out of the merge.
+    """
+
+    def __init__(self, analyze, merge, window=3):
+        self.analyze = analyze
+        self.merge = merge
+        self.window = window
+        self.errors = []
+        self._pending = []
+        self._futures = []
+
+    def add(self, utterance):
+        """Queue a finalized utterance; submits a window once it is full."""
+        if utterance and utterance.strip():
+            self._pending.append(utterance.strip())
+        if len(self._pending) >= self.window:
+            self._submit()
+
+    def finish(self, timeout=DEFAULT_TIMEOUT):
+        """Analyze what is left, wait for every window and return the merged result."""
+        if self._pending:
+            self._submit()
+        results = []
+        for future in self._futures:
+            try:
+                results.append(future.result(timeout=timeout))
+            except Exception as e:
+                self.errors.append(e)
+        if self._futures and not results:
+            raise self.errors[-1]
+        return self.merge(results)
+
+    def _submit(self):
+        self._futures.append(_window_executor.submit(context_run(self.analyze), " ".join(self._pending)))
+        self._pending = []
+
+
+def map_reduce(chunks, analyze, merge, concurrency=4):
+    """Analyze `chunks` in parallel and `merge` the results (in chunk order).
+
+    Uses its own short-lived pool, so it is safe to call from inside an
+    analysis already running on the shared pool.
+    """
+    with ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix="analysis-map") as pool:
+        return merge(list(pool.map(context_run(analyze), chunks)))
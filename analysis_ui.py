@@ -0,0 +1,173 @@
+"""ChatGPT analysis of a finished conversation, rendered into the Streamlit page.
+
+app.py and app_whisper.py only differ in their prompt templates.
+`PromptAnalyses` builds the cached sentiment and entity calls (and their
+streaming twins) for a pair of templates, and `render_analyses` shows the
+transcription, runs the analyses of the configured mode and fills in the
+page, followed by the cache and OpenAI statistics. `render_sidebar` adds
+the prompt audio timings and, with tracing on, the session's latencies.
+"""
+import streamlit as st
+
+from analysis import run_analyses, stream_analyses
+from llm_cache import response_cache
+from openai_client import openai_client
+from prompt_audio import prompt_metrics
+from structured_analysis import analyze_long_transcript, format_entities, format_sentiment
+from tracing import enabled, span, to_prometheus, traced
+
+# Page updates are traced like the pipeline stages (NEUROPY_TRACING=1 turns
+# tracing on; the sidebar then shows latency percentiles per stage)
+ui_write = traced("ui.write")(st.write)
+
+HEADINGS = {
+    "Sentiment Analysis": "### Sentiment Analysis",
+    "Entity Extraction": "### Extracted Entities and Emotions",
+}
+
+
+def _messages(template, text):
+    return [
+        {"role": "system", "content": "You are a helpful assistant."},
+        {"role": "user", "content": template.format(text=text)}
+    ]
+
+
+class PromptAnalyses:
+    """The free-form sentiment and entity analyses for one pair of prompt templates.
+
+    `sentiment` and `entities` return the whole answer; `stream_sentiment`
+    and `stream_entities` yield it as it is generated. A call and its
+    streaming twin share cache entries (the cache key includes the
+    template, so editing one invalidates its cached responses).
+    """
+
+    def __init__(self, sentiment_prompt, entity_prompt, sentiment_model="gpt-4",
+                 entity_model="gpt-3.5-turbo"):
+        self.sentiment = self._call(sentiment_model, sentiment_prompt, 150)
+        self.entities = self._call(entity_model, entity_prompt, 500)
+        self.stream_sentiment = self._stream(sentiment_model, sentiment_prompt, 150)
+        self.stream_entities = self._stream(entity_model, entity_prompt, 500)
+
+    @staticmethod
+    def _call(model, template, max_tokens):
+        @response_cache.cached(model, template)
+        def call(text):
+            response = openai_client.chat(model=model, messages=_messages(template, text),
+                                          max_tokens=max_tokens, temperature=0)
+            return response["choices"][0]["message"]["content"]
+        return call
+
+    @staticmethod
+    def _stream(model, template, max_tokens):
+        @response_cache.cached_stream(model, template)
+        def stream(text):
+            return openai_client.chat_stream(model=model, messages=_messages(template, text),
+                                             max_tokens=max_tokens, temperature=0)
+        return stream
+
+
+def render_streaming_analyses(transcription, prompts, timeouts):
+    """Fill the sentiment and entity sections in token by token as the answers stream."""
+    analyses = {
+        "Sentiment Analysis": prompts.stream_sentiment,
+        "Entity Extraction": prompts.stream_entities,
+    }
+    sections = {name: st.empty() for name in analyses}
+    texts = dict.fromkeys(analyses, "")
+    for event in stream_analyses(analyses, transcription, timeout=timeouts):
+        texts[event.name] += event.delta
+        section = sections[event.name]
+        if event.error:
+            section.error(f"{event.name} Error: {event.error}")
+        elif event.done:
+            with section.container():
+                ui_write(HEADINGS[event.name])
+                ui_write(texts[event.name])
+                st.caption(f"First token after {event.first_token or event.elapsed:.2f}s, "
+                           f"complete after {event.elapsed:.2f}s")
+        else:
+            with span("ui.stream_update"):
+                section.markdown(f"{HEADINGS[event.name]}\n\n{texts[event.name]} ▌")
+
+
+@traced("analysis.total")
+def render_analyses(transcription, prompts, mode="separate", streaming=True, timeouts=None, incremental=None):
+    """Show the transcription and its sentiment and entity analyses.
+
+    `mode` is "combined" (one structured call) or "separate" (the two
+    `prompts` calls, streamed if `streaming`). `incremental` is an
+    IncrementalAnalyzer that has already been fed the transcription's
+    utterances; if given, only its merged result is shown.
+    """
+    ui_write("### Transcription")
+    ui_write(transcription)
+
+    if incremental is not None:
+        # The utterances were analyzed while the user was talking; only the
+        # merge is left.
+        analyses = {"Combined Analysis": lambda _: incremental.finish()}
+    elif mode == "combined":
+        # One structured call (per chunk of a long transcript) covers both sections.
+        analyses = {"Combined Analysis": analyze_long_transcript}
+    else:
+        # Sentiment analysis and entity extraction run concurrently; each
+        # section is filled in as soon as its result arrives.
+        analyses = {
+            "Sentiment Analysis": prompts.sentiment,
+            "Entity Extraction": prompts.entities,
+        }
+    if incremental is None and mode == "separate" and streaming:
+        render_streaming_analyses(transcription, prompts, timeouts)
+    else:
+        sections = {name: st.empty() for name in analyses}
+
+        for result in run_analyses(analyses, transcription, timeout=timeouts):
+            with sections[result.name].container():
+                if result.error:
+                    st.error(f"{result.name} Error: {result.error}")
+                elif result.name == "Combined Analysis":
+                    ui_write(HEADINGS["Sentiment Analysis"])
+                    ui_write(format_sentiment(result.value))
+                    ui_write(HEADINGS["Entity Extraction"])
+                    ui_write(format_entities(result.value))
+                    with st.expander("Structured analysis (JSON)"):
+                        st.json(result.value)
+                else:
+                    ui_write(HEADINGS[result.name])
+                    ui_write(result.value)
+
+    render_api_stats()
+
+
+def render_api_stats():
+    """Captions with the analysis cache hit rate and OpenAI request latencies."""
+    cache = response_cache.stats()
+    st.caption(f"Analysis cache: {cache['memory_hits'] + cache['disk_hits']} hits, "
+               f"{cache['misses']} misses ({cache['hit_rate']:.0%} hit rate)")
+    api = openai_client.stats()
+    chat = api["latency"].get("chat") or api["latency"].get("chat_total")
+    if chat:
+        st.caption(f"OpenAI: {api['calls']} requests, {api['retries']} retried, "
+                   f"{api['failures']} failed; chat latency p50 <= {chat['p50']:g}s, "
+                   f"p95 <= {chat['p95']:g}s")
+    first_token = api["latency"].get("chat_ttft")
+    if first_token:
+        st.caption(f"Streaming: first token p50 <= {first_token['p50']:g}s, "
+                   f"p95 <= {first_token['p95']:g}s")
+
+
+def render_sidebar(tracer):
+    """Sidebar captions with the prompt audio timings and, with tracing on, `tracer`'s latencies."""
+    prompts = prompt_metrics()
+    if prompts["plays"]:
+        st.sidebar.caption(
+            f"Prompt audio: {prompts['clips_loaded']} clip(s) decoded in "
+            f"{prompts['load_seconds'] * 1000:.0f} ms · playback start avg "
+            f"{prompts['play_start_avg'] * 1000:.1f} ms / max {prompts['play_start_max'] * 1000:.1f} ms"
+        )
+    if enabled() and tracer.summary():
+        with st.sidebar.expander("Latency by stage (ms)"):
+            st.text(tracer.format_summary())
+            st.download_button("Trace (JSON)", tracer.to_json(), "trace.json", "application/json")
+            st.download_button("Prometheus metrics", to_prometheus([tracer]), "metrics.prom", "text/plain")
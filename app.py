@@ -1,67 +1,97 @@
 import os
-import sounddevice as sd
-import queue
-import json
 import streamlit as st
-from vosk import Model, KaldiRecognizer
 import openai
-import simpleaudio as sa
+import time
+import uuid
 
 from dotenv import load_dotenv
 
+from analysis import IncrementalAnalyzer
+from analysis_ui import PromptAnalyses, render_analyses, render_sidebar, ui_write
+from audio_buffer import SampleRing
+from audio_source import input_stream
+from emotion_backends import format_emotions, get_backend
+from prompt_audio import PROMPTS, preload, play as play_prompt
+from structured_analysis import analyze_long_transcript, merge_analyses
+from tracing import activate, get_tracer, span
+from vosk_engine import StreamingTranscript, new_recognizer, startup_metrics
+
 load_dotenv()
 openai.api_key = os.getenv("OPENAI_API_KEY")
 
-# Initialize Vosk Model
+# Vosk Model (loaded lazily, once per process, and shared by every session)
 model_path = "/Users/Administrator/T540_HHO/vosk-model-small-en-us-0.15"  # Replace with your actual model path
-model = Model(model_path)
-recognizer = KaldiRecognizer(model, 16000)
 
-# Queue for streaming audio
-q = queue.Queue()
+# Per-call timeouts (seconds) for the concurrent ChatGPT analyses
+ANALYSIS_TIMEOUTS = {"Sentiment Analysis": 30, "Entity Extraction": 60, "Combined Analysis": 60}
 
-def play_audio(file_path):
-    """Play a pre-recorded .wav audio file."""
-    if os.path.exists(file_path):
-        try:
-            # Load the .wav file
-            wave_obj = sa.WaveObject.from_wave_file(file_path)
-            # Play the audio
-            play_obj = wave_obj.play()
-            play_obj.wait_done()  # Wait for playback to finish
-        except Exception as e:
-            st.error(f"Error playing audio: {e}")
-    else:
-        st.error(f"Audio file not found: {file_path}")
+# "incremental": structured analysis of every ANALYSIS_WINDOW utterances while
+# the user is talking, merged at the end; "combined": one structured JSON call
+# for sentiment and entities; "separate": the sentiment and entity prompts as
+# two free-form calls
+ANALYSIS_MODE = "incremental"
+ANALYSIS_WINDOW = 3
+
+# In "separate" mode, stream both answers into the page as they are generated
+ANALYSIS_STREAMING = True
 
-def audio_callback(indata, frames, time, status):
-    """Callback to receive audio data."""
-    if status:
-        st.error(f"Stream Error: {status}")
-    # Add the audio data to the queue
-    q.put(bytes(indata))
+# Preallocated audio ring: seconds of audio it holds, samples per block
+# handed to Kaldi (0.25 s at 16 kHz), and what to do when decoding falls
+# behind ("drop_oldest", "merge" or "backpressure"; see audio_buffer.SampleRing)
+AUDIO_RING_SECONDS = 10
+AUDIO_BLOCK_SAMPLES = 4000
+AUDIO_RING_POLICY = "merge"
 
-def analyze_sentiment_with_chatgpt(text):
-    """Analyze sentiment and primary emotion."""
-    prompt = f"""
+# Saying this ends the conversation; it is matched against partial results too
+STOP_PHRASE = "that's it"
+
+# Local emotion classifier shown after every utterance (the ChatGPT analysis
+# stays the detailed one); see emotion_backends.BACKENDS
+LIVE_EMOTION_BACKEND = "lexicon"
+live_emotions = get_backend(LIVE_EMOTION_BACKEND)
+
+# Prompt clips are decoded once per process and played without blocking.
+# With LISTEN_DURING_PROMPT off, microphone audio captured while the opening
+# prompt plays is dropped so the prompt is not transcribed from the speakers.
+LISTEN_DURING_PROMPT = False
+preload(PROMPTS)
+
+def play_audio(file_path):
+    """Start playing a preloaded prompt clip; returns its play object (None on error)."""
+    try:
+        return play_prompt(file_path)
+    except FileNotFoundError:
+        st.error(f"Audio file not found: {file_path}")
+    except Exception as e:
+        st.error(f"Error playing audio: {e}")
+
+def get_session_recognizer():
+    """Return this browser session's recognizer, creating it on first use."""
+    if "recognizer" not in st.session_state:
+        start = time.perf_counter()
+        st.session_state.recognizer = new_recognizer(model_path, 16000)
+        st.session_state.session_setup_seconds = time.perf_counter() - start
+    return st.session_state.recognizer
+
+def make_audio_callback(ring):
+    """Create a callback that streams audio data into this session's ring buffer."""
+    def audio_callback(indata, frames, time, status):
+        """Callback to receive audio data."""
+        if status:
+            print(f"Stream Error: {status}")
+        # Copy the samples into the preallocated ring (no per-callback allocation)
+        ring.write(indata)
+    return audio_callback
+
+# Prompt templates (the cache key includes the template, so editing one
+# invalidates its cached responses)
+SENTIMENT_PROMPT = """
     Analyze the sentiment of the following text based on the circumplex model of emotions. Identify the primary and secondary(if any) emotion (Joy, Trust, Fear, Surprise, Sadness, Disgust, Anger, Anticipation) and its intensity (Low, Medium, High):\n\n{text}
     Example:
 
     """
-    response = openai.ChatCompletion.create(
-        model="gpt-4",
-        messages=[
-            {"role": "system", "content": "You are a helpful assistant."},
-            {"role": "user", "content": prompt}
-        ],
-        max_tokens=150,
-        temperature=0
-    )
-    return response["choices"][0]["message"]["content"]
 
-def extract_entities_with_emotions(text):
-    """Extract entities and emotions with associations."""
-    prompt = f"""
+ENTITY_PROMPT = """
     Extract the following categories of entities from the text below. For each category, list the relevant details:
 
     1. **People**: Names of people mentioned in the text.
@@ -80,61 +110,84 @@ def extract_entities_with_emotions(text):
 
     Please provide the output in a structured format.
     """
-    response = openai.ChatCompletion.create(
-        model="gpt-3.5-turbo",
-        messages=[
-            {"role": "system", "content": "You are a helpful assistant."},
-            {"role": "user", "content": prompt}
-        ],
-        max_tokens=500,
-        temperature=0
-    )
-    return response["choices"][0]["message"]["content"]
 
-def process_transcription_with_chatgpt(transcription):
-    """Process transcription text with sentiment analysis and entity extraction."""
-    st.write("### Transcription")
-    st.write(transcription)
-
-    # Sentiment Analysis
-    try:
-        sentiment = analyze_sentiment_with_chatgpt(transcription)
-        st.write("### Sentiment Analysis")
-        st.write(sentiment)
-    except Exception as e:
-        st.error(f"Sentiment Analysis Error: {e}")
+chatgpt_analyses = PromptAnalyses(SENTIMENT_PROMPT, ENTITY_PROMPT)
 
-    # Entity Extraction with Emotions
-    try:
-        entities = extract_entities_with_emotions(transcription)
-        st.write("### Extracted Entities and Emotions")
-        st.write(entities)
-    except Exception as e:
-        st.error(f"Entity Extraction Error: {e}")
+def process_transcription_with_chatgpt(transcription, incremental=None):
+    """Show the transcription with its sentiment analysis and entity extraction (see analysis_ui)."""
+    render_analyses(transcription, chatgpt_analyses, ANALYSIS_MODE, ANALYSIS_STREAMING,
+                    ANALYSIS_TIMEOUTS, incremental)
 
 def continuous_transcription():
     """Continuously transcribe audio and process with ChatGPT."""
-    play_audio("tell me about your day.wav")  # Play the opening message
+    opening = play_audio("tell me about your day.wav")  # Play the opening message while setting up
     st.info("Listening... (say 'that's it' to end)")
-    full_transcription = ""
-    with sd.InputStream(samplerate=16000, channels=1, dtype="int16", callback=audio_callback):
+    # Each session decodes with its own recognizer and audio ring buffer.
+    recognizer = get_session_recognizer()
+    recognizer.Reset()
+    ring = SampleRing(AUDIO_RING_SECONDS, 16000, AUDIO_BLOCK_SAMPLES, policy=AUDIO_RING_POLICY)
+    transcript = StreamingTranscript(recognizer, stop_phrase=STOP_PHRASE)
+    analyzer = None
+    if ANALYSIS_MODE == "incremental":
+        analyzer = IncrementalAnalyzer(analyze_long_transcript, merge_analyses, window=ANALYSIS_WINDOW)
+    live = st.empty()
+    # A replay at AUDIO_REPLAY_SPEED=0 waits for room in the ring instead of overrunning it.
+    with input_stream(samplerate=16000, channels=1, dtype="int16", callback=make_audio_callback(ring),
+                      throttle=lambda: ring.free() > AUDIO_BLOCK_SAMPLES):
         while True:
-            data = q.get()
-            if recognizer.AcceptWaveform(data):
-                result = json.loads(recognizer.Result())
-                text = result.get("text", "")
-                st.write(f"Partial Transcript: {text}")
-                full_transcription += " " + text
-
-                if "that's it" in text.lower():
-                    st.success("Stopping transcription...")
-                    play_audio("thanks for sharing.wav")  # Play the closing message
-                    break
+            with span("capture.wait"):
+                block = ring.read()
+            read_at = time.perf_counter()
+            if opening is not None and not LISTEN_DURING_PROMPT and opening.is_playing():
+                continue
+            text = transcript.accept(block)
+            if text:
+                ui_write(f"Partial Transcript: {text}")
+                st.caption(f"Live mood: {format_emotions(live_emotions.analyze(text))}")
+                if analyzer:
+                    analyzer.add(text)
+            # The live line follows the recognizer's current hypothesis.
+            live.caption(transcript.partial)
+
+            if transcript.stopped:
+                # Time from capture of the block that completed the phrase to detection
+                block_lag = max(0.0, ring.stats()["lag_last"] - len(block) / 16000)
+                stop_latency = block_lag + time.perf_counter() - read_at
+                break
+
+    if transcript.stop_source == "partial":
+        # Stopped mid-utterance: flush what the recognizer has so far.
+        text = transcript.finish()
+        ui_write(f"Partial Transcript: {text}")
+        st.caption(f"Live mood: {format_emotions(live_emotions.analyze(text))}")
+        if analyzer:
+            analyzer.add(text)
+    live.empty()
+    st.success("Stopping transcription...")
+    st.caption(f"Stop phrase detected from {transcript.stop_source} result "
+               f"{stop_latency * 1000:.0f} ms after it was captured")
+    play_audio("thanks for sharing.wav")  # Play the closing message while the analysis runs
+
+    # Overruns and lag show when decoding could not keep up with the microphone.
+    stats = ring.stats()
+    st.caption(
+        f"Audio buffer: {stats['overruns']} overruns, "
+        f"{stats['dropped_samples'] + stats['skipped_samples']} samples dropped, "
+        f"{stats['merged_reads']} merged reads, "
+        f"max depth {stats['max_depth']}/{stats['capacity']}, "
+        f"lag avg {stats['lag_avg'] * 1000:.0f} ms / max {stats['lag_max'] * 1000:.0f} ms"
+    )
 
-    process_transcription_with_chatgpt(full_transcription)
+    process_transcription_with_chatgpt(transcript.text, analyzer)
 
 # Streamlit App
 def main():
+    # Spans of this browser session go to its own tracer.
+    if "trace_session" not in st.session_state:
+        st.session_state.trace_session = uuid.uuid4().hex[:8]
+    tracer = get_tracer(st.session_state.trace_session)
+    activate(tracer)
+
     st.title("Neuropy HomeHub")
     st.write("Tell me about your day!")
     
@@ -144,5 +197,14 @@ def main():
         except Exception as e:
             st.error(f"Error: {e}")
 
+    if "session_setup_seconds" in st.session_state:
+        metrics = startup_metrics()
+        st.sidebar.caption(
+            f"Vosk model load: {metrics['model_load_seconds'] * 1000:.0f} ms "
+            f"({metrics['model_loads']} load(s) in this process) · "
+            f"session setup: {st.session_state.session_setup_seconds * 1000:.0f} ms"
+        )
+    render_sidebar(tracer)
+
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
@@ -1,65 +1,87 @@
 import os
-import sounddevice as sd
-import soundfile as sf
-import tempfile
 import streamlit as st
 import openai
-import simpleaudio as sa
+import uuid
 from dotenv import load_dotenv
 
+from analysis import IncrementalAnalyzer
+from analysis_ui import PromptAnalyses, render_analyses, render_sidebar, ui_write
+from audio_codec import encode_audio
+from emotion_backends import format_emotions, get_backend
+from openai_client import openai_client
+from prompt_audio import PROMPTS, preload, play as play_prompt
+from structured_analysis import analyze_long_transcript, merge_analyses
+from tracing import activate, get_tracer, span, traced
+from vad import VadSegmenter
+from whisper_pipeline import TranscriptionPipeline
+
 load_dotenv()
 openai.api_key = os.getenv("OPENAI_API_KEY")
 
+# Per-call timeouts (seconds) for the concurrent ChatGPT analyses
+ANALYSIS_TIMEOUTS = {"Sentiment Analysis": 30, "Entity Extraction": 60, "Combined Analysis": 60}
+
+# "incremental": structured analysis of every ANALYSIS_WINDOW utterances while
+# the user is talking, merged at the end; "combined": one structured JSON call
+# for sentiment and entities; "separate": the sentiment and entity prompts as
+# two free-form calls
+ANALYSIS_MODE = "incremental"
+ANALYSIS_WINDOW = 3
+
+# In "separate" mode, stream both answers into the page as they are generated
+ANALYSIS_STREAMING = True
+
+# Number of Whisper uploads allowed in flight while recording continues
+WHISPER_WORKERS = 2
+
+# Speech segments are cut on silence, but never shorter/longer than these (seconds)
+VAD_MIN_SEGMENT = 1.0
+VAD_MAX_SEGMENT = 10.0
+
+# Codec used for Whisper uploads: "wav" (raw), "flac" (lossless) or "opus" (lossy)
+UPLOAD_CODEC = "flac"
+
+# Local emotion classifier shown after every utterance (the ChatGPT analysis
+# stays the detailed one); see emotion_backends.BACKENDS
+LIVE_EMOTION_BACKEND = "lexicon"
+live_emotions = get_backend(LIVE_EMOTION_BACKEND)
+
+# Prompt clips are decoded once per process and played without blocking.
+# With LISTEN_DURING_PROMPT off, recording starts when the opening prompt
+# ends so the prompt is not transcribed from the speakers.
+LISTEN_DURING_PROMPT = False
+preload(PROMPTS)
+
 # ------------------------------------------------
 def play_audio(file_path):
-    """Play a pre-recorded .wav audio file."""
-    if os.path.exists(file_path):
-        try:
-            wave_obj = sa.WaveObject.from_wave_file(file_path)
-            play_obj = wave_obj.play()
-            play_obj.wait_done()
-        except Exception as e:
-            st.error(f"Error playing audio: {e}")
-    else:
+    """Start playing a preloaded prompt clip; returns its play object (None on error)."""
+    try:
+        return play_prompt(file_path)
+    except FileNotFoundError:
         st.error(f"Audio file not found: {file_path}")
+    except Exception as e:
+        st.error(f"Error playing audio: {e}")
 
 # ------------------------------------------------
-def record_audio(filename, duration=10, fs=16000):
-    """Record audio for a short duration and save to a WAV file."""
-    #st.info(f"Recording for {duration} seconds...")
-    recording = sd.rec(int(duration * fs), samplerate=fs, channels=1, dtype="int16")
-    sd.wait()
-    sf.write(filename, recording, fs)
-    #st.success("Recording complete.")
-    return filename
-
-# ------------------------------------------------
-def transcribe_with_whisper(filename):
-    """Transcribe a recorded audio file using the Whisper API."""
+@traced("whisper.transcribe")
+def transcribe_with_whisper(audio):
+    """Transcribe a recorded audio file (path or open binary stream) using the Whisper API."""
     #st.info("Transcribing audio with Whisper API...")
-    with open(filename, "rb") as audio_file:
-        transcript = openai.Audio.transcribe("whisper-1", audio_file)
+    if hasattr(audio, "read"):
+        transcript = openai_client.transcribe("whisper-1", audio)
+    else:
+        with open(audio, "rb") as audio_file:
+            transcript = openai_client.transcribe("whisper-1", audio_file)
     return transcript["text"]
 
 # ------------------------------------------------
-def analyze_sentiment_with_chatgpt(text):
-    prompt = f"""
+# Prompt templates (the cache key includes the template, so editing one
+# invalidates its cached responses)
+SENTIMENT_PROMPT = """
     Analyze the sentiment of the following text based on the circumplex model of emotions. Identify the primary and secondary (if any) emotion (Joy, Trust, Fear, Surprise, Sadness, Disgust, Anger, Anticipation) and its intensity (Low, Medium, High):\n\n{text}
     """
-    response = openai.ChatCompletion.create(
-        model="gpt-4",
-        messages=[
-            {"role": "system", "content": "You are a helpful assistant."},
-            {"role": "user", "content": prompt}
-        ],
-        max_tokens=150,
-        temperature=0
-    )
-    return response["choices"][0]["message"]["content"]
 
-# ------------------------------------------------
-def extract_entities_with_emotions(text):
-    prompt = f"""
+ENTITY_PROMPT = """
     Extract the following categories of entities from the text below. For each category, list the relevant details:
 
     1. **People**: Names of people mentioned in the text.
@@ -78,65 +100,88 @@ def extract_entities_with_emotions(text):
 
     Please provide the output in a structured format.
     """
-    response = openai.ChatCompletion.create(
-        model="gpt-3.5-turbo",
-        messages=[
-            {"role": "system", "content": "You are a helpful assistant."},
-            {"role": "user", "content": prompt}
-        ],
-        max_tokens=500,
-        temperature=0
-    )
-    return response["choices"][0]["message"]["content"]
+
+chatgpt_analyses = PromptAnalyses(SENTIMENT_PROMPT, ENTITY_PROMPT)
 
 # ------------------------------------------------
-def process_transcription_with_chatgpt(transcription):
-    st.write("### Transcription")
-    st.write(transcription)
+def process_transcription_with_chatgpt(transcription, incremental=None):
+    """Show the transcription with its sentiment analysis and entity extraction (see analysis_ui)."""
+    render_analyses(transcription, chatgpt_analyses, ANALYSIS_MODE, ANALYSIS_STREAMING,
+                    ANALYSIS_TIMEOUTS, incremental)
 
-    try:
-        sentiment = analyze_sentiment_with_chatgpt(transcription)
-        st.write("### Sentiment Analysis")
-        st.write(sentiment)
-    except Exception as e:
-        st.error(f"Sentiment Analysis Error: {e}")
+# ------------------------------------------------
+def transcribe_recording(recording, fs=16000, reports=None):
+    """Encode a recorded chunk in memory with UPLOAD_CODEC and transcribe it.
 
-    try:
-        entities = extract_entities_with_emotions(transcription)
-        st.write("### Extracted Entities and Emotions")
-        st.write(entities)
-    except Exception as e:
-        st.error(f"Entity Extraction Error: {e}")
+    The encoding's sizes go on its trace span, and its EncodeReport is
+    appended to `reports` if given.
+    """
+    with span("upload.encode") as encode_span:
+        audio, report = encode_audio(recording, fs, codec=UPLOAD_CODEC)
+        encode_span.set(codec=report.codec, raw_bytes=report.raw_bytes, encoded_bytes=report.encoded_bytes)
+    if reports is not None:
+        reports.append(report)
+    return transcribe_with_whisper(audio)
 
 # ------------------------------------------------
 def continuous_transcription():
-    play_audio("tell me about your day.wav")
+    opening = play_audio("tell me about your day.wav")
     st.info("Listening... (say 'that's it' to end)")
     full_transcription = ""
 
-    while True:
-        # Create a temporary file to store the current audio chunk.
-        with tempfile.NamedTemporaryFile(suffix=".wav", delete=False) as tmp:
-            temp_audio_file = tmp.name
-
-        # Record a chunk (now 10 seconds long)
-        record_audio(temp_audio_file, duration=10)
-
-        # Transcribe the recorded chunk.
-        transcript = transcribe_with_whisper(temp_audio_file)
-        st.write("Partial Transcript: " + transcript)
-        full_transcription += " " + transcript
-
-        # Check if the termination phrase is in the transcript (and transcript is not empty).
-        if transcript and "that's it" in transcript.lower():
-            st.success("Termination phrase detected. Stopping recording...")
-            play_audio("thanks for sharing.wav")
-            break
-
-    process_transcription_with_chatgpt(full_transcription)
+    # The microphone keeps recording while earlier segments are being
+    # transcribed; segments are cut on silence and silent ones are never
+    # uploaded. Transcripts come back in the order they were recorded.
+    segmenter = VadSegmenter(min_segment=VAD_MIN_SEGMENT, max_segment=VAD_MAX_SEGMENT)
+    uploads = []  # EncodeReport per uploaded segment
+    pipeline = TranscriptionPipeline(
+        lambda recording, fs: transcribe_recording(recording, fs, uploads),
+        workers=WHISPER_WORKERS, segmenter=segmenter)
+    analyzer = None
+    if ANALYSIS_MODE == "incremental":
+        analyzer = IncrementalAnalyzer(analyze_long_transcript, merge_analyses, window=ANALYSIS_WINDOW)
+    # Everything above is set up while the opening prompt plays; the
+    # microphone opens when it ends.
+    if opening is not None and not LISTEN_DURING_PROMPT:
+        opening.wait_done()
+    pipeline.start()
+    try:
+        for transcript, error in pipeline.results():
+            if error:
+                st.error(f"Transcription Error: {error}")
+                continue
+
+            ui_write("Partial Transcript: " + transcript)
+            st.caption(f"Live mood: {format_emotions(live_emotions.analyze(transcript))}")
+            full_transcription += " " + transcript
+            if analyzer:
+                analyzer.add(transcript)
+
+            # Check if the termination phrase is in the transcript (and transcript is not empty).
+            if transcript and "that's it" in transcript.lower():
+                st.success("Termination phrase detected. Stopping recording...")
+                pipeline.stop()
+                play_audio("thanks for sharing.wav")
+                break
+    finally:
+        pipeline.stop()
+
+    if uploads:
+        raw = sum(report.raw_bytes for report in uploads)
+        encoded = sum(report.encoded_bytes for report in uploads)
+        st.caption(f"Uploads ({UPLOAD_CODEC}): {len(uploads)} segment(s), {encoded / 1024:.0f} KB "
+                   f"of {raw / 1024:.0f} KB raw ({encoded / raw:.0%})")
+
+    process_transcription_with_chatgpt(full_transcription, analyzer)
 
 # ------------------------------------------------
 def main():
+    # Spans of this browser session go to its own tracer.
+    if "trace_session" not in st.session_state:
+        st.session_state.trace_session = uuid.uuid4().hex[:8]
+    tracer = get_tracer(st.session_state.trace_session)
+    activate(tracer)
+
     st.title("Neuropy HomeHub")
     st.write("Tell me about your day!")
     
@@ -146,5 +191,7 @@ def main():
         except Exception as e:
             st.error(f"Error: {e}")
 
+    render_sidebar(tracer)
+
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
@@ -0,0 +1,165 @@
+"""Bounded audio buffer between the PortAudio callback and the recognizer.
+
+An unbounded `queue.Queue` lets memory and latency grow without limit when
+decoding falls behind real time. `SampleRing` has a fixed capacity: the
+callback copies samples into one preallocated int16 array, and the consumer
+reads fixed-size blocks as memoryviews, so the steady state allocates no
+audio buffers. When the consumer falls behind, a configurable overrun policy
+decides what gives, and counters (overruns, depth, end-to-end lag) show when
+a hub is CPU-starved.
+"""
+import queue
+import threading
+
+import numpy as np
+
+DROP_OLDEST = "drop_oldest"    # skip the oldest whole blocks once the consumer lags too far
+MERGE = "merge"                # hand the backlog out as larger blocks so nothing is lost
+BACKPRESSURE = "backpressure"  # keep everything, reject new samples when full and raise the flag
+
+POLICIES = (DROP_OLDEST, MERGE, BACKPRESSURE)
+
+
+class SampleRing:
+    """Preallocated ring buffer of int16 samples for one producer and one consumer.
+
+    `write` copies the callback's samples into the ring and never blocks.
+    `read` returns a memoryview of the next block; the view stays valid until
+    the following `read` call, which is when its space is handed back to the
+    producer. How a lagging consumer is handled depends on `policy`:
+
+    - DROP_OLDEST: once more than `max_lag` seconds are waiting, the oldest
+      whole blocks are skipped on the next read, so latency stays bounded;
+    - MERGE: nothing is skipped; while there is a backlog, `read` returns up
+      to `max_merge_blocks` blocks at once so the recognizer catches up with
+      fewer, larger calls;
+    - BACKPRESSURE: nothing is skipped; when the ring is full the
+      `backpressure` event is set (and cleared once it is half empty) so a
+      producer that can wait, such as a file replay, can slow down.
+
+    Under every policy, samples that do not fit in a completely full ring are
+    dropped and counted as an overrun.
+    """
+
+    def __init__(self, seconds=10, fs=16000, block_samples=4000, max_lag=None, policy=DROP_OLDEST,
+                 max_merge_blocks=4):
+        if policy not in POLICIES:
+            raise ValueError(f"Unknown policy {policy!r}; expected one of {', '.join(POLICIES)}")
+        n_blocks = max(2, int(seconds * fs) // block_samples)
+        self.fs = fs
+        self.block_samples = block_samples
+        self.policy = policy
+        self.max_merge_blocks = max_merge_blocks if policy == MERGE else 1
+        # A whole number of blocks, so a block never wraps around the end.
+        self.capacity = n_blocks * block_samples
+        self.max_lag_samples = int(max_lag * fs) if max_lag else self.capacity // 2
+        self.backpressure = threading.Event()
+
+        self._buffer = np.zeros(self.capacity, dtype=np.int16)
+        self._column = self._buffer.reshape(-1, 1)  # same memory, shaped like the callback's indata
+        self._view = memoryview(self._buffer)
+        self._written = 0  # total samples written
+        self._read = 0     # total samples released back to the producer
+        self._held = 0     # size of the block handed out by the last read()
+        # A plain Lock is cheaper than the Condition's default RLock, and the
+        # producer only notifies while the consumer is actually waiting.
+        self._cond = threading.Condition(threading.Lock())
+        self._waiting = False
+
+        self._overruns = 0
+        self._dropped_samples = 0
+        self._skipped_samples = 0
+        self._merged_reads = 0
+        self._max_depth = 0
+        self._lag_last = 0.0
+        self._lag_max = 0.0
+        self._lag_total = 0.0
+        self._reads = 0
+
+    def write(self, indata):
+        """Copy samples (e.g. the callback's (frames, 1) `indata`) into the ring; returns False on overrun."""
+        n = indata.shape[0]
+        with self._cond:
+            depth = self._written - self._read
+            if n > self.capacity - depth:
+                self._overruns += 1
+                self._dropped_samples += n
+                if self.policy == BACKPRESSURE:
+                    self.backpressure.set()
+                return False
+            start = self._written % self.capacity
+            if start + n <= self.capacity and indata.ndim == 2:
+                # The common case: no wraparound and no reshape of the callback's array.
+                self._column[start:start + n] = indata
+            else:
+                samples = indata.reshape(-1)
+                first = min(n, self.capacity - start)
+                self._buffer[start:start + first] = samples[:first]
+                if first < n:
+                    self._buffer[:n - first] = samples[first:]
+            self._written += n
+            depth += n
+            if depth > self._max_depth:
+                self._max_depth = depth
+            if self._waiting:
+                self._cond.notify()
+        return True
+
+    def read(self, timeout=None):
+        """Return a memoryview of the next block (or blocks, under MERGE); raises queue.Empty on timeout."""
+        with self._cond:
+            self._read += self._held
+            self._held = 0
+
+            backlog = self._written - self._read
+            if self.policy == DROP_OLDEST and backlog > self.max_lag_samples:
+                skip = (backlog - self.max_lag_samples) // self.block_samples * self.block_samples
+                self._read += skip
+                self._skipped_samples += skip
+            elif self.policy == BACKPRESSURE and backlog < self.capacity // 2:
+                self.backpressure.clear()
+
+            self._waiting = True
+            try:
+                if not self._cond.wait_for(
+                        lambda: self._written - self._read >= self.block_samples, timeout):
+                    raise queue.Empty
+            finally:
+                self._waiting = False
+            backlog = self._written - self._read
+            start = self._read % self.capacity
+            # Blocks never wrap, so a merged read stops at the end of the buffer.
+            blocks = min(backlog // self.block_samples, self.max_merge_blocks,
+                         (self.capacity - start) // self.block_samples)
+            if blocks > 1:
+                self._merged_reads += 1
+            self._held = blocks * self.block_samples
+            lag = backlog / self.fs
+
+        self._lag_last = lag
+        self._lag_max = max(self._lag_max, lag)
+        self._lag_total += lag
+        self._reads += 1
+        return self._view[start:start + self._held]
+
+    def free(self):
+        """Samples that can be written before the ring overruns (the block held by the reader counts as used)."""
+        with self._cond:
+            return self.capacity - (self._written - self._read)
+
+    def stats(self):
+        """Return a snapshot of the ring counters (depth and lag in samples/seconds)."""
+        with self._cond:
+            return {
+                "policy": self.policy,
+                "capacity": self.capacity,
+                "depth": self._written - self._read,
+                "max_depth": self._max_depth,
+                "overruns": self._overruns,
+                "dropped_samples": self._dropped_samples,
+                "skipped_samples": self._skipped_samples,
+                "merged_reads": self._merged_reads,
+                "lag_last": self._lag_last,
+                "lag_max": self._lag_max,
+                "lag_avg": self._lag_total / self._reads if self._reads else 0.0,
+            }
@@ -0,0 +1,298 @@
+"""Low-latency playback of EVI `audio_output` chunks.
+
+EVI streams the assistant's voice as base64-encoded WAV chunks whose arrival
+times jitter with the network. `AudioPlayer` plays them through its own
+output stream instead of the SDK's byte stream:
+
+- chunks are base64-decoded straight from the message string (no
+  intermediate `.encode()` copy), the WAV header is parsed in place and the
+  PCM frames are copied once, into a preallocated `JitterBuffer`;
+- the jitter buffer holds playback back until `target_ms` of audio is
+  buffered (or the first chunk has waited that long), and rebuffers to the
+  target after an underrun, trading a fixed delay for gap-free audio;
+- EVI sends replies faster than real time, so the buffer grows (doubling,
+  up to `max_capacity_ms`) instead of dropping audio when a reply does not
+  fit; audio beyond the limit is dropped and counted;
+- malformed chunks are skipped and counted rather than raised inside the
+  socket's message handler, where an exception would drop the connection;
+- it counts underruns (the device asked for audio the network had not yet
+  delivered) and records the time from each response's first byte to its
+  first sample leaving for the device;
+- `speaking` tells whether the assistant is audible (buffered audio, or
+  audio still in the device), so the microphone can be muted meanwhile as
+  the SDK's player does for `allow_user_interrupt=False`.
+"""
+import binascii
+import json
+import struct
+import threading
+import time
+
+import numpy as np
+
+
+def parse_wav(data):
+    """Return (fs, channels, memoryview of the PCM frames) of an in-memory 16-bit PCM WAV."""
+    view = memoryview(data)
+    if bytes(view[:4]) != b"RIFF" or bytes(view[8:12]) != b"WAVE":
+        raise ValueError("audio chunk is not a WAV file")
+    fs = channels = None
+    pos = 12
+    while pos + 8 <= len(view):
+        chunk_id = bytes(view[pos:pos + 4])
+        size, = struct.unpack_from("<I", view, pos + 4)
+        body = pos + 8
+        if chunk_id == b"fmt ":
+            audio_format, channels, fs, _, _, bits = struct.unpack_from("<HHIIHH", view, body)
+            if audio_format != 1 or bits != 16:
+                raise ValueError(f"unsupported WAV format {audio_format} with {bits}-bit samples")
+        elif chunk_id == b"data":
+            if fs is None:
+                raise ValueError("WAV data chunk before its fmt chunk")
+            # Streamed WAVs may carry a placeholder data size.
+            end = len(view) if size in (0, 0xFFFFFFFF) else min(len(view), body + size)
+            return fs, channels, view[body:end]
+        pos = body + size + (size & 1)
+    raise ValueError("WAV chunk has no data")
+
+
+class JitterBuffer:
+    """Preallocated int16 playout buffer between the network and the audio callback.
+
+    Starts at `capacity_ms` and is reallocated (doubling) when a reply does
+    not fit, up to `max_capacity_ms`.
+    """
+
+    def __init__(self, fs=48000, channels=1, target_ms=120, capacity_ms=10000, max_capacity_ms=300000):
+        self.fs = fs
+        self.channels = channels
+        self.target_frames = int(target_ms * fs / 1000)
+        self.capacity = int(capacity_ms * fs / 1000)
+        self.max_capacity = max(self.capacity, int(max_capacity_ms * fs / 1000))
+        self.output_latency = 0.0  # seconds the device adds after the callback
+        self._buffer = np.zeros((self.capacity, channels), dtype=np.int16)
+        self._written = 0
+        self._read = 0
+        self._playing = False
+        self._ending = False        # the response is complete; play out what is left
+        self._stalled = False       # rebuffering after an underrun
+        self._first_byte_at = None  # arrival of the first chunk not yet heard
+        self._heard_until = 0.0     # perf_counter when the last played sample leaves the device
+        self._lock = threading.Lock()
+        self._latencies = []
+        self.metrics = {"chunks": 0, "underruns": 0, "underrun_frames": 0, "overruns": 0,
+                        "dropped_frames": 0, "max_depth": 0, "cleared_frames": 0, "grows": 0}
+
+    def write(self, frames, arrived=None):
+        """Copy (n, channels) int16 frames in; returns False if they did not fit even after growing."""
+        n = frames.shape[0]
+        with self._lock:
+            depth = self._written - self._read
+            if not self._playing and depth == 0:
+                self._first_byte_at = arrived if arrived is not None else time.perf_counter()
+            self._ending = False
+            self.metrics["chunks"] += 1
+            if n > self.capacity - depth and not self._grow(depth + n):
+                self.metrics["overruns"] += 1
+                self.metrics["dropped_frames"] += n
+                return False
+            start = self._written % self.capacity
+            first = min(n, self.capacity - start)
+            self._buffer[start:start + first] = frames[:first]
+            if first < n:
+                self._buffer[:n - first] = frames[first:]
+            self._written += n
+            self.metrics["max_depth"] = max(self.metrics["max_depth"], depth + n)
+        return True
+
+    def _grow(self, needed):
+        """Reallocate (doubling) to hold `needed` frames; False if that exceeds max_capacity."""
+        if needed > self.max_capacity:
+            return False
+        capacity = self.capacity
+        while capacity < needed:
+            capacity *= 2
+        buffer = np.zeros((min(capacity, self.max_capacity), self.channels), dtype=np.int16)
+        # Unwrap the buffered frames to the start of the new buffer.
+        depth = self._written - self._read
+        start = self._read % self.capacity
+        first = min(depth, self.capacity - start)
+        buffer[:first] = self._buffer[start:start + first]
+        buffer[first:depth] = self._buffer[:depth - first]
+        self._buffer = buffer
+        self.capacity = buffer.shape[0]
+        self._read, self._written = 0, depth
+        self.metrics["grows"] += 1
+        return True
+
+    def read(self, out):
+        """Fill `out` (the callback's (frames, channels) int16 array) in place."""
+        wanted = out.shape[0]
+        now = time.perf_counter()
+        with self._lock:
+            depth = self._written - self._read
+            if not self._playing:
+                waited = self._first_byte_at is not None and now - self._first_byte_at >= self.target_frames / self.fs
+                if depth and (depth >= self.target_frames or self._ending or waited):
+                    self._playing = True
+                    self._stalled = False
+                else:
+                    out.fill(0)
+                    if self._stalled and not self._ending:
+                        self.metrics["underrun_frames"] += wanted
+                    return
+            n = min(wanted, depth)
+            start = self._read % self.capacity
+            first = min(n, self.capacity - start)
+            out[:first] = self._buffer[start:start + first]
+            if first < n:
+                out[first:n] = self._buffer[:n - first]
+            self._read += n
+            if n:
+                self._heard_until = now + (n / self.fs) + self.output_latency
+            if n < wanted:
+                out[n:] = 0
+                self._playing = False  # rebuffer to the target before resuming
+                if not self._ending:
+                    self._stalled = True
+                    self.metrics["underruns"] += 1
+                    self.metrics["underrun_frames"] += wanted - n
+            if n and self._first_byte_at is not None:
+                self._latencies.append(now - self._first_byte_at + self.output_latency)
+                self._first_byte_at = None
+
+    @property
+    def speaking(self):
+        """True while audio is buffered or still being played out by the device."""
+        with self._lock:
+            return self._written > self._read or time.perf_counter() < self._heard_until
+
+    def mark_end(self):
+        """The response is complete: play what is left even below the target, without underruns."""
+        with self._lock:
+            self._ending = True
+
+    def clear(self):
+        """Drop buffered audio (e.g. when the user interrupts the assistant)."""
+        with self._lock:
+            self.metrics["cleared_frames"] += self._written - self._read
+            self._read = self._written
+            self._playing = False
+            self._stalled = False
+            self._first_byte_at = None
+            self._heard_until = 0.0
+
+    def stats(self):
+        """Counters plus depth and first-byte-to-audio latency in milliseconds."""
+        with self._lock:
+            stats = dict(self.metrics)
+            stats["depth_ms"] = (self._written - self._read) * 1000 / self.fs
+            latencies = list(self._latencies)
+        stats["max_depth_ms"] = stats["max_depth"] * 1000 / self.fs
+        stats["underrun_ms"] = stats["underrun_frames"] * 1000 / self.fs
+        stats["dropped_ms"] = stats["dropped_frames"] * 1000 / self.fs
+        stats["capacity_ms"] = self.capacity * 1000 / self.fs
+        stats["responses"] = len(latencies)
+        if latencies:
+            stats["first_audio_ms_p50"] = float(np.percentile(latencies, 50)) * 1000
+            stats["first_audio_ms_max"] = max(latencies) * 1000
+        return stats
+
+
+class AudioPlayer:
+    """Plays base64 WAV chunks through a jitter buffer and a low-latency output stream.
+
+    The output stream is opened with the format of the first chunk.
+    """
+
+    def __init__(self, target_ms=120, block_ms=20, device=None, capacity_ms=10000, max_capacity_ms=300000):
+        self.target_ms = target_ms
+        self.block_ms = block_ms
+        self.device = device
+        self.capacity_ms = capacity_ms  # initial jitter buffer size; it grows up to max_capacity_ms
+        self.max_capacity_ms = max_capacity_ms
+        self.buffer = None
+        self._stream = None
+        self.decode_time = 0.0
+        self.bad_chunks = 0
+        self.last_error = None
+
+    def feed(self, message_str):
+        """Queue one `audio_output` payload (base64 WAV) for playback; returns False if it was skipped.
+
+        A malformed chunk, or one in a different format than the stream, is
+        counted in `bad_chunks` instead of raising, so one bad chunk does not
+        tear down the connection it arrived on.
+        """
+        arrived = time.perf_counter()
+        try:
+            data = binascii.a2b_base64(message_str)
+            fs, channels, pcm = parse_wav(data)
+            if self.buffer is not None and (fs, channels) != (self.buffer.fs, self.buffer.channels):
+                raise ValueError(f"audio chunk is {fs} Hz x{channels}, the stream plays "
+                                 f"{self.buffer.fs} Hz x{self.buffer.channels}")
+            frames = np.frombuffer(pcm, dtype=np.int16).reshape(-1, channels)
+        except (ValueError, struct.error) as e:  # binascii.Error is a ValueError
+            self.bad_chunks += 1
+            self.last_error = e
+            return False
+        if self.buffer is None:
+            self.buffer = JitterBuffer(fs, channels, self.target_ms, self.capacity_ms, self.max_capacity_ms)
+            self._open(fs, channels)
+        written = self.buffer.write(frames, arrived)
+        self.decode_time += time.perf_counter() - arrived
+        return written
+
+    @property
+    def speaking(self):
+        return self.buffer is not None and self.buffer.speaking
+
+    def mark_end(self):
+        if self.buffer is not None:
+            self.buffer.mark_end()
+
+    def clear(self):
+        if self.buffer is not None:
+            self.buffer.clear()
+
+    def _open(self, fs, channels):
+        # Imported here so the jitter buffer works (and can be tested) without an audio device.
+        import sounddevice as sd
+
+        def callback(outdata, frames, time_info, status):
+            self.buffer.read(outdata)
+
+        self._stream = sd.OutputStream(samplerate=fs, channels=channels, dtype="int16",
+                                       blocksize=int(fs * self.block_ms / 1000), latency="low",
+                                       device=self.device, callback=callback)
+        self.buffer.output_latency = self._stream.latency
+        self._stream.start()
+
+    def close(self):
+        if self._stream is not None:
+            self._stream.stop()
+            self._stream.close()
+            self._stream = None
+
+    def stats(self):
+        stats = self.buffer.stats() if self.buffer is not None else {"chunks": 0}
+        stats["bad_chunks"] = self.bad_chunks
+        stats["decode_ms"] = self.decode_time * 1000
+        return stats
+
+
+class AudioEventRecorder:
+    """Appends `audio_output` payloads with their arrival times to a JSONL file for replay."""
+
+    def __init__(self, path):
+        self._file = open(path, "a")
+        self._start = time.monotonic()
+
+    def record(self, message_type, data=None):
+        event = {"t": time.monotonic() - self._start, "type": message_type}
+        if data is not None:
+            event["data"] = data
+        self._file.write(json.dumps(event) + "\n")
+
+    def close(self):
+        self._file.close()
@@ -0,0 +1,147 @@
+"""Audio input sources: the microphone, or WAV files replayed in its place.
+
+`input_stream` returns what the apps use to capture audio. Normally that is
+an `sd.InputStream`; when the AUDIO_REPLAY environment variable names one or
+more WAV files (comma separated), it is a `WavReplaySource` that plays them
+into the same callback (app.py's ring buffer) or `read()` path
+(TranscriptionPipeline) at AUDIO_REPLAY_SPEED times real time, so the
+pipeline can be benchmarked and regression-tested on a headless box:
+
+    AUDIO_REPLAY="tell me about your day.wav" AUDIO_REPLAY_SPEED=4 streamlit run app.py
+
+A speed of 0 replays as fast as the consumer takes the audio: a callback
+consumer passes a `throttle` (e.g. "the ring has room for another block")
+so the replay does not overrun it.
+"""
+import bisect
+import os
+import threading
+import time
+
+import numpy as np
+
+from audio_codec import read_wav
+
+REPLAY_FILES = [path for path in os.getenv("AUDIO_REPLAY", "").split(",") if path]
+REPLAY_SPEED = float(os.getenv("AUDIO_REPLAY_SPEED", "1"))
+
+
+def input_stream(samplerate=16000, channels=1, dtype="int16", callback=None, blocksize=0, throttle=None):
+    """An `sd.InputStream`, or a WavReplaySource of REPLAY_FILES if AUDIO_REPLAY is set.
+
+    `throttle` only applies to the replay (see WavReplaySource); the
+    microphone delivers at its own pace.
+    """
+    if REPLAY_FILES:
+        return WavReplaySource(REPLAY_FILES, samplerate, speed=REPLAY_SPEED, callback=callback,
+                               blocksize=blocksize or 1024, throttle=throttle)
+    # Imported here so replays need no PortAudio.
+    import sounddevice as sd
+    return sd.InputStream(samplerate=samplerate, channels=channels, dtype=dtype,
+                          callback=callback, blocksize=blocksize)
+
+
+class WavReplaySource:
+    """Plays WAV files like a mono int16 microphone, with the sd.InputStream interface.
+
+    With a `callback`, a thread calls it as callback(indata, frames, time,
+    status) every `blocksize` frames; otherwise `read(frames)` returns
+    (samples, overflowed) like a blocking stream. After the files (and
+    `gap` seconds of silence between them), the source keeps delivering
+    silence like a quiet room; `finished` is set once the file audio has
+    been delivered. At speed 0 the callback thread only delivers a block
+    while `throttle()` (if given) returns True, e.g. while a ring has room.
+    """
+
+    def __init__(self, paths, fs=16000, speed=1.0, callback=None, blocksize=1024, gap=0.0,
+                 throttle=None):
+        if isinstance(paths, str):
+            paths = [paths]
+        self.fs = fs
+        self.speed = speed
+        self.callback = callback
+        self.blocksize = blocksize
+        self.throttle = throttle
+        silence = np.zeros(int(gap * fs), dtype=np.int16)
+        parts, self.ends = [], []  # ends: sample index where each file ends
+        position = 0
+        for path in paths:
+            clip = read_wav(path, fs)
+            parts += [clip, silence]
+            position += clip.size
+            self.ends.append(position)
+            position += silence.size
+        self.samples = np.concatenate(parts)
+        self.position = 0  # samples delivered so far
+        self.finished = threading.Event()
+        self._positions = []  # position after each delivered block of file audio
+        self._times = []      # perf_counter when that block was delivered
+        self._started_at = None
+        self._stop = threading.Event()
+        self._thread = None
+
+    @property
+    def duration(self):
+        return self.samples.size / self.fs
+
+    def start(self):
+        self._stop.clear()
+        self._started_at = time.perf_counter()
+        if self.callback is not None:
+            self._thread = threading.Thread(target=self._run, name="wav-replay", daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def close(self):
+        self.stop()
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def read(self, frames):
+        """Block until `frames` samples are due; returns ((frames, 1) int16, overflowed=False)."""
+        self._wait(self.position + frames)
+        return self._next(frames).reshape(-1, 1), False
+
+    def delivered_at(self, sample):
+        """perf_counter time at which `sample` (an index into the replay) was delivered."""
+        i = bisect.bisect_right(self._positions, sample)
+        return self._times[i] if i < len(self._times) else None
+
+    def _run(self):
+        while not self._stop.is_set():
+            if self.speed <= 0 and self.throttle is not None and not self.throttle():
+                time.sleep(0.0005)
+                continue
+            self._wait(self.position + self.blocksize)
+            if self._stop.is_set():
+                break
+            block = self._next(self.blocksize).reshape(-1, 1)
+            self.callback(block, self.blocksize, None, None)
+
+    def _wait(self, position):
+        if self.speed > 0:
+            due = self._started_at + position / self.fs / self.speed
+            self._stop.wait(max(0.0, due - time.perf_counter()))
+
+    def _next(self, frames):
+        start = self.position
+        block = self.samples[start:start + frames]
+        if block.size < frames:
+            block = np.concatenate([block, np.zeros(frames - block.size, dtype=np.int16)])
+        self.position += frames
+        if start < self.samples.size:
+            self._positions.append(self.position)
+            self._times.append(time.perf_counter())
+            if self.position >= self.samples.size:
+                self.finished.set()
+        return block
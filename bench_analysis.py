@@ -0,0 +1,91 @@
+"""Benchmark sequential vs concurrent ChatGPT analysis without the network.
+
+Uses a local fake of `openai.ChatCompletion` that sleeps for a fixed,
+per-model latency before answering, so the speedup of `run_analyses` can be
+measured offline:
+
+    python bench_analysis.py --gpt4-latency 1.5 --gpt35-latency 0.8
+"""
+import argparse
+import time
+
+from analysis import run_analyses
+
+SAMPLE_TEXT = (
+    "this weekend i hung out with logan and we walked around the park and then "
+    "went to the bookstore and back to his apartment to watch a movie"
+)
+
+
+class FakeChatCompletion:
+    """Stand-in for `openai.ChatCompletion` that adds artificial latency."""
+
+    def __init__(self, latencies):
+        self.latencies = latencies
+        self.calls = 0
+
+    def create(self, model, messages, max_tokens=None, temperature=None, **kwargs):
+        self.calls += 1
+        time.sleep(self.latencies.get(model, 1.0))
+        content = f"[{model}] {len(messages[-1]['content'])} prompt chars"
+        return {"choices": [{"message": {"role": "assistant", "content": content}}]}
+
+
+class FakeOpenAI:
+    """Minimal fake of the `openai` module surface used by the apps."""
+
+    def __init__(self, latencies):
+        self.ChatCompletion = FakeChatCompletion(latencies)
+
+
+def make_analyses(client):
+    """Build sentiment/entity analyses equivalent to the apps', bound to `client`."""
+    def sentiment(text):
+        response = client.ChatCompletion.create(
+            model="gpt-4",
+            messages=[{"role": "user", "content": text}],
+            max_tokens=150,
+            temperature=0,
+        )
+        return response["choices"][0]["message"]["content"]
+
+    def entities(text):
+        response = client.ChatCompletion.create(
+            model="gpt-3.5-turbo",
+            messages=[{"role": "user", "content": text}],
+            max_tokens=500,
+            temperature=0,
+        )
+        return response["choices"][0]["message"]["content"]
+
+    return {"Sentiment Analysis": sentiment, "Entity Extraction": entities}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--gpt4-latency", type=float, default=1.5)
+    parser.add_argument("--gpt35-latency", type=float, default=0.8)
+    parser.add_argument("--timeout", type=float, default=10)
+    args = parser.parse_args()
+
+    client = FakeOpenAI({"gpt-4": args.gpt4_latency, "gpt-3.5-turbo": args.gpt35_latency})
+    analyses = make_analyses(client)
+
+    start = time.perf_counter()
+    for func in analyses.values():
+        func(SAMPLE_TEXT)
+    sequential = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for result in run_analyses(analyses, SAMPLE_TEXT, timeout=args.timeout):
+        status = "error: %s" % result.error if result.error else "ok"
+        print(f"  {result.name:<20} arrived after {result.elapsed:.2f}s ({status})")
+    concurrent = time.perf_counter() - start
+
+    print(f"sequential: {sequential:.2f}s")
+    print(f"concurrent: {concurrent:.2f}s")
+    print(f"speedup:    {sequential / concurrent:.2f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,77 @@
+"""Benchmark map-reduce analysis of long transcripts against chunk size and concurrency.
+
+Generates a synthetic diary transcript, chunks it with `chunk_transcript`
+and runs `map_reduce` with a fake combined analysis whose latency grows with
+the prompt size (a fixed round trip plus a per-token cost), then reports wall
+time for every (chunk size, concurrency) pair:
+
+    python bench_chunking.py --sentences 600 --sizes 500 1000 2000 --concurrency 1 4 8
+"""
+import argparse
+import random
+import time
+
+from analysis import map_reduce
+from structured_analysis import merge_analyses, validate_analysis
+from transcript_chunking import chunk_transcript, count_tokens
+
+PEOPLE = ["Logan", "Maya", "Sam", "Grandma", "Priya", "Jordan"]
+PLACES = ["park", "bookstore", "apartment", "office", "beach", "cafe"]
+EVENTS = ["walking", "watching a movie", "cooking dinner", "arguing", "laughing", "shopping"]
+
+
+def synthetic_transcript(sentences, seed=0):
+    rng = random.Random(seed)
+    return " ".join(
+        f"then i was {rng.choice(EVENTS)} with {rng.choice(PEOPLE)} "
+        f"at the {rng.choice(PLACES)} and it felt {rng.choice(['nice', 'weird', 'calm'])}."
+        for _ in range(sentences))
+
+
+def fake_analysis(base_latency, per_token):
+    def analyze(text):
+        time.sleep(base_latency + per_token * count_tokens(text))
+        lowered = text.lower()
+        return {
+            "people": [name for name in PEOPLE if name.lower() in lowered],
+            "locations": [place for place in PLACES if place in lowered],
+            "events": [event for event in EVENTS if event in lowered],
+            "environment": [],
+            "emotions": [{"emotion": "Joy", "intensity": "Medium", "primary": True}],
+            "associations": [],
+        }
+    return analyze
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sentences", type=int, default=600)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[500, 1000, 2000, 4000])
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 2, 4, 8])
+    parser.add_argument("--base-latency", type=float, default=0.5, help="seconds per call")
+    parser.add_argument("--per-token", type=float, default=0.0005, help="seconds per prompt token")
+    args = parser.parse_args()
+
+    text = synthetic_transcript(args.sentences)
+    analyze = fake_analysis(args.base_latency, args.per_token)
+    print(f"transcript: {count_tokens(text)} tokens, {args.sentences} sentences")
+
+    start = time.perf_counter()
+    single = analyze(text)
+    print(f"single call: {time.perf_counter() - start:6.2f}s")
+
+    print("chunk tokens  chunks  " + "  ".join(f"c={c:<4d}" for c in args.concurrency))
+    for size in args.sizes:
+        chunks = chunk_transcript(text, size)
+        timings = []
+        for concurrency in args.concurrency:
+            start = time.perf_counter()
+            merged = map_reduce(chunks, analyze, merge_analyses, concurrency)
+            timings.append(time.perf_counter() - start)
+            validate_analysis(merged)
+            assert sorted(merged["people"]) == sorted(single["people"])
+        print(f"{size:12d}  {len(chunks):6d}  " + "  ".join(f"{t:5.2f}s" for t in timings))
+
+
+if __name__ == "__main__":
+    main()
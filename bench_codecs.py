@@ -0,0 +1,93 @@
+"""Benchmark end-to-end chunk latency per upload codec over a throttled link.
+
+Starts a local mock transcription endpoint that reads request bodies at a
+fixed bandwidth, then encodes the same chunks as WAV, FLAC and Opus and
+uploads each one, reporting encode time, upload size and total latency:
+
+    python bench_codecs.py --kbps 256 --chunks 5
+"""
+import argparse
+import json
+import threading
+import time
+import urllib.request
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import numpy as np
+
+from audio_codec import CODECS, encode_audio, read_wav
+
+FS = 16000
+
+
+def make_handler(bytes_per_second):
+    class ThrottledUploadHandler(BaseHTTPRequestHandler):
+        """Reads the upload no faster than the configured bandwidth."""
+
+        def do_POST(self):
+            remaining = int(self.headers["Content-Length"])
+            block = 4096
+            while remaining:
+                size = min(block, remaining)
+                self.rfile.read(size)
+                remaining -= size
+                time.sleep(size / bytes_per_second)
+            body = json.dumps({"text": ""}).encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    return ThrottledUploadHandler
+
+
+def upload(url, stream):
+    request = urllib.request.Request(
+        url, data=stream.getvalue(), headers={"Content-Type": "application/octet-stream"})
+    with urllib.request.urlopen(request) as response:
+        return json.loads(response.read())
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("wavs", nargs="*",
+                        default=["tell me about your day.wav", "thanks for sharing.wav"])
+    parser.add_argument("--kbps", type=float, default=256, help="uplink bandwidth (kbit/s)")
+    parser.add_argument("--chunk-seconds", type=float, default=10.0)
+    parser.add_argument("--chunks", type=int, default=3)
+    args = parser.parse_args()
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), make_handler(args.kbps * 1000 / 8))
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    url = f"http://127.0.0.1:{server.server_address[1]}/v1/audio/transcriptions"
+
+    # Speech clips padded with quiet room noise up to the chunk length.
+    speech = np.concatenate([read_wav(path, FS) for path in args.wavs])
+    frames = int(args.chunk_seconds * FS)
+    rng = np.random.default_rng(0)
+    chunk = rng.normal(0, 40, frames).astype(np.int16)
+    chunk[:min(frames, speech.size)] = speech[:frames]
+
+    print(f"uplink {args.kbps:g} kbit/s, {args.chunks} chunks of {args.chunk_seconds:g}s")
+    for codec in CODECS:
+        encode_times, sizes, totals = [], [], []
+        for _ in range(args.chunks):
+            start = time.perf_counter()
+            stream, report = encode_audio(chunk, FS, codec=codec)
+            upload(url, stream)
+            totals.append(time.perf_counter() - start)
+            encode_times.append(report.seconds)
+            sizes.append(report.encoded_bytes)
+        print(f"{codec:>5}: {np.mean(sizes) / 1024:8.1f} KiB, "
+              f"encode {np.mean(encode_times) * 1000:6.1f} ms, "
+              f"end-to-end {np.mean(totals):6.2f}s per chunk")
+
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
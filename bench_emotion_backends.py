@@ -0,0 +1,122 @@
+"""Latency and agreement of the local emotion backend against labelled utterances.
+
+Labels are JSONL lines of {"text", "emotions"} (plus "latency" and "source"
+when recorded from the LLM backend), with "emotions" in the structure every
+backend returns. emotion_sample.jsonl ships 40 hand-labelled diary
+utterances, including the lexicon's known traps ("kind of", "down the
+street", negations, emotions without emotion words), and is the default:
+
+    python bench_emotion_backends.py
+
+To compare against the LLM backend instead, record its outputs once (this
+calls the OpenAI API) from a text file with one transcript per line, then
+compare offline as often as needed:
+
+    python bench_emotion_backends.py --record transcripts.txt
+    python bench_emotion_backends.py --recordings llm_emotion_recordings.jsonl
+"""
+import argparse
+import json
+import time
+
+import numpy as np
+
+from emotion_backends import get_backend
+
+SAMPLE = "emotion_sample.jsonl"
+DEFAULT_RECORDINGS = "llm_emotion_recordings.jsonl"
+
+
+def record(transcripts_path, recordings_path):
+    backend = get_backend("llm")
+    with open(transcripts_path) as transcripts, open(recordings_path, "a") as out:
+        for line in transcripts:
+            text = line.strip()
+            if not text:
+                continue
+            start = time.perf_counter()
+            emotions = backend.analyze(text)
+            latency = time.perf_counter() - start
+            out.write(json.dumps({"text": text, "emotions": emotions, "latency": latency, "source": "llm"}) + "\n")
+            print(f"{latency:5.2f}s  {text[:60]!r}")
+
+
+def primary(emotions):
+    return next((item for item in emotions if item["primary"]), None)
+
+
+def load(path):
+    with open(path) as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def agreement(recordings, backend):
+    """Agreement of `backend` with the labelled recordings, plus its per-call latencies."""
+    latencies, primary_hits, emotion_matches, intensity_hits, overlaps = [], 0, 0, 0, []
+    for recording in recordings:
+        start = time.perf_counter()
+        local = backend.analyze(recording["text"])
+        latencies.append(time.perf_counter() - start)
+
+        expected, got = primary(recording["emotions"]), primary(local)
+        if expected and got and expected["emotion"] == got["emotion"]:
+            primary_hits += 1
+            emotion_matches += 1
+            intensity_hits += expected["intensity"] == got["intensity"]
+        elif not expected and not got:
+            primary_hits += 1  # both neutral
+
+        expected_set = {item["emotion"] for item in recording["emotions"]}
+        local_set = {item["emotion"] for item in local}
+        union = expected_set | local_set
+        overlaps.append(len(expected_set & local_set) / len(union) if union else 1.0)
+
+    n = len(recordings)
+    return {
+        "recordings": n,
+        "primary": primary_hits / n,
+        "intensity": intensity_hits / emotion_matches if emotion_matches else None,
+        "jaccard": float(np.mean(overlaps)),
+        "latencies": latencies,
+    }
+
+
+def compare(recordings_path, backend_name):
+    recordings = load(recordings_path)
+    if not recordings:
+        raise SystemExit(f"No recordings in {recordings_path}")
+    result = agreement(recordings, get_backend(backend_name))
+
+    latencies = result["latencies"]
+    llm_latencies = [r["latency"] for r in recordings if "latency" in r]
+    print(f"{result['recordings']} recordings in {recordings_path}")
+    print(f"{backend_name} latency: mean {np.mean(latencies) * 1000:.3f} ms, "
+          f"p95 {np.percentile(latencies, 95) * 1000:.3f} ms")
+    if llm_latencies:
+        print(f"llm latency (recorded): mean {np.mean(llm_latencies):.2f}s, "
+              f"p95 {np.percentile(llm_latencies, 95):.2f}s")
+    print(f"primary emotion agreement (neutral counts): {result['primary']:.0%}")
+    intensity = result["intensity"]
+    print(f"primary intensity agreement (when emotion matches): "
+          f"{'n/a' if intensity is None else f'{intensity:.0%}'}")
+    print(f"emotion set overlap (Jaccard): {result['jaccard']:.2f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--recordings",
+                        help=f"labelled JSONL to compare against (default {SAMPLE}; "
+                             f"--record appends to {DEFAULT_RECORDINGS})")
+    parser.add_argument("--record", metavar="TRANSCRIPTS",
+                        help="call the LLM backend on each line and append to --recordings")
+    parser.add_argument("--backend", default="lexicon")
+    args = parser.parse_args()
+
+    if args.record:
+        record(args.record, args.recordings or DEFAULT_RECORDINGS)
+    else:
+        compare(args.recordings or SAMPLE, args.backend)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,275 @@
+"""Run an EVISession against a local EVI stand-in that drops connections at random.
+
+The stand-in is a WebSocket server speaking a small subset of the EVI
+protocol: chat_metadata on connect (a new chat group, or the one named by
+the resumed_chat_group_id query parameter), user_message echoes plus an
+assistant_message for every user_input, and audio frames that are
+counted. Each connection is aborted after a random, exponentially
+distributed uptime, and a share of the handshakes after the first is
+rejected with 503 or 429, like EVI during an outage. A fake microphone
+streams 20 ms audio frames through the session proxy with the raw `_send`
+the SDK's MicrophoneInterface uses, muted for --speaking-share of every
+second as if the assistant were talking, and user inputs are sent at a
+fixed interval:
+
+    python bench_evi_session.py --duration 20 --mean-uptime 2 --inputs-every 0.5 --reject-rate 0.3
+
+Reports connections, reconnects, rejected handshakes, downtime, whether
+every connection resumed the first chat group, how many inputs were
+delivered, duplicated or lost and how many audio frames were muted, then
+does the same with a single unsupervised connection for comparison
+(--no-baseline to skip).
+"""
+import argparse
+import asyncio
+import contextlib
+import http
+import json
+import logging
+import random
+import time
+import uuid
+from types import SimpleNamespace
+from urllib.parse import parse_qs, urlparse
+
+import websockets
+
+from evi_session import EVISession
+
+FRAME = b"\0" * 640  # 20 ms of 16 kHz mono linear16
+
+
+class StandInServer:
+    """EVI stand-in that aborts each connection after a random uptime."""
+
+    def __init__(self, mean_uptime, reject_rate=0.0, seed=0):
+        self.mean_uptime = mean_uptime
+        self.reject_rate = reject_rate
+        self.rng = random.Random(seed)
+        self.handshakes = 0
+        self.rejected = 0
+        self.groups = []  # chat group of every connection
+        self.inputs = []  # user_input texts in arrival order
+        self.audio_frames = 0
+        self.settings = 0  # session_settings received
+
+    async def process_request(self, path, headers):
+        """Reject some handshakes (never the first) with 503 or 429."""
+        self.handshakes += 1
+        if self.handshakes > 1 and self.rng.random() < self.reject_rate:
+            self.rejected += 1
+            status = self.rng.choice((http.HTTPStatus.SERVICE_UNAVAILABLE, http.HTTPStatus.TOO_MANY_REQUESTS))
+            return status, [], b"EVI unavailable\n"
+        return None
+
+    async def handle(self, ws, path=None):
+        path = path or ws.path
+        resumed = parse_qs(urlparse(path).query).get("resumed_chat_group_id", [None])[0]
+        group = resumed or f"group-{uuid.uuid4().hex[:8]}"
+        self.groups.append(group)
+        await ws.send(json.dumps({"type": "chat_metadata", "chat_id": f"chat-{uuid.uuid4().hex[:8]}",
+                                  "chat_group_id": group}))
+        uptime = self.rng.expovariate(1 / self.mean_uptime)
+        with contextlib.suppress(asyncio.TimeoutError, websockets.ConnectionClosed):
+            await asyncio.wait_for(self._serve(ws), uptime)
+        ws.transport.abort()  # drop without a closing handshake, like a network failure
+
+    async def _serve(self, ws):
+        async for raw in ws:
+            if isinstance(raw, bytes):
+                self.audio_frames += 1  # raw PCM, as hume's MicrophoneInterface sends it
+                continue
+            event = json.loads(raw)
+            if event["type"] == "audio_input":
+                self.audio_frames += 1
+            elif event["type"] == "session_settings":
+                self.settings += 1
+            elif event["type"] == "user_input":
+                self.inputs.append(event["text"])
+                await ws.send(json.dumps({"type": "user_message", "from_text": True,
+                                          "message": {"role": "user", "content": event["text"]}}))
+                await ws.send(json.dumps({"type": "assistant_message", "from_text": False,
+                                          "message": {"role": "assistant", "content": "Got it."}}))
+
+
+def namespace(value):
+    if isinstance(value, dict):
+        return SimpleNamespace(**{key: namespace(item) for key, item in value.items()})
+    return value
+
+
+class StandInSocket:
+    """Client side of the stand-in with the send methods of hume's ChatWebsocketConnection."""
+
+    def __init__(self, ws):
+        self.ws = ws
+
+    async def send_user_input(self, message):
+        await self.ws.send(json.dumps({"type": "user_input", **message}))
+
+    async def send_session_settings(self, message):
+        await self.ws.send(json.dumps({"type": "session_settings", **message}))
+
+    async def send_audio_input(self, data):
+        await self.ws.send(json.dumps({"type": "audio_input", "data": len(data)}))
+
+    async def _send(self, data):
+        await self.ws.send(data)
+
+
+def stand_in_connect(url):
+    """A connect_with_callbacks equivalent for the stand-in server."""
+
+    @contextlib.asynccontextmanager
+    async def connect(resumed_chat_group_id=None, on_open=None, on_message=None, on_close=None, on_error=None):
+        query = f"?resumed_chat_group_id={resumed_chat_group_id}" if resumed_chat_group_id else ""
+        async with websockets.connect(url + query) as ws:
+            async def receive():
+                try:
+                    async for raw in ws:
+                        await on_message(namespace(json.loads(raw)))
+                except websockets.ConnectionClosed as error:
+                    await on_error(error)
+                await on_close()
+
+            await on_open()
+            receiver = asyncio.create_task(receive())
+            try:
+                yield StandInSocket(ws)
+            finally:
+                receiver.cancel()
+    return connect
+
+
+class Handler:
+    def __init__(self):
+        self.messages = []
+
+    def set_socket(self, socket):
+        pass
+
+    async def on_open(self):
+        pass
+
+    async def on_message(self, message):
+        self.messages.append(message)
+
+    async def on_close(self):
+        pass
+
+    async def on_error(self, error):
+        pass
+
+
+async def microphone(socket):
+    """Streams 20 ms frames forever through the raw `_send`, like MicrophoneInterface."""
+    await socket.send_session_settings({"audio": {"encoding": "linear16", "sample_rate": 16000, "channels": 1}})
+    while True:
+        await socket._send(FRAME)
+        await asyncio.sleep(0.02)
+
+
+async def typist(session, count, interval):
+    for i in range(count):
+        await session.send_user_input(f"input {i}")
+        await asyncio.sleep(interval)
+
+
+async def supervised(url, args):
+    handler = Handler()
+    def assistant_speaking():
+        return time.monotonic() % 1.0 < args.speaking_share
+
+    session = EVISession(stand_in_connect(url), handler, base_delay=args.base_delay, stable_after=1.0,
+                         mute_audio=assistant_speaking)
+    runner = asyncio.create_task(session.run())
+    mic = asyncio.create_task(microphone(session.proxy))
+    count = int(args.duration / args.inputs_every)
+    await typist(session, count, args.inputs_every)
+    # Let the outbox drain before stopping.
+    deadline = time.monotonic() + 10
+    while session.stats()["pending_inputs"] and time.monotonic() < deadline:
+        await asyncio.sleep(0.05)
+    alive = not mic.done()
+    session.stop()
+    mic.cancel()
+    await runner
+    return session.stats(), count, alive
+
+
+async def unsupervised(url, args):
+    handler = Handler()
+    connect = stand_in_connect(url)
+    closed = asyncio.Event()
+
+    async def on_close():
+        closed.set()
+
+    count = int(args.duration / args.inputs_every)
+    async with connect(on_open=handler.on_open, on_message=handler.on_message,
+                       on_close=on_close, on_error=handler.on_error) as socket:
+        mic = asyncio.create_task(microphone(socket))
+
+        async def send():
+            for i in range(count):
+                await socket.send_user_input({"text": f"input {i}"})
+                await asyncio.sleep(args.inputs_every)
+
+        sender = asyncio.create_task(send())
+        await asyncio.wait([sender, asyncio.create_task(closed.wait())], return_when=asyncio.FIRST_COMPLETED)
+        for task in (mic, sender):
+            task.cancel()
+        await asyncio.gather(mic, sender, return_exceptions=True)
+    return count
+
+
+def report_inputs(server, count):
+    delivered = set(server.inputs)
+    duplicates = len(server.inputs) - len(delivered)
+    return f"{len(delivered)}/{count} inputs delivered, {duplicates} duplicates, {count - len(delivered)} lost"
+
+
+async def run(args):
+    server = StandInServer(args.mean_uptime, args.reject_rate)
+    async with websockets.serve(server.handle, "127.0.0.1", 0,
+                                process_request=server.process_request) as ws_server:
+        port = ws_server.sockets[0].getsockname()[1]
+        url = f"ws://127.0.0.1:{port}/v0/evi/chat"
+        stats, count, alive = await supervised(url, args)
+        print(f"supervised: {stats['connections']} connections, {stats['reconnects']} reconnects, "
+              f"downtime {stats['downtime_total']:.2f} s (max {stats['downtime_max']:.2f} s), "
+              f"{stats['dropped_sends']} sends dropped while down")
+        print(f"  handshakes rejected {server.rejected}/{server.handshakes}, "
+              f"failed connects counted {stats['failed_connects']}")
+        print(f"  chat groups: {len(set(server.groups))} "
+              f"({'all resumed' if len(set(server.groups)) == 1 else 'NOT resumed'}), "
+              f"session settings sent {server.settings}x, microphone task alive: {alive}")
+        print(f"  {report_inputs(server, count)} ({stats['replayed_inputs']} resends), "
+              f"{server.audio_frames} audio frames received, {stats['muted_sends']} muted")
+
+        if args.baseline:
+            baseline = StandInServer(args.mean_uptime)
+            async with websockets.serve(baseline.handle, "127.0.0.1", 0) as baseline_server:
+                port = baseline_server.sockets[0].getsockname()[1]
+                count = await unsupervised(f"ws://127.0.0.1:{port}/v0/evi/chat", args)
+            print(f"single connection: chat ended after the first drop, {report_inputs(baseline, count)}")
+
+
+def main():
+    logging.getLogger("websockets").setLevel(logging.CRITICAL)  # the aborted connections are intentional
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--duration", type=float, default=20, help="seconds of user inputs")
+    parser.add_argument("--mean-uptime", type=float, default=2.0, help="mean seconds before a drop")
+    parser.add_argument("--inputs-every", type=float, default=0.5)
+    parser.add_argument("--reject-rate", type=float, default=0.3,
+                        help="share of reconnect handshakes rejected with 503/429")
+    parser.add_argument("--base-delay", type=float, default=0.1, help="first reconnect backoff")
+    parser.add_argument("--speaking-share", type=float, default=0.3,
+                        help="share of each second the microphone is muted for the assistant")
+    parser.add_argument("--no-baseline", dest="baseline", action="store_false")
+    args = parser.parse_args()
+    asyncio.run(run(args))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,246 @@
+"""Compare the close-time Firestore save with the write-behind FirestoreWriter.
+
+Replays a simulated EVI chat (messages arriving on the event loop at a fixed
+interval) against an in-memory Firestore fake whose writes block for a
+configurable time and fail at a configurable rate, and reports for each
+strategy how long the event loop was stalled, how much of the chat was
+persisted halfway through (what a crash would keep) and whether every
+message ended up stored exactly once:
+
+    python bench_firestore_writer.py --messages 200 --interval 0.01 --fail-rate 0.2
+
+A third run backs the writer with the local ConversationLog while Firestore
+is down for the first --outage seconds: the chat goes on at full speed, the
+rest is synced once Firestore is back, and anything still unsynced when the
+chat ends is caught up by a fresh writer, as on the next start:
+
+    python bench_firestore_writer.py --outage 1.5
+
+With --emulator the writer runs against the Firestore emulator instead
+(FIRESTORE_EMULATOR_HOST must be set, e.g. localhost:8080).
+"""
+import argparse
+import asyncio
+import datetime
+import os
+import random
+import tempfile
+import threading
+import time
+
+from conversation_log import ConversationLog
+from firestore_writer import FirestoreWriter
+
+
+class InMemoryFirestore:
+    """Just enough of the Firestore client API for FirestoreWriter, with injected faults."""
+
+    def __init__(self, latency=0.05, per_kb=0.001, fail_rate=0.0, outage=0.0, seed=0):
+        self.latency = latency
+        self.down_until = time.monotonic() + outage
+        self.per_kb = per_kb
+        self.fail_rate = fail_rate
+        self.rng = random.Random(seed)
+        self.documents = {}  # path -> data
+        self.writes = 0
+        self.commits = 0
+        self.failures = 0
+        self._lock = threading.Lock()
+
+    def collection(self, name):
+        return FakeCollection(self, name)
+
+    def batch(self):
+        return FakeBatch(self)
+
+    def _apply(self, writes):
+        size = sum(len(repr(data)) for _, data, _ in writes) / 1024
+        time.sleep(self.latency + self.per_kb * size)  # blocking, like the real client
+        with self._lock:
+            if time.monotonic() < self.down_until or self.rng.random() < self.fail_rate:
+                self.failures += 1
+                raise ConnectionError("injected Firestore failure")
+            for path, data, merge in writes:
+                document = self.documents.get(path, {}) if merge else {}
+                self.documents[path] = {**document, **data}
+            self.writes += len(writes)
+            self.commits += 1
+
+
+class FakeCollection:
+    def __init__(self, db, path):
+        self.db = db
+        self.path = path
+
+    def document(self, name):
+        return FakeDocument(self.db, f"{self.path}/{name}")
+
+
+class FakeDocument:
+    def __init__(self, db, path):
+        self.db = db
+        self.path = path
+
+    def collection(self, name):
+        return FakeCollection(self.db, f"{self.path}/{name}")
+
+    def set(self, data, merge=False):
+        self.db._apply([(self.path, data, merge)])
+
+
+class FakeBatch:
+    def __init__(self, db):
+        self.db = db
+        self.writes = []
+
+    def set(self, reference, data, merge=False):
+        self.writes.append((reference.path, data, merge))
+
+    def commit(self):
+        self.db._apply(self.writes)
+
+
+class LoopMonitor:
+    """Measures how late a periodic 5 ms tick fires, i.e. how long the loop was blocked."""
+
+    def __init__(self, period=0.005):
+        self.period = period
+        self.max_lag = 0.0
+        self._task = None
+
+    def start(self):
+        self._task = asyncio.get_running_loop().create_task(self._tick())
+
+    async def _tick(self):
+        while True:
+            start = time.perf_counter()
+            await asyncio.sleep(self.period)
+            self.max_lag = max(self.max_lag, time.perf_counter() - start - self.period)
+
+    def stop(self):
+        self._task.cancel()
+
+
+def make_message(i):
+    return {
+        "role": "USER" if i % 2 == 0 else "ASSISTANT",
+        "message": f"message number {i} " + "lorem ipsum " * 20,
+        "timestamp": datetime.datetime.utcnow(),
+        "emotions": {"Calmness": 0.4, "Interest": 0.3, "Joy": 0.1},
+    }
+
+
+def stored_messages(db, chat_id):
+    prefix = f"Hume/{chat_id}/messages/"
+    return sorted(data["seq"] for path, data in db.documents.items() if path.startswith(prefix))
+
+
+async def close_time_save(db, args):
+    """The original behaviour: one blocking set() of the whole list when the chat ends."""
+    messages, halfway = [], 0
+    monitor = LoopMonitor()
+    monitor.start()
+    for i in range(args.messages):
+        messages.append(make_message(i))
+        await asyncio.sleep(args.interval)
+        if i == args.messages // 2:
+            halfway = len(db.documents)
+    try:
+        db.collection("Hume").document("chat-close").set({"chat_id": "chat-close", "messages": messages})
+        saved = len(messages)
+    except ConnectionError:
+        saved = 0
+    await asyncio.sleep(0.05)
+    monitor.stop()
+    return monitor.max_lag, halfway, saved
+
+
+async def write_behind(db, args, chat_id="chat-wb", log=None, close_timeout=None):
+    monitor = LoopMonitor()
+    monitor.start()
+    halfway = halfway_local = 0
+    writer = FirestoreWriter(db, log=log, max_batch=args.batch, flush_interval=args.flush_interval,
+                             base_delay=0.05, max_delay=0.5, max_retries=3, retry_interval=0.5)
+    writer.start()
+    for i in range(args.messages):
+        writer.add(chat_id, make_message(i))
+        await asyncio.sleep(args.interval)
+        if i == args.messages // 2 and isinstance(db, InMemoryFirestore):
+            halfway = len(stored_messages(db, chat_id))
+            halfway_local = len(log.messages(chat_id)) if log else 0
+    await writer.close(timeout=close_timeout)
+    monitor.stop()
+    return monitor.max_lag, halfway, halfway_local, writer.stats()
+
+
+async def catch_up(db, log):
+    """A new writer on the same log, as after a restart, syncs what is left."""
+    writer = FirestoreWriter(db, log=log, base_delay=0.05, max_delay=0.5)
+    writer.start()
+    await writer.close()
+    return writer.stats()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--messages", type=int, default=200)
+    parser.add_argument("--interval", type=float, default=0.01, help="seconds between messages")
+    parser.add_argument("--latency", type=float, default=0.05, help="seconds per commit")
+    parser.add_argument("--per-kb", type=float, default=0.001, help="seconds per KiB written")
+    parser.add_argument("--fail-rate", type=float, default=0.2)
+    parser.add_argument("--batch", type=int, default=50)
+    parser.add_argument("--flush-interval", type=float, default=0.5)
+    parser.add_argument("--outage", type=float, default=1.5,
+                        help="seconds Firestore is down at the start of the logged run")
+    parser.add_argument("--emulator", action="store_true")
+    args = parser.parse_args()
+
+    if args.emulator:
+        from google.cloud import firestore
+        db = firestore.Client(project="demo-neuropy")
+        lag, _, _, stats = asyncio.run(write_behind(db, args))
+        print(f"emulator: loop stalled {lag * 1000:.1f} ms max, {stats}")
+        return
+
+    print(f"{args.messages} messages every {args.interval * 1000:.0f} ms, "
+          f"{args.latency * 1000:.0f} ms + {args.per_kb * 1000:g} ms/KiB per commit, "
+          f"{args.fail_rate:.0%} failed commits")
+
+    db = InMemoryFirestore(args.latency, args.per_kb, args.fail_rate)
+    lag, halfway, saved = asyncio.run(close_time_save(db, args))
+    print(f"close-time set  loop stalled {lag * 1000:7.1f} ms  "
+          f"persisted at half-time {halfway:4d}  saved {saved}/{args.messages}")
+
+    db = InMemoryFirestore(args.latency, args.per_kb, args.fail_rate)
+    lag, halfway, _, stats = asyncio.run(write_behind(db, args))
+    stored = stored_messages(db, "chat-wb")
+    exact = stored == list(range(args.messages))
+    print(f"write-behind    loop stalled {lag * 1000:7.1f} ms  "
+          f"persisted at half-time {halfway:4d}  saved {len(stored)}/{args.messages} "
+          f"({'each exactly once' if exact else 'MISMATCH'})")
+    print(f"  {stats['batches']} batches, {stats['retries']} retries, {db.failures} injected failures, "
+          f"flush avg {stats['flush_avg'] * 1000:.0f} ms / max {stats['flush_max'] * 1000:.0f} ms, "
+          f"{stats['pending']} pending")
+
+    with tempfile.TemporaryDirectory() as directory:
+        log = ConversationLog(os.path.join(directory, "conversations.sqlite3"))
+        db = InMemoryFirestore(args.latency, args.per_kb, args.fail_rate, outage=args.outage)
+        lag, halfway, halfway_local, stats = asyncio.run(
+            write_behind(db, args, "chat-log", log, close_timeout=0.2))
+        synced_at_close = len(stored_messages(db, "chat-log"))
+        print(f"logged + sync   loop stalled {lag * 1000:7.1f} ms  "
+              f"persisted at half-time {halfway_local:4d} locally, {halfway} remotely  "
+              f"synced at close {synced_at_close}/{args.messages}")
+        log_stats = log.stats()
+        print(f"  Firestore down for {args.outage:g}s: {db.failures} failed commits; "
+              f"append avg {log_stats['append_avg'] * 1e6:.0f} us / max {log_stats['append_max'] * 1e6:.0f} us")
+        db.down_until = 0
+        stats = asyncio.run(catch_up(db, log))
+        stored = stored_messages(db, "chat-log")
+        exact = stored == list(range(args.messages))
+        print(f"  after restart: synced {len(stored)}/{args.messages} "
+              f"({'each exactly once' if exact else 'MISMATCH'}), {log.pending()} left in the log")
+
+
+if __name__ == "__main__":
+    main()
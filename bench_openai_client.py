@@ -0,0 +1,167 @@
+"""Exercise the shared OpenAI client against a local stub API that injects errors.
+
+Starts a stub of the chat-completions and transcription endpoints that adds
+latency, answers a fraction of requests with 429 (with Retry-After) or
+500/503, and counts the TCP connections it accepts. The same batch of
+concurrent requests is then sent bare (one `openai` call each) and through
+`OpenAIClient`, reporting success rate, wall time, connections opened and
+the client's latency histogram. With --stream the chat requests stream
+their answers token by token, and time to first token is compared with the
+total time:
+
+    python bench_openai_client.py --requests 60 --threads 8 --error-rate 0.2
+    python bench_openai_client.py --stream --tokens 200 --token-delay 0.01
+"""
+import argparse
+import io
+import json
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import openai
+
+from openai_client import OpenAIClient
+
+
+class StubServer(ThreadingHTTPServer):
+    def __init__(self, latency, error_rate, tokens=20, token_delay=0.0, seed=0):
+        super().__init__(("127.0.0.1", 0), StubHandler)
+        self.latency = latency
+        self.tokens = tokens
+        self.token_delay = token_delay
+        self.error_rate = error_rate
+        self.rng = random.Random(seed)
+        self.lock = threading.Lock()
+        self.connections = 0
+        self.requests = 0
+
+    def process_request(self, request, client_address):
+        with self.lock:
+            self.connections += 1
+        super().process_request(request, client_address)
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # keep-alive
+
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        server = self.server
+        with server.lock:
+            server.requests += 1
+            roll = server.rng.random()
+        time.sleep(server.latency)
+        if roll < server.error_rate / 2:
+            self._reply(429, {"error": {"message": "Rate limit reached", "type": "requests"}},
+                        {"Retry-After": "0.2"})
+        elif roll < server.error_rate:
+            status = server.rng.choice([500, 503])
+            self._reply(status, {"error": {"message": "Server error", "type": "server_error"}})
+        elif self.path.endswith("/audio/transcriptions"):
+            self._reply(200, {"text": "stub transcript"})
+        elif json.loads(body).get("stream"):
+            self._stream()
+        else:
+            self._reply(200, {
+                "id": "chatcmpl-stub", "object": "chat.completion", "model": "stub",
+                "choices": [{"index": 0, "finish_reason": "stop",
+                             "message": {"role": "assistant", "content": "stub answer"}}],
+                "usage": {"prompt_tokens": 1, "completion_tokens": 1, "total_tokens": 2},
+            })
+
+    def _stream(self):
+        """Server-sent events, one token per chunk, ending the connection when done."""
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Connection", "close")
+        self.end_headers()
+        for i in range(self.server.tokens):
+            chunk = {"id": "chatcmpl-stub", "object": "chat.completion.chunk", "model": "stub",
+                     "choices": [{"index": 0, "delta": {"content": f"tok{i} "},
+                                  "finish_reason": None}]}
+            self.wfile.write(f"data: {json.dumps(chunk)}\n\n".encode("utf-8"))
+            self.wfile.flush()
+            time.sleep(self.server.token_delay)
+        self.wfile.write(b"data: [DONE]\n\n")
+        self.close_connection = True
+
+    def _reply(self, status, payload, headers=None):
+        body = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def streamed_chat(client):
+    def chat(**kwargs):
+        text = "".join(client.chat_stream(**kwargs))
+        return {"choices": [{"message": {"content": text}}]}
+    return chat
+
+
+def request(chat, transcribe, i):
+    if i % 4 == 3:
+        audio = io.BytesIO(b"RIFF" + bytes(1000))
+        audio.name = "chunk.wav"
+        return transcribe("whisper-1", audio)["text"]
+    return chat(model="gpt-3.5-turbo", max_tokens=20,
+                messages=[{"role": "user", "content": f"request {i}"}])["choices"][0]["message"]["content"]
+
+
+def run(label, server, chat, transcribe, n, threads):
+    server.connections = server.requests = 0
+    start = time.perf_counter()
+    with ThreadPoolExecutor(threads) as pool:
+        futures = [pool.submit(request, chat, transcribe, i) for i in range(n)]
+        ok = sum(1 for future in futures if future.exception() is None)
+    wall = time.perf_counter() - start
+    print(f"{label:8s} {ok:3d}/{n} ok  {wall:6.2f}s  "
+          f"{server.requests:4d} HTTP requests  {server.connections:3d} connections")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--requests", type=int, default=60)
+    parser.add_argument("--threads", type=int, default=8)
+    parser.add_argument("--latency", type=float, default=0.05, help="stub seconds per request")
+    parser.add_argument("--error-rate", type=float, default=0.2)
+    parser.add_argument("--rpm", type=float, default=1200)
+    parser.add_argument("--stream", action="store_true", help="stream the chat answers")
+    parser.add_argument("--tokens", type=int, default=100, help="tokens per streamed answer")
+    parser.add_argument("--token-delay", type=float, default=0.01, help="stub seconds per token")
+    args = parser.parse_args()
+
+    server = StubServer(args.latency, args.error_rate, args.tokens, args.token_delay)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    openai.api_base = f"http://127.0.0.1:{server.server_address[1]}/v1"
+    openai.api_key = "stub"
+
+    print(f"{args.requests} requests on {args.threads} threads, "
+          f"{args.error_rate:.0%} injected errors, {args.latency * 1000:.0f} ms stub latency")
+    run("bare", server, openai.ChatCompletion.create, openai.Audio.transcribe,
+        args.requests, args.threads)
+
+    client = OpenAIClient(requests_per_minute=args.rpm, base_delay=0.1, max_delay=2.0)
+    chat = streamed_chat(client) if args.stream else client.chat
+    run("client", server, chat, client.transcribe, args.requests, args.threads)
+    stats = client.stats()
+    print(f"client: {stats['retries']} retries, {stats['failures']} failures, "
+          f"{stats['throttled_seconds']:.2f}s waiting on the rate limit")
+    for endpoint, latency in stats["latency"].items():
+        print(f"  {endpoint:10s} n={latency['count']:3d}  mean {latency['mean'] * 1000:6.1f} ms  "
+              f"p50 <= {latency['p50']:g}s  p95 <= {latency['p95']:g}s")
+    openai.requestssession = None
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,203 @@
+"""Replay EVI audio_output events through the jitter-buffered playback path.
+
+A fake socket delivers audio_output events (base64 WAV chunks) at their
+recorded arrival times, and a fake output device pulls fixed-size blocks
+from the jitter buffer in real time, like the sounddevice callback does.
+For each target depth it reports underruns (gaps heard) and the time from a
+response's first byte to its first sample played. A target of 0 plays each
+chunk as soon as it arrives, like the SDK's byte stream. Events come from a
+recording made with EVI_AUDIO_RECORDING=events.jsonl (see main-fb.py) or are
+synthesized from the WAV fixtures, generated in real time and delayed by
+random network jitter with occasional spikes:
+
+    python bench_playback.py --targets 0,40,80,120,250 --jitter-ms 15 --spike-ms 150
+    python bench_playback.py --events events.jsonl
+
+It also compares the per-chunk decode cost of the old path
+(base64.b64decode(data.encode("utf-8"))) with AudioPlayer.feed.
+"""
+import argparse
+import asyncio
+import base64
+import binascii
+import io
+import json
+import random
+import threading
+import time
+import wave
+
+import numpy as np
+
+from audio_playback import AudioPlayer, JitterBuffer, parse_wav
+
+FIXTURES = ["tell me about your day.wav", "thanks for sharing.wav"]
+
+
+def wav_chunk(frames, fs, channels):
+    out = io.BytesIO()
+    with wave.open(out, "wb") as wav:
+        wav.setnchannels(channels)
+        wav.setsampwidth(2)
+        wav.setframerate(fs)
+        wav.writeframes(frames.tobytes())
+    return base64.b64encode(out.getvalue()).decode("ascii")
+
+
+def synthetic_events(paths, chunk_ms, jitter_ms, spike_rate, spike_ms, gap, seed=0):
+    """audio_output/assistant_end events with arrival times, one response per WAV file."""
+    rng = random.Random(seed)
+    events = []
+    start = 0.0
+    for path in paths:
+        with wave.open(path) as wav:
+            fs, channels = wav.getframerate(), wav.getnchannels()
+            frames = np.frombuffer(wav.readframes(wav.getnframes()), dtype=np.int16).reshape(-1, channels)
+        step = int(fs * chunk_ms / 1000)
+        arrived = start
+        for i in range(0, len(frames), step):
+            # Generated in real time, delivered in order after a random network delay.
+            delay = rng.expovariate(1000 / jitter_ms) if jitter_ms else 0.0
+            if rng.random() < spike_rate:
+                delay += spike_ms / 1000
+            arrived = max(arrived, start + i / fs + delay)
+            events.append({"t": arrived, "type": "audio_output", "data": wav_chunk(frames[i:i + step], fs, channels)})
+        events.append({"t": arrived, "type": "assistant_end"})
+        start = arrived + len(frames) / fs + gap
+    return events
+
+
+def load_events(path):
+    with open(path) as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+class FakeSocket:
+    """Yields recorded events at their (relative) arrival times."""
+
+    def __init__(self, events):
+        self.events = events
+
+    async def __aiter__(self):
+        start = time.perf_counter()
+        origin = self.events[0]["t"] if self.events else 0.0
+        for event in self.events:
+            delay = start + event["t"] - origin - time.perf_counter()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            yield event
+
+
+class FakeOutputDevice(threading.Thread):
+    """Pulls one block from the jitter buffer every block period, like an audio callback."""
+
+    def __init__(self, buffer, block_ms):
+        super().__init__(daemon=True)
+        self.buffer = buffer
+        self.block = int(buffer.fs * block_ms / 1000)
+        self.stopped = threading.Event()
+
+    def run(self):
+        out = np.zeros((self.block, self.buffer.channels), dtype=np.int16)
+        period = self.block / self.buffer.fs
+        deadline = time.perf_counter()
+        while not self.stopped.is_set():
+            deadline += period
+            time.sleep(max(0.0, deadline - time.perf_counter()))
+            self.buffer.read(out)
+
+
+class FakeOutputPlayer(AudioPlayer):
+    """AudioPlayer whose output stream is a FakeOutputDevice instead of sounddevice."""
+
+    def _open(self, fs, channels):
+        self._stream = FakeOutputDevice(self.buffer, self.block_ms)
+        self._stream.start()
+
+    def close(self):
+        if self._stream is not None:
+            self._stream.stopped.set()
+            self._stream.join()
+            self._stream = None
+
+
+async def replay(events, player):
+    """Dispatch events as main-fb.py's WebSocketHandler does, then wait for playback to drain."""
+    async for event in FakeSocket(events):
+        if event["type"] == "audio_output":
+            player.feed(event["data"])
+        elif event["type"] == "assistant_end":
+            player.mark_end()
+        elif event["type"] == "user_interruption":
+            player.clear()
+    while player.buffer is not None and player.buffer.stats()["depth_ms"] > 0:
+        await asyncio.sleep(0.01)
+    await asyncio.sleep(0.05)
+    player.close()
+    return player.stats()
+
+
+def decode_costs(events, repeat):
+    chunks = [event["data"] for event in events if event["type"] == "audio_output"]
+    start = time.perf_counter()
+    for _ in range(repeat):
+        for data in chunks:
+            base64.b64decode(data.encode("utf-8"))
+    old = time.perf_counter() - start
+    start = time.perf_counter()
+    for _ in range(repeat):
+        for data in chunks:
+            binascii.a2b_base64(data)
+    decode = time.perf_counter() - start
+
+    fs, channels, _ = parse_wav(binascii.a2b_base64(chunks[0]))
+    buffer = JitterBuffer(fs, channels, capacity_ms=60000)
+    out = np.zeros((len(chunks) * 48000, channels), dtype=np.int16)
+    start = time.perf_counter()
+    for _ in range(repeat):
+        for data in chunks:
+            _, _, pcm = parse_wav(binascii.a2b_base64(data))
+            buffer.write(np.frombuffer(pcm, dtype=np.int16).reshape(-1, channels))
+        buffer.read(out[:buffer.stats()["max_depth"]])
+        buffer.clear()
+    new = time.perf_counter() - start
+    count = len(chunks) * repeat
+    return old / count, decode / count, new / count
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--events", help="JSONL recording of audio_output events (default: synthesize)")
+    parser.add_argument("--targets", default="0,40,80,120,250", help="jitter buffer depths in ms")
+    parser.add_argument("--block-ms", type=float, default=20)
+    parser.add_argument("--chunk-ms", type=float, default=100, help="synthetic chunk length")
+    parser.add_argument("--jitter-ms", type=float, default=15, help="mean random network delay")
+    parser.add_argument("--spike-rate", type=float, default=0.05)
+    parser.add_argument("--spike-ms", type=float, default=150)
+    parser.add_argument("--gap", type=float, default=0.3, help="seconds between responses")
+    parser.add_argument("--repeat", type=int, default=20, help="decode benchmark repetitions")
+    args = parser.parse_args()
+
+    if args.events:
+        events = load_events(args.events)
+        print(f"{args.events}: {len(events)} events")
+    else:
+        events = synthetic_events(FIXTURES, args.chunk_ms, args.jitter_ms, args.spike_rate,
+                                  args.spike_ms, args.gap)
+        print(f"synthetic: {len(events)} events, {args.chunk_ms:.0f} ms chunks, "
+              f"jitter {args.jitter_ms:.0f} ms, {args.spike_rate:.0%} spikes of {args.spike_ms:.0f} ms")
+
+    print(f"{'target':>8} {'underruns':>10} {'gap ms':>8} {'first audio p50':>16} {'max':>8}")
+    for target in (int(value) for value in args.targets.split(",")):
+        player = FakeOutputPlayer(target_ms=target, block_ms=args.block_ms)
+        stats = asyncio.run(replay(events, player))
+        print(f"{target:6d}ms {stats['underruns']:10d} {stats['underrun_ms']:8.0f} "
+              f"{stats.get('first_audio_ms_p50', 0):13.1f} ms {stats.get('first_audio_ms_max', 0):5.1f} ms")
+
+    old, decode, new = decode_costs(events, args.repeat)
+    print(f"per chunk: b64decode(data.encode()) {old * 1e6:6.1f} us   a2b_base64(data) {decode * 1e6:6.1f} us   "
+          f"a2b_base64 + parse + buffer write {new * 1e6:6.1f} us")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,64 @@
+"""Compare per-play WAV parsing with the preloaded prompt-audio cache.
+
+For each prompt clip, times what play_audio used to do before every play
+(os.path.exists plus parsing the file, via simpleaudio's from_wave_file when
+it is installed, otherwise the same wave-module read) against the one-time
+decode and the per-play lookup of prompt_audio, and reports how long the
+old blocking play held the app (the clip's duration) compared with the time
+until the non-blocking play returns (measured when simpleaudio and an
+output device are available):
+
+    python bench_prompt_audio.py --repeat 200
+"""
+import argparse
+import os
+import time
+
+import prompt_audio
+from prompt_audio import PROMPTS, decode, get_clip, preload, prompt_metrics
+
+
+def parse_per_play(path):
+    os.path.exists(path)
+    if prompt_audio.sa is not None:
+        return prompt_audio.sa.WaveObject.from_wave_file(path)
+    return decode(path)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--repeat", type=int, default=200)
+    parser.add_argument("--play", action="store_true", help="also play each clip once (needs an output device)")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    missing = preload(PROMPTS)
+    print(f"startup: {len(PROMPTS) - len(missing)} clip(s) decoded in {(time.perf_counter() - start) * 1000:.2f} ms"
+          + (f", missing {missing}" if missing else ""))
+
+    for path in PROMPTS:
+        if path in missing:
+            continue
+        start = time.perf_counter()
+        for _ in range(args.repeat):
+            parse_per_play(path)
+        per_play = (time.perf_counter() - start) / args.repeat
+        start = time.perf_counter()
+        for _ in range(args.repeat):
+            get_clip(path)
+        cached = (time.perf_counter() - start) / args.repeat
+        clip = get_clip(path)
+        print(f"{path}: {len(clip.frames) / 1024:.0f} KiB, {clip.duration:.2f} s; "
+              f"per-play parse {per_play * 1000:.3f} ms vs cached lookup {cached * 1e6:.2f} us; "
+              f"blocking play held the app {clip.duration:.2f} s")
+        if args.play:
+            prompt_audio.play(path).wait_done()
+
+    if args.play:
+        metrics = prompt_metrics()
+        print(f"playback start: avg {metrics['play_start_avg'] * 1000:.2f} ms, "
+              f"max {metrics['play_start_max'] * 1000:.2f} ms over {metrics['plays']} plays")
+
+
+if __name__ == "__main__":
+    main()
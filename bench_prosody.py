@@ -0,0 +1,127 @@
+"""Benchmark the compact prosody representation against score dicts.
+
+Generates synthetic sessions of voiced messages with 48 Hume prosody scores
+and compares, for the dict form and the float32/MessageRecord form: memory
+per message, estimated Firestore document size, and the time to aggregate
+the mean of every emotion across all sessions (dicts in memory vs the .npy
+memmap vs Parquet). Also checks the dict <-> array round trip and times the
+rolling aggregator against sorting each dict for its top 3:
+
+    python bench_prosody.py --sessions 2000 --messages 50
+"""
+import argparse
+import datetime
+import os
+import tempfile
+import time
+import tracemalloc
+
+import numpy as np
+
+import prosody
+from prosody import EMOTIONS, MessageRecord, decode, encode
+from prosody_aggregator import ProsodyAggregator
+
+
+def synthetic_rows(sessions, messages, seed=0):
+    rng = np.random.default_rng(seed)
+    start = datetime.datetime(2024, 1, 1)
+    for s in range(sessions):
+        for m in range(messages):
+            scores = rng.dirichlet(np.ones(len(EMOTIONS))).astype(np.float32)
+            yield f"chat-{s:05d}", m, {
+                "role": "USER" if m % 2 == 0 else "ASSISTANT",
+                "message": "synthetic message",
+                "timestamp": start + datetime.timedelta(minutes=s, seconds=m),
+                "emotions": {name: float(score) for name, score in zip(EMOTIONS, scores)},
+            }
+
+
+def firestore_size(value):
+    """Storage size of a Firestore value (strings: bytes + 1, numbers/timestamps: 8, null: 1)."""
+    if isinstance(value, dict):
+        return sum(len(key.encode()) + 1 + firestore_size(item) for key, item in value.items())
+    if isinstance(value, list):
+        return sum(firestore_size(item) for item in value)
+    if isinstance(value, str):
+        return len(value.encode()) + 1
+    if value is None:
+        return 1
+    return 8
+
+
+def measure(build):
+    tracemalloc.start()
+    objects = build()
+    size = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return objects, size
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sessions", type=int, default=2000)
+    parser.add_argument("--messages", type=int, default=50)
+    args = parser.parse_args()
+    n = args.sessions * args.messages
+
+    dict_rows, dict_bytes = measure(lambda: list(synthetic_rows(args.sessions, args.messages)))
+    record_rows, record_bytes = measure(lambda: [
+        (chat_id, seq, MessageRecord.from_dict(data)) for chat_id, seq, data in dict_rows])
+    print(f"{n} messages ({args.sessions} sessions x {args.messages})")
+    print(f"memory per message:   dict {dict_bytes / n:7.0f} B   record {record_bytes / n:7.0f} B")
+    print(f"Firestore doc size:   dict {firestore_size(dict_rows[0][2]):7d} B   "
+          f"record {firestore_size(record_rows[0][2].to_document()):7d} B")
+
+    # Lossless round trips: dict -> array -> dict, and record -> stored document -> record.
+    assert all(decode(encode(data["emotions"])) == data["emotions"] for _, _, data in dict_rows[:1000])
+    assert all(np.array_equal(MessageRecord.from_dict(record.to_document()).scores, record.scores)
+               for _, _, record in record_rows[:1000])
+    print("round trips:          exact")
+
+    start = time.perf_counter()
+    sums = dict.fromkeys(EMOTIONS, 0.0)
+    for _, _, data in dict_rows:
+        for name, score in data["emotions"].items():
+            sums[name] += score
+    dict_mean = np.array([sums[name] / n for name in EMOTIONS])
+    dict_time = time.perf_counter() - start
+
+    with tempfile.TemporaryDirectory() as directory:
+        npy_dir = os.path.join(directory, "npy")
+        prosody.export_npy(record_rows, npy_dir)
+        start = time.perf_counter()
+        npy_mean = prosody.load_npy(npy_dir)["scores"].mean(axis=0, dtype=np.float64)
+        npy_time = time.perf_counter() - start
+        npy_size = os.path.getsize(os.path.join(npy_dir, "scores.npy"))
+
+        timings = f"dicts {dict_time * 1000:7.1f} ms   npy memmap {npy_time * 1000:6.1f} ms"
+        if prosody.pa is not None:
+            parquet_path = os.path.join(directory, "prosody.parquet")
+            prosody.export_parquet(record_rows, parquet_path)
+            start = time.perf_counter()
+            parquet_mean = prosody.load_parquet(parquet_path)["scores"].mean(axis=0, dtype=np.float64)
+            timings += f"   parquet {(time.perf_counter() - start) * 1000:6.1f} ms"
+            assert np.allclose(parquet_mean, dict_mean, atol=1e-6)
+        assert np.allclose(npy_mean, dict_mean, atol=1e-6)
+    print(f"mean of every emotion over all messages: {timings}")
+    print(f"score matrix on disk: {npy_size / 2**20:.1f} MiB")
+
+    sample = dict_rows[:5000]
+    start = time.perf_counter()
+    for _, _, data in sample:
+        dict(sorted(data["emotions"].items(), key=lambda item: item[1], reverse=True)[:3])
+    sort_time = time.perf_counter() - start
+    aggregator = ProsodyAggregator(k=3)
+    arrays = [record.scores for _, _, record in record_rows[:len(sample)]]
+    start = time.perf_counter()
+    for seq, scores in enumerate(arrays):
+        aggregator.update(scores, seq)
+        aggregator.snapshot()
+    aggregate_time = time.perf_counter() - start
+    print(f"per message: sort dict for top 3 {sort_time / len(sample) * 1e6:5.1f} us   "
+          f"aggregator update + snapshot {aggregate_time / len(sample) * 1e6:5.1f} us")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,166 @@
+"""Microbenchmark: per-callback bytes() copies vs the preallocated SampleRing.
+
+Simulates PortAudio callbacks delivering int16 frames and a consumer pulling
+audio for Kaldi, once through `bytes(indata)` + queue.Queue (the old path)
+and once through SampleRing memoryview blocks. Each path is measured in
+separate passes so the measurements do not disturb each other:
+
+- callback cost (mean and p99) with tracemalloc off;
+- allocations made by the callback: tracemalloc snapshots around a burst of
+  callbacks the consumer has not drained yet, so every buffer they allocate
+  is still alive and counted (blocks and bytes per callback), plus the
+  `sys.getallocatedblocks()` delta over the same burst;
+- peak traced memory, collections and GC pause time of a steady-state run
+  (the ring's peak is its one preallocated buffer; bytes objects are not
+  tracked by the cyclic GC, so neither path is expected to trigger it).
+
+    python bench_ring_buffer.py --seconds 600 --frames 512
+"""
+import argparse
+import gc
+import queue
+import sys
+import time
+import tracemalloc
+
+import numpy as np
+
+from audio_buffer import SampleRing
+
+FS = 16000
+
+
+class GcTimer:
+    """Count collections and total pause time via gc.callbacks."""
+
+    def __init__(self):
+        self.collections = 0
+        self.pause = 0.0
+        self._start = None
+
+    def __call__(self, phase, info):
+        if phase == "start":
+            self._start = time.perf_counter()
+        elif self._start is not None:
+            self.pause += time.perf_counter() - self._start
+            self.collections += 1
+            self._start = None
+
+
+class BytesPath:
+    """The old path: a bytes copy per callback, queued for the consumer."""
+
+    def __init__(self, block):
+        self.queue = queue.Queue()
+
+    def callback(self, frame):
+        self.queue.put_nowait(bytes(frame))
+
+    def drain(self):
+        while not self.queue.empty():
+            self.queue.get_nowait()
+
+
+class RingPath:
+    def __init__(self, block):
+        self.ring = SampleRing(seconds=10, fs=FS, block_samples=block)
+
+    def callback(self, frame):
+        self.ring.write(frame)
+
+    def drain(self):
+        try:
+            while True:
+                self.ring.read(timeout=0)
+        except queue.Empty:
+            pass
+
+
+def callback_cost(path, callbacks, frame, block):
+    """Per-callback seconds with tracemalloc off, draining like the consumer."""
+    costs = np.empty(callbacks)
+    per_block = max(1, block // frame.shape[0])
+    for i in range(callbacks):
+        start = time.perf_counter()
+        path.callback(frame)
+        costs[i] = time.perf_counter() - start
+        if i % per_block == per_block - 1:
+            path.drain()
+    return costs
+
+
+def run(path, callbacks, frame, block):
+    """The same loop without timing, so nothing but the path allocates."""
+    per_block = max(1, block // frame.shape[0])
+    for i in range(callbacks):
+        path.callback(frame)
+        if i % per_block == per_block - 1:
+            path.drain()
+
+
+def allocations(path, burst, frame):
+    """Blocks and bytes still allocated after `burst` undrained callbacks, per callback."""
+    path.callback(frame)  # warm up lazily created internals
+    path.drain()
+    gc.collect()
+    tracemalloc.start()
+    before = tracemalloc.take_snapshot()
+    blocks_before = sys.getallocatedblocks()
+    for _ in range(burst):
+        path.callback(frame)
+    blocks_after = sys.getallocatedblocks()
+    after = tracemalloc.take_snapshot()
+    tracemalloc.stop()
+    path.drain()
+    diff = after.compare_to(before, "filename")
+    own = [stat for stat in diff if not stat.traceback[0].filename.endswith("tracemalloc.py")]
+    return (sum(stat.count_diff for stat in own) / burst,
+            sum(stat.size_diff for stat in own) / burst,
+            (blocks_after - blocks_before) / burst)
+
+
+def steady_state(factory, callbacks, frame, block):
+    """Peak traced memory (the path's own buffers included) and GC activity of a full run."""
+    timer = GcTimer()
+    gc.collect()
+    gc.callbacks.append(timer)
+    tracemalloc.start()
+    run(factory(block), callbacks, frame, block)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    gc.callbacks.remove(timer)
+    return peak, timer
+
+
+def measure(name, factory, callbacks, frame, block, burst):
+    costs = callback_cost(factory(block), callbacks, frame, block)
+    blocks, size, allocated_blocks = allocations(factory(block), burst, frame)
+    peak, timer = steady_state(factory, callbacks, frame, block)
+    print(f"{name:>6}: callback mean {costs.mean() * 1e6:5.2f} us, p99 {np.percentile(costs, 99) * 1e6:5.2f} us; "
+          f"per callback {blocks:5.2f} blocks / {size:6.0f} B traced, "
+          f"{allocated_blocks:+5.2f} getallocatedblocks; "
+          f"peak traced {peak / 1024:.0f} KiB, {timer.collections} GCs ({timer.pause * 1000:.2f} ms paused)")
+    return costs.mean()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--seconds", type=float, default=600, help="simulated audio length")
+    parser.add_argument("--frames", type=int, default=512, help="samples per callback")
+    parser.add_argument("--block", type=int, default=4000, help="samples per Kaldi block")
+    parser.add_argument("--burst", type=int, default=200, help="undrained callbacks per allocation count")
+    args = parser.parse_args()
+
+    callbacks = int(args.seconds * FS / args.frames)
+    frame = np.random.default_rng(0).integers(
+        -3000, 3000, (args.frames, 1), dtype=np.int16)
+    # The ring must hold the whole undrained burst.
+    burst = min(args.burst, int(10 * FS * 0.9) // args.frames)
+    print(f"{callbacks} callbacks of {args.frames} samples ({args.seconds:g}s of audio)")
+    old = measure("bytes", BytesPath, callbacks, frame, args.block, burst)
+    new = measure("ring", RingPath, callbacks, frame, args.block, burst)
+    print(f"ring callback is {new / old:.2f}x the bytes() callback")
+
+
+if __name__ == "__main__":
+    main()
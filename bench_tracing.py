@@ -0,0 +1,98 @@
+"""Measure the cost of tracing spans and show what a traced session exports.
+
+Times an empty `with span(...)` block with tracing off and on against no
+span at all, then runs a small simulated session (capture waits, decode
+blocks, concurrent analyses on the shared executor and a Whisper-style
+worker thread) in two tracers at once, checks that every span landed in
+its own session, and prints the percentile summary and the Prometheus
+text:
+
+    python bench_tracing.py --iterations 200000
+"""
+import argparse
+import threading
+import time
+
+import tracing
+from analysis import run_analyses
+from tracing import Tracer, activate, context_run, deactivate, get_tracer, span, to_prometheus, traced
+
+
+def per_call(func, iterations):
+    start = time.perf_counter()
+    for _ in range(iterations):
+        func()
+    return (time.perf_counter() - start) / iterations
+
+
+def overhead(iterations):
+    def bare():
+        pass
+
+    def spanned():
+        with span("bench.empty"):
+            pass
+
+    token = activate(Tracer("overhead", max_spans=1000))
+    tracing.enable(False)
+    baseline = per_call(bare, iterations)
+    off = per_call(spanned, iterations)
+    tracing.enable(True)
+    on = per_call(spanned, iterations)
+    deactivate(token)
+    return baseline, off, on
+
+
+@traced("whisper.transcribe")
+def fake_transcribe(seconds):
+    time.sleep(seconds)
+
+
+def session(name, blocks, results):
+    tracer = get_tracer(name)
+    activate(tracer)
+    for _ in range(blocks):
+        with span("capture.wait"):
+            time.sleep(0.002)
+        with span("vosk.accept_waveform"):
+            time.sleep(0.001)
+    worker = threading.Thread(target=context_run(fake_transcribe), args=(0.02,))
+    worker.start()
+    chat = traced("openai.chat")(time.sleep)
+    analyses = {"Sentiment Analysis": lambda text: chat(0.03), "Entity Extraction": lambda text: chat(0.05)}
+    with span("analysis.total"):
+        list(run_analyses(analyses, "text"))
+    worker.join()
+    results[name] = tracer
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--iterations", type=int, default=200000)
+    parser.add_argument("--blocks", type=int, default=50)
+    args = parser.parse_args()
+
+    baseline, off, on = overhead(args.iterations)
+    print(f"per span: no span {baseline * 1e9:.0f} ns, tracing off {off * 1e9:.0f} ns, "
+          f"tracing on {on * 1e9:.0f} ns")
+
+    tracing.enable(True)
+    results = {}
+    threads = [threading.Thread(target=session, args=(f"session-{i}", args.blocks, results)) for i in range(2)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    for name, tracer in sorted(results.items()):
+        summary = tracer.summary()
+        assert summary["capture.wait"]["count"] == args.blocks, summary
+        assert summary["whisper.transcribe"]["count"] == 1, summary
+        assert summary["openai.chat"]["count"] == 2, summary
+        print(f"\n{name}:")
+        print(tracer.format_summary())
+    print(f"\nspans outside any session: {sum(s['count'] for s in tracing.current().summary().values())}")
+    print("\n" + to_prometheus(list(results.values()))[:600] + "...")
+
+
+if __name__ == "__main__":
+    main()
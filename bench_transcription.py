@@ -0,0 +1,107 @@
+"""Benchmark the Vosk transcription path on replayed WAV files, no microphone needed.
+
+WAV files are replayed through WavReplaySource into the same SampleRing and
+StreamingTranscript path app.py uses, in real time, at N times real time or
+as fast as the recognizer takes them (speed 0). For each speed it reports
+the real-time factor (decode time / audio duration), the latency of every
+utterance (from the delivery of the file's last sample to its final
+result), and the time from the end of the file containing the stop phrase
+to the moment it is detected (when a partial result catches it before
+the file ends: minus the seconds of audio still to come). The closing
+fixture stands in for the stop phrase by default:
+
+    python bench_transcription.py --model vosk-model-small-en-us-0.15 --speeds 1,4,0
+    python bench_transcription.py a.wav b.wav --stop-phrase "that's it"
+"""
+import argparse
+import queue
+import time
+
+import numpy as np
+
+from audio_buffer import SampleRing
+from audio_source import WavReplaySource
+from vosk_engine import StreamingTranscript, new_recognizer
+
+FS = 16000
+
+
+def run(args, speed):
+    ring = SampleRing(10, FS, args.block_samples)
+    transcript = StreamingTranscript(new_recognizer(args.model, FS), stop_phrase=args.stop_phrase)
+    source = WavReplaySource(args.files, FS, speed=speed, blocksize=args.callback_frames, gap=args.gap,
+                             callback=lambda indata, frames, time, status: ring.write(indata),
+                             throttle=lambda: ring.stats()["depth"] < 2 * args.block_samples)
+    ends = list(source.ends)
+    latencies, stop_latency, decode = [], None, 0.0
+    consumed = 0
+    # Keep decoding into the trailing silence until the last utterance is final.
+    limit = source.samples.size + int(args.tail * FS)
+    start = time.perf_counter()
+    with source:
+        while consumed < limit and not transcript.stopped:
+            try:
+                block = ring.read(timeout=5)
+            except queue.Empty:
+                break
+            consumed += len(block)
+            t = time.perf_counter()
+            text = transcript.accept(block)
+            now = time.perf_counter()
+            decode += now - t
+            if text:
+                finished = [end for end in ends if end <= consumed]
+                if finished:
+                    ends.remove(finished[-1])
+                    latencies.append(now - source.delivered_at(finished[-1] - 1))
+            if transcript.stopped:
+                stop_end = source.ends[args.stop_file]
+                if consumed >= stop_end:
+                    stop_latency = now - source.delivered_at(stop_end - 1)
+                else:  # caught by a partial result before the file ended
+                    stop_latency = -(stop_end - consumed) / FS
+    wall = time.perf_counter() - start
+    audio = min(consumed, limit) / FS
+    return {
+        "wall": wall,
+        "rtf": decode / audio,
+        "latencies": latencies,
+        "stop": stop_latency,
+        "stop_source": transcript.stop_source,
+        "overruns": ring.stats()["overruns"],
+        "text": transcript.text,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("files", nargs="*", default=["tell me about your day.wav", "thanks for sharing.wav"])
+    parser.add_argument("--model", default="vosk-model-small-en-us-0.15")
+    parser.add_argument("--speeds", default="1,4,0", help="replay speeds; 0 = as fast as possible")
+    parser.add_argument("--stop-phrase", default="thanks for sharing")
+    parser.add_argument("--stop-file", type=int, default=-1, help="index of the file saying the stop phrase")
+    parser.add_argument("--gap", type=float, default=1.0, help="seconds of silence after each file")
+    parser.add_argument("--tail", type=float, default=1.0, help="extra silence decoded at the end")
+    parser.add_argument("--block-samples", type=int, default=4000, help="samples per AcceptWaveform call")
+    parser.add_argument("--callback-frames", type=int, default=1024, help="frames per audio callback")
+    args = parser.parse_args()
+
+    for speed in (float(value) for value in args.speeds.split(",")):
+        result = run(args, speed)
+        latencies = result["latencies"]
+        label = f"{speed:g}x" if speed else "max"
+        line = (f"{label:>5}: wall {result['wall']:6.2f} s, RTF {result['rtf']:.3f}, "
+                f"{len(latencies)} utterances")
+        if latencies:
+            line += (f", latency p50 {np.percentile(latencies, 50) * 1000:.0f} ms "
+                     f"max {max(latencies) * 1000:.0f} ms")
+        if result["stop"] is not None:
+            line += f", stop phrase ({result['stop_source']}) {result['stop'] * 1000:+.0f} ms"
+        else:
+            line += ", stop phrase not detected"
+        print(line + f", {result['overruns']} overruns")
+    print(f"transcript: {result['text']!r}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,100 @@
+"""Benchmark fixed 10 s Whisper windows against VAD segmentation.
+
+Builds a sparse "home speech" stream from recorded WAV fixtures (each clip
+followed by a gap of low-level background noise), then reports how many
+chunks each strategy would upload, how much audio that is, and how long after
+the end of an utterance its chunk is ready for transcription:
+
+    python bench_vad.py "tell me about your day.wav" "thanks for sharing.wav" --gap 8
+"""
+import argparse
+import math
+import time
+
+import numpy as np
+
+from audio_codec import read_wav
+from vad import VadSegmenter
+
+FS = 16000
+
+
+def build_stream(clips, gap, repeat, noise_level, seed=0):
+    """Concatenate clips separated by noise; returns (samples, utterance end times)."""
+    rng = np.random.default_rng(seed)
+    parts, ends, position = [], [], 0
+    for _ in range(repeat):
+        for clip in clips:
+            parts.append(clip)
+            position += clip.size
+            ends.append(position / FS)
+            silence = rng.normal(0, noise_level, int(gap * FS)).astype(np.int16)
+            parts.append(silence)
+            position += silence.size
+    return np.concatenate(parts), ends
+
+
+def fixed_windows(samples, ends, duration):
+    total = samples.size / FS
+    calls = math.ceil(total / duration)
+    delays = [math.ceil(end / duration) * duration - end for end in ends]
+    return calls, calls * duration, delays
+
+
+def vad_segments(samples, ends, segmenter, block=FS // 10):
+    ready, uploaded = [], 0.0
+    start = time.perf_counter()
+    for offset in range(0, samples.size, block):
+        for segment in segmenter.feed(samples[offset:offset + block]):
+            ready.append((offset + block) / FS)
+            uploaded += segment.size / FS
+    last = segmenter.flush()
+    if last is not None:
+        ready.append(samples.size / FS)
+        uploaded += last.size / FS
+    cpu = time.perf_counter() - start
+
+    delays = []
+    for end in ends:
+        after = [t for t in ready if t >= end]
+        if after:
+            delays.append(after[0] - end)
+    return len(ready), uploaded, delays, cpu
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("wavs", nargs="*",
+                        default=["tell me about your day.wav", "thanks for sharing.wav"])
+    parser.add_argument("--gap", type=float, default=8.0, help="silence after each clip (s)")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--noise", type=float, default=40.0, help="background noise RMS")
+    parser.add_argument("--window", type=float, default=10.0, help="fixed window length (s)")
+    parser.add_argument("--api-latency", type=float, default=1.0,
+                        help="assumed Whisper round trip per call (s)")
+    parser.add_argument("--min-segment", type=float, default=1.0)
+    parser.add_argument("--max-segment", type=float, default=10.0)
+    parser.add_argument("--threshold", type=float, default=300)
+    args = parser.parse_args()
+
+    clips = [read_wav(path, FS) for path in args.wavs]
+    samples, ends = build_stream(clips, args.gap, args.repeat, args.noise)
+    total = samples.size / FS
+    print(f"stream: {total:.1f}s, {len(ends)} utterances")
+
+    calls, uploaded, delays = fixed_windows(samples, ends, args.window)
+    print(f"fixed {args.window:g}s: {calls} calls, {uploaded:.1f}s uploaded, "
+          f"~{calls * args.api_latency:.1f}s API time, "
+          f"mean ready delay {np.mean(delays):.2f}s")
+
+    segmenter = VadSegmenter(threshold=args.threshold, min_segment=args.min_segment,
+                             max_segment=args.max_segment)
+    calls, uploaded, delays, cpu = vad_segments(samples, ends, segmenter)
+    print(f"vad:       {calls} calls, {uploaded:.1f}s uploaded, "
+          f"~{calls * args.api_latency:.1f}s API time, "
+          f"mean ready delay {np.mean(delays):.2f}s, "
+          f"{segmenter.dropped} dropped, RTF {cpu / total:.4f}")
+
+
+if __name__ == "__main__":
+    main()
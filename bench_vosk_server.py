@@ -0,0 +1,94 @@
+"""Load-test the multi-stream Vosk server by replaying WAV files as N parallel streams.
+
+Each stream sends one WAV file (mono int16 at 16 kHz after conversion) in
+fixed-size blocks, optionally paced at real time, and waits for the reply to
+each block. Reports per-stream and aggregate real-time factor
+(decode wall time / audio duration):
+
+    python bench_vosk_server.py --streams 8 --model vosk-model-small-en-us-0.15
+    python bench_vosk_server.py --streams 8 --url ws://hub.local:2700
+"""
+import argparse
+import asyncio
+import json
+import time
+
+import numpy as np
+import websockets
+
+from audio_codec import read_wav
+from vosk_server import RecognitionServer
+
+FS = 16000
+
+
+async def replay(url, samples, block_seconds, realtime):
+    """Stream one recording; returns (wall seconds, final text)."""
+    block = int(block_seconds * FS)
+    start = time.perf_counter()
+    async with websockets.connect(url, max_size=None) as websocket:
+        for offset in range(0, samples.size, block):
+            await websocket.send(samples[offset:offset + block].tobytes())
+            await websocket.recv()
+            if realtime:
+                await asyncio.sleep(max(0, start + (offset + block) / FS - time.perf_counter()))
+        await websocket.send('{"eof" : 1}')
+        final = json.loads(await websocket.recv())
+    return time.perf_counter() - start, final.get("text", "")
+
+
+async def run(args, url):
+    recordings = [read_wav(path, FS) for path in args.wavs]
+    streams = [recordings[i % len(recordings)] for i in range(args.streams)]
+    audio_seconds = sum(samples.size for samples in streams) / FS
+
+    start = time.perf_counter()
+    results = await asyncio.gather(*(
+        replay(url, samples, args.block, args.realtime) for samples in streams))
+    wall = time.perf_counter() - start
+
+    rtfs = [elapsed / (samples.size / FS) for (elapsed, _), samples in zip(results, streams)]
+    for i, ((elapsed, text), rtf) in enumerate(zip(results, rtfs)):
+        print(f"stream {i:3d}: {elapsed:6.2f}s  RTF {rtf:5.2f}  {text!r}")
+    print(f"{args.streams} streams, {audio_seconds:.1f}s audio in {wall:.2f}s")
+    print(f"per-stream RTF: mean {np.mean(rtfs):.2f}, p95 {np.percentile(rtfs, 95):.2f}")
+    print(f"aggregate RTF: {wall / audio_seconds:.3f} "
+          f"({audio_seconds / wall:.1f}x real time across all streams)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("wavs", nargs="*",
+                        default=["tell me about your day.wav", "thanks for sharing.wav"])
+    parser.add_argument("--streams", type=int, default=4)
+    parser.add_argument("--block", type=float, default=0.2, help="seconds of audio per message")
+    parser.add_argument("--realtime", action="store_true", help="pace each stream at real time")
+    parser.add_argument("--url", help="existing server; by default one is started locally")
+    parser.add_argument("--model", default="vosk-model-small-en-us-0.15")
+    parser.add_argument("--processes", type=int, default=None)
+    parser.add_argument("--port", type=int, default=2700)
+    args = parser.parse_args()
+
+    if args.url:
+        asyncio.run(run(args, args.url))
+        return
+
+    server = RecognitionServer(args.model, FS, args.processes)
+    server.start()
+
+    async def serve_and_run():
+        task = asyncio.create_task(server.serve("127.0.0.1", args.port))
+        await asyncio.sleep(0.5)
+        try:
+            await run(args, f"ws://127.0.0.1:{args.port}")
+        finally:
+            task.cancel()
+
+    try:
+        asyncio.run(serve_and_run())
+    finally:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
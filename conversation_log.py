@@ -0,0 +1,123 @@
+"""Durable local write-ahead log of EVI conversations.
+
+Every user/assistant message (with its prosody scores) is appended to a
+SQLite file in WAL mode as soon as it arrives, keyed by (chat_id, seq), and
+marked as synced once it has been uploaded. The log is the source of truth:
+if Firestore is slow or unreachable, or the process dies, nothing is lost,
+and the unsynced rows are uploaded on the next run (see FirestoreWriter).
+
+Appends commit with `synchronous=NORMAL`, so they survive a process crash
+(not a power cut) at a cost of tens of microseconds each.
+"""
+import datetime
+import json
+import os
+import sqlite3
+import threading
+import time
+
+DEFAULT_PATH = os.getenv("CONVERSATION_LOG_PATH", "conversations.sqlite3")
+
+
+def _encode(value):
+    if isinstance(value, datetime.datetime):
+        return {"$datetime": value.isoformat()}
+    raise TypeError(f"Cannot log {type(value).__name__} values")
+
+
+def _decode(obj):
+    if len(obj) == 1 and "$datetime" in obj:
+        return datetime.datetime.fromisoformat(obj["$datetime"])
+    return obj
+
+
+class ConversationLog:
+    """Append-only SQLite log of chat messages with a synced flag per message."""
+
+    def __init__(self, path=DEFAULT_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+        self._db = None
+        self._sequences = {}  # chat_id -> next sequence number
+        self.metrics = {"appended": 0, "synced": 0, "append_total": 0.0, "append_max": 0.0}
+
+    def append(self, chat_id, message):
+        """Durably record `message` (a dict) of `chat_id`; return its sequence number."""
+        start = time.perf_counter()
+        record = json.dumps(message, default=_encode)
+        with self._lock:
+            db = self._connect()
+            if chat_id not in self._sequences:
+                row = db.execute("SELECT MAX(seq) FROM messages WHERE chat_id = ?", (chat_id,)).fetchone()
+                self._sequences[chat_id] = 0 if row[0] is None else row[0] + 1
+            seq = self._sequences[chat_id]
+            db.execute("INSERT INTO messages (chat_id, seq, created, record) VALUES (?, ?, ?, ?)",
+                       (chat_id, seq, time.time(), record))
+            db.commit()
+            self._sequences[chat_id] = seq + 1
+            elapsed = time.perf_counter() - start
+            self.metrics["appended"] += 1
+            self.metrics["append_total"] += elapsed
+            self.metrics["append_max"] = max(self.metrics["append_max"], elapsed)
+        return seq
+
+    def unsynced(self, limit=100):
+        """Oldest unsynced messages of one chat, as (chat_id, seq, message) in order."""
+        with self._lock:
+            db = self._connect()
+            row = db.execute(
+                "SELECT chat_id FROM messages WHERE synced = 0 ORDER BY created, seq LIMIT 1").fetchone()
+            if row is None:
+                return []
+            rows = db.execute(
+                "SELECT seq, record FROM messages WHERE chat_id = ? AND synced = 0 "
+                "ORDER BY seq LIMIT ?", (row[0], limit)).fetchall()
+        return [(row[0], seq, json.loads(record, object_hook=_decode)) for seq, record in rows]
+
+    def mark_synced(self, chat_id, seqs):
+        with self._lock:
+            db = self._connect()
+            db.executemany("UPDATE messages SET synced = 1 WHERE chat_id = ? AND seq = ?",
+                           [(chat_id, seq) for seq in seqs])
+            db.commit()
+            self.metrics["synced"] += len(seqs)
+
+    def pending(self):
+        """Number of messages not yet uploaded."""
+        with self._lock:
+            return self._connect().execute("SELECT COUNT(*) FROM messages WHERE synced = 0").fetchone()[0]
+
+    def messages(self, chat_id):
+        """Every logged message of `chat_id`, in order."""
+        with self._lock:
+            rows = self._connect().execute(
+                "SELECT record FROM messages WHERE chat_id = ? ORDER BY seq", (chat_id,)).fetchall()
+        return [json.loads(record, object_hook=_decode) for record, in rows]
+
+    def iter_messages(self):
+        """(chat_id, seq, message) for every logged message, chat by chat."""
+        with self._lock:
+            rows = self._connect().execute(
+                "SELECT chat_id, seq, record FROM messages ORDER BY chat_id, seq").fetchall()
+        for chat_id, seq, record in rows:
+            yield chat_id, seq, json.loads(record, object_hook=_decode)
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self.metrics)
+        stats["pending"] = self.pending()
+        stats["append_avg"] = stats["append_total"] / stats["appended"] if stats["appended"] else 0.0
+        return stats
+
+    def _connect(self):
+        if self._db is None:
+            # Used from the event loop and the sync worker; access is serialized by _lock.
+            self._db = sqlite3.connect(self.path, check_same_thread=False)
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute("PRAGMA synchronous=NORMAL")
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS messages (chat_id TEXT, seq INTEGER, created REAL, "
+                "record TEXT, synced INTEGER DEFAULT 0, PRIMARY KEY (chat_id, seq))")
+            self._db.execute(
+                "CREATE INDEX IF NOT EXISTS messages_unsynced ON messages (synced, created)")
+        return self._db
@@ -0,0 +1,131 @@
+"""Pluggable emotion analyzers.
+
+Every backend turns text into the same structure the combined LLM analysis
+uses for emotions: a list of {"emotion", "intensity", "primary"} dicts over
+the eight Plutchik emotions. `LexiconEmotionBackend` runs locally on the CPU
+in well under a millisecond, which is fast enough for live feedback after
+every utterance; `LLMEmotionBackend` is the detailed (network) analysis.
+"""
+import abc
+import re
+
+from structured_analysis import EMOTIONS, analyze_long_transcript
+
+# Small hand-curated Plutchik lexicon (lowercase word stems). Words that are
+# mostly used without emotion ("kind of", "looking at", "close the door",
+# "down the street", "next week") are left out.
+LEXICON = {
+    "Joy": ["happy", "glad", "joy", "fun", "great", "love", "loved", "lovely", "nice", "good",
+            "wonderful", "amazing", "awesome", "enjoy", "laugh", "smile", "excited", "delight",
+            "cheerful", "pleased", "proud", "relax", "peaceful", "beautiful", "best"],
+    "Trust": ["trust", "safe", "support", "believe", "rely", "honest", "friend", "together",
+              "comfortable", "care", "hug", "hugged", "loyal", "secure"],
+    "Fear": ["afraid", "scared", "fear", "worried", "worry", "anxious", "nervous", "panic",
+             "terrified", "frighten", "danger", "dread", "unsafe", "alone", "stress"],
+    "Surprise": ["surprise", "surprised", "unexpected", "suddenly", "shock", "shocked", "wow",
+                 "amazed", "astonish", "startle", "unbelievable"],
+    "Sadness": ["sad", "unhappy", "cry", "cried", "tears", "lonely", "miss", "missed", "lost",
+                "depressed", "hurt", "grief", "sorry", "regret", "disappoint", "tired",
+                "upset", "heartbroken"],
+    "Disgust": ["disgust", "gross", "nasty", "sick", "awful", "horrible", "hate", "hated",
+                "revolting", "dirty", "yuck", "ashamed", "shame"],
+    "Anger": ["angry", "mad", "furious", "annoyed", "annoying", "irritated", "frustrated",
+              "rage", "yell", "yelled", "argue", "argued", "fight", "fought", "unfair"],
+    "Anticipation": ["hope", "hoping", "expect", "plan", "planning", "tomorrow", "soon",
+                     "wait", "waiting", "forward", "curious", "eager", "ready"],
+}
+
+# A negated emotion word ("not afraid") is not evidence of any emotion.
+NEGATIONS = {"not", "no", "never", "dont", "didnt", "wasnt", "isnt", "cant", "couldnt", "wont"}
+INTENSIFIERS = {"very": 1.5, "really": 1.5, "extremely": 2.0, "super": 1.5, "totally": 1.5,
+                "bit": 0.5, "little": 0.5, "kind": 0.5, "kinda": 0.5, "slightly": 0.5}
+
+_WORD = re.compile(r"[a-z]+(?:'[a-z]+)?")
+
+
+class EmotionBackend(abc.ABC):
+    """Interface: analyze(text) -> list of {"emotion", "intensity", "primary"} dicts."""
+
+    name = "base"
+
+    @abc.abstractmethod
+    def analyze(self, text):
+        """Return the emotions of `text`, strongest (primary) first."""
+
+
+class LexiconEmotionBackend(EmotionBackend):
+    """CPU-only lexicon scorer with negation and intensifier handling."""
+
+    name = "lexicon"
+
+    def __init__(self, lexicon=LEXICON, medium=1.5, high=3.0, max_emotions=3):
+        self.medium = medium
+        self.high = high
+        self.max_emotions = max_emotions
+        self._index = {}
+        for emotion, words in lexicon.items():
+            for word in words:
+                self._index[word] = emotion
+
+    def _lookup(self, word):
+        if word in self._index:
+            return self._index[word]
+        for suffix in ("ing", "ed", "ly", "es", "s"):
+            if word.endswith(suffix) and word[:-len(suffix)] in self._index:
+                return self._index[word[:-len(suffix)]]
+        return None
+
+    def scores(self, text):
+        """Return {emotion: weighted hit count} for `text`."""
+        words = [word.replace("'", "") for word in _WORD.findall(text.lower())]
+        scores = dict.fromkeys(EMOTIONS, 0.0)
+        for i, word in enumerate(words):
+            emotion = self._lookup(word)
+            if emotion is None:
+                continue
+            window = words[max(0, i - 3):i]
+            if any(previous in NEGATIONS for previous in window):
+                continue
+            weight = 1.0
+            for previous in window:
+                weight *= INTENSIFIERS.get(previous, 1.0)
+            scores[emotion] += weight
+        return scores
+
+    def analyze(self, text):
+        scores = self.scores(text)
+        ranked = sorted((item for item in scores.items() if item[1] > 0),
+                        key=lambda item: item[1], reverse=True)[:self.max_emotions]
+        return [
+            {
+                "emotion": emotion,
+                "intensity": "High" if score >= self.high else "Medium" if score >= self.medium else "Low",
+                "primary": i == 0,
+            }
+            for i, (emotion, score) in enumerate(ranked)
+        ]
+
+
+class LLMEmotionBackend(EmotionBackend):
+    """Emotions from the combined ChatGPT analysis (detailed, needs the network)."""
+
+    name = "llm"
+
+    def analyze(self, text):
+        return analyze_long_transcript(text)["emotions"]
+
+
+BACKENDS = {backend.name: backend for backend in (LexiconEmotionBackend, LLMEmotionBackend)}
+
+
+def get_backend(name):
+    """Instantiate the emotion backend registered under `name`."""
+    try:
+        return BACKENDS[name]()
+    except KeyError:
+        raise ValueError(f"Unknown emotion backend {name!r}; expected one of {', '.join(BACKENDS)}") from None
+
+
+def format_emotions(emotions):
+    """One-line summary such as "Joy (High), Trust (Low)"."""
+    return ", ".join(f"{item['emotion']} ({item['intensity']})" for item in emotions) or "Neutral"
@@ -0,0 +1,211 @@
+"""Supervised EVI chat session that survives dropped connections.
+
+`connect_with_callbacks` gives one WebSocket session: when it drops, the
+chat ends. `EVISession` keeps the chat going:
+
+- it reconnects with full-jitter exponential backoff (reset once a
+  connection has been up for `stable_after` seconds) and resumes the same
+  chat group (`resumed_chat_group_id` from the first chat_metadata), so
+  EVI keeps the conversation's context;
+- text sent with `send_user_input` stays in an outbox until EVI echoes it
+  back as a user_message, and is resent after a reconnect (an input whose
+  echo was lost in the drop may therefore be delivered twice);
+- long-lived tasks such as the microphone get `session.proxy` instead of a
+  socket: sends go to whichever connection is current, audio sent while
+  disconnected is dropped (stale speech is useless), and so is audio sent
+  while `mute_audio()` returns True (e.g. while our own player is speaking,
+  so EVI does not hear itself; both `send_audio_input` and the SDK
+  microphone's raw `_send` count as audio), and the last session settings
+  are replayed on every new connection;
+- a failed connection attempt of any kind (a refused socket, a 503 or 429
+  handshake rejection during an outage, the SDK's ApiError) is counted
+  and backed off like a drop; only an authentication failure (HTTP 401
+  or 403) is fatal, because retrying cannot fix it;
+- it counts connections, reconnects, failed connects, downtime and
+  dropped sends.
+
+`connect(resumed_chat_group_id, **callbacks)` must return an async context
+manager yielding the socket, e.g. a wrapper around
+`client.empathic_voice.chat.connect_with_callbacks` (see main-fb.py) or a
+local stand-in (see bench_evi_session.py).
+"""
+import asyncio
+import random
+import time
+
+from websockets.exceptions import ConnectionClosed
+
+# Socket methods whose last call is replayed on every new connection
+REPLAYED_SENDS = ("send_session_settings",)
+# Socket methods that send microphone audio: hume's MicrophoneInterface sends
+# the raw PCM bytes with `socket._send`, not with `send_audio_input`
+AUDIO_SENDS = ("_send", "send_audio_input")
+# Handshake statuses that no amount of retrying will fix
+FATAL_STATUSES = (401, 403)
+
+
+def status_code(error):
+    """The HTTP status of a rejected handshake (websockets or hume's ApiError), or None."""
+    status = getattr(error, "status_code", None)
+    if status is None:
+        status = getattr(getattr(error, "response", None), "status_code", None)
+    return status
+
+
+class SocketProxy:
+    """Forwards sends to the session's current socket; survives reconnects."""
+
+    def __init__(self, session):
+        self._session = session
+
+    def __getattr__(self, name):
+        if "send" not in name:
+            return getattr(self._session.socket, name)
+
+        async def send(*args, **kwargs):
+            return await self._session._forward(name, args, kwargs)
+        return send
+
+
+class EVISession:
+    """Reconnecting, resuming supervisor around an EVI WebSocket handler."""
+
+    def __init__(self, connect, handler, user_input=dict, resume=True, base_delay=0.5, max_delay=30.0,
+                 stable_after=10.0, max_attempts=None, mute_audio=None):
+        self._connect = connect
+        self.handler = handler
+        self.user_input = user_input  # builds the send_user_input payload, e.g. hume's UserInput
+        self.mute_audio = mute_audio  # audio sends are dropped while this returns True
+        self.resume = resume
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.stable_after = stable_after
+        self.max_attempts = max_attempts  # consecutive failed connections before giving up
+        self.proxy = SocketProxy(self)
+        self.socket = None
+        self.chat_id = None
+        self.chat_group_id = None
+        self.last_error = None
+        self._outbox = []  # user inputs not yet echoed back by EVI, oldest first
+        self._replayed = {}  # method name -> (args, kwargs) of its last call
+        self._closed = asyncio.Event()
+        self._stopped = asyncio.Event()
+        self._down_since = None
+        self.downtimes = []
+        self.metrics = {"connections": 0, "reconnects": 0, "failed_connects": 0, "errors": 0,
+                        "dropped_sends": 0, "muted_sends": 0, "sent_inputs": 0, "replayed_inputs": 0}
+
+    async def run(self):
+        """Connect, and reconnect after every drop until `stop()` is called."""
+        attempt = 0
+        while not self._stopped.is_set():
+            self._closed.clear()
+            connected_at = None
+            try:
+                async with self._connect(self.chat_group_id if self.resume else None,
+                                         on_open=self._on_open, on_message=self._on_message,
+                                         on_close=self._on_close, on_error=self._on_error) as socket:
+                    connected_at = time.monotonic()
+                    await self._attach(socket)
+                    await self._wait(self._closed)
+            except Exception as error:  # not CancelledError: cancelling run() still stops it
+                self.metrics["errors"] += 1
+                self.last_error = error
+                if connected_at is None:
+                    self.metrics["failed_connects"] += 1
+                    if status_code(error) in FATAL_STATUSES:
+                        raise
+            finally:
+                self.socket = None
+            now = time.monotonic()
+            if self._down_since is None:
+                self._down_since = now
+            if self._stopped.is_set():
+                break
+            if connected_at is not None and now - connected_at >= self.stable_after:
+                attempt = 0
+            attempt += 1
+            if self.max_attempts is not None and attempt > self.max_attempts:
+                raise ConnectionError(f"EVI connection failed {attempt - 1} times in a row") from self.last_error
+            delay = random.uniform(0, min(self.max_delay, self.base_delay * 2 ** (attempt - 1)))
+            await self._wait(self._stopped, delay)
+
+    def stop(self):
+        self._stopped.set()
+        self._closed.set()
+
+    async def send_user_input(self, text):
+        """Send text to EVI now if connected, and again after reconnects until it is echoed back."""
+        self._outbox.append(text)
+        if self.socket is not None:
+            await self._send_input(text)
+
+    async def _attach(self, socket):
+        self.socket = socket
+        self.handler.set_socket(self.proxy)
+        self.metrics["connections"] += 1
+        if self._down_since is not None:
+            self.metrics["reconnects"] += 1
+            self.downtimes.append(time.monotonic() - self._down_since)
+            self._down_since = None
+        for name, (args, kwargs) in list(self._replayed.items()):
+            await self._forward(name, args, kwargs)
+        for text in list(self._outbox):
+            self.metrics["replayed_inputs"] += 1
+            await self._send_input(text)
+
+    async def _send_input(self, text):
+        self.metrics["sent_inputs"] += 1
+        await self._forward("send_user_input", (self.user_input(text=text),), {})
+
+    async def _forward(self, name, args, kwargs):
+        if name in AUDIO_SENDS and self.mute_audio is not None and self.mute_audio():
+            self.metrics["muted_sends"] += 1
+            return None
+        if name in REPLAYED_SENDS:
+            self._replayed[name] = (args, kwargs)
+        socket = self.socket
+        if socket is None:
+            self.metrics["dropped_sends"] += 1
+            return None
+        try:
+            return await getattr(socket, name)(*args, **kwargs)
+        except (ConnectionClosed, OSError):
+            self.metrics["dropped_sends"] += 1
+            self._closed.set()
+            return None
+
+    async def _wait(self, event, timeout=None):
+        try:
+            await asyncio.wait_for(event.wait(), timeout)
+        except asyncio.TimeoutError:
+            pass
+
+    async def _on_open(self):
+        await self.handler.on_open()
+
+    async def _on_message(self, message):
+        if message.type == "chat_metadata":
+            self.chat_id = self.chat_id or message.chat_id
+            self.chat_group_id = getattr(message, "chat_group_id", None) or self.chat_group_id
+        elif message.type == "user_message" and getattr(message, "from_text", False):
+            if message.message.content in self._outbox:
+                self._outbox.remove(message.message.content)
+        await self.handler.on_message(message)
+
+    async def _on_close(self):
+        self._closed.set()
+        await self.handler.on_close()
+
+    async def _on_error(self, error):
+        self.metrics["errors"] += 1
+        self.last_error = error
+        self._closed.set()
+        await self.handler.on_error(error)
+
+    def stats(self):
+        stats = dict(self.metrics)
+        stats["pending_inputs"] = len(self._outbox)
+        stats["downtime_total"] = sum(self.downtimes)
+        stats["downtime_max"] = max(self.downtimes, default=0.0)
+        return stats
@@ -0,0 +1,212 @@
+"""Write-behind persistence of EVI conversations to Firestore.
+
+Saving the whole `messages` list with one blocking `document.set` when the
+socket closes loses the conversation if the process dies mid-chat, blocks
+the event loop for the duration of the write and grows a single document
+towards Firestore's 1 MiB limit. `FirestoreWriter` instead takes messages as
+they happen and writes them in the background:
+
+- each message is its own document in `<collection>/<chat_id>/messages`,
+  keyed by its sequence number, so retried writes are idempotent;
+- messages are grouped into batched writes, flushed when `max_batch`
+  messages are waiting or `flush_interval` seconds after the first one;
+- the blocking commit runs in a worker thread, off the event loop;
+- failed commits are retried with jittered exponential backoff and, if they
+  keep failing, put back in the buffer for the next flush.
+
+With a ConversationLog (`log=`) the messages are appended to the durable
+local log instead of an in-memory buffer and uploaded from there; anything
+that could not be uploaded (Firestore offline, process stopped) stays in the
+log, is retried every `retry_interval` seconds and is caught up on the next
+start.
+
+`db` is a `firestore.client()` (set FIRESTORE_EMULATOR_HOST to use the
+emulator) or anything with the same collection/document/batch interface,
+such as the in-memory fake in bench_firestore_writer.py.
+"""
+import asyncio
+import random
+import time
+
+try:
+    from firebase_admin import firestore
+    SERVER_TIMESTAMP = firestore.SERVER_TIMESTAMP
+except ImportError:  # only needed for the real client
+    SERVER_TIMESTAMP = None
+
+from tracing import span
+
+MAX_BATCH_WRITES = 500  # Firestore's limit per batched write
+
+
+class FirestoreWriter:
+    """Asynchronous, batched, retrying writer of chat messages."""
+
+    def __init__(self, db, collection="Hume", log=None, max_batch=50, flush_interval=2.0,
+                 max_retries=5, base_delay=0.5, max_delay=10.0, retry_interval=30.0):
+        # One write per message plus the chat document.
+        self.max_batch = min(max_batch, MAX_BATCH_WRITES - 1)
+        self.db = db
+        self.collection = collection
+        self.flush_interval = flush_interval
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.retry_interval = retry_interval
+        self.log = log
+        self._buffer = []      # (chat_id, seq, message) waiting to be written, without a log
+        self._sequences = {}   # chat_id -> next sequence number, without a log
+        self._waiting = log.pending() if log is not None else 0
+        self._wakeup = None
+        self._flush_lock = asyncio.Lock()  # keeps the batches of a chat in order
+        self._task = None
+        self._closing = False
+        self.metrics = {"messages": 0, "batches": 0, "retries": 0, "failed_flushes": 0,
+                        "flush_max": 0.0, "flush_total": 0.0}
+
+    async def __aenter__(self):
+        self.start()
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.close()
+
+    def start(self):
+        """Start the background flush task on the running event loop."""
+        if self._task is None:
+            self._wakeup = asyncio.Event()
+            if self._waiting:
+                self._wakeup.set()  # catch up on what earlier runs left in the log
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    def add(self, chat_id, message):
+        """Queue `message` (a dict) of `chat_id` for writing; returns its sequence number."""
+        if self.log is not None:
+            seq = self.log.append(chat_id, message)
+        else:
+            seq = self._sequences.get(chat_id, 0)
+            self._sequences[chat_id] = seq + 1
+            self._buffer.append((chat_id, seq, message))
+        self._waiting += 1
+        if self._wakeup is not None and (self._waiting >= self.max_batch or self._waiting == 1):
+            self._wakeup.set()
+        return seq
+
+    async def flush(self):
+        """Write everything queued so far."""
+        async with self._flush_lock:
+            while self._waiting:
+                if not await self._flush_once():
+                    break
+
+    async def close(self, timeout=None):
+        """Stop the background task and flush what is left, giving up after `timeout` seconds.
+
+        Only use a timeout with a log: the messages it could not write stay
+        there for the next run, while an in-memory buffer is lost.
+        """
+        self._closing = True
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        try:
+            await asyncio.wait_for(self.flush(), timeout)
+        except asyncio.TimeoutError:
+            print(f"Firestore did not respond; {self._waiting} messages left to sync on the next run.")
+
+    async def _run(self):
+        while not self._closing:
+            try:
+                # While messages are stuck, try again every retry_interval.
+                await asyncio.wait_for(self._wakeup.wait(), self.retry_interval if self._waiting else None)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            if not self._waiting:
+                continue
+            # Give the batch time to fill up, unless it is already full.
+            deadline = time.monotonic() + self.flush_interval
+            while self._waiting < self.max_batch and not self._closing:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), remaining)
+                except asyncio.TimeoutError:
+                    break
+                self._wakeup.clear()
+            await self.flush()
+
+    async def _flush_once(self):
+        """Commit up to `max_batch` messages of one chat; False if it failed for good."""
+        if self.log is not None:
+            batch = self.log.unsynced(self.max_batch)
+            if not batch:
+                self._waiting = 0
+                return True
+            chat_id = batch[0][0]
+        else:
+            chat_id = self._buffer[0][0]
+            batch = [entry for entry in self._buffer if entry[0] == chat_id][:self.max_batch]
+            taken = {id(entry) for entry in batch}
+            self._buffer = [entry for entry in self._buffer if id(entry) not in taken]
+
+        start = time.perf_counter()
+        try:
+            for attempt in range(self.max_retries + 1):
+                try:
+                    await asyncio.to_thread(self._commit, chat_id, batch)
+                    break
+                except Exception as e:
+                    if attempt == self.max_retries:
+                        # Keep the messages for the next flush rather than losing them.
+                        if self.log is None:
+                            self._buffer[:0] = batch
+                        self.metrics["failed_flushes"] += 1
+                        print(f"Error saving chat {chat_id} to Firestore: {e}")
+                        return False
+                    self.metrics["retries"] += 1
+                    delay = random.uniform(0, min(self.max_delay, self.base_delay * 2 ** attempt))
+                    await asyncio.sleep(delay)
+        except asyncio.CancelledError:
+            # Closing, during a commit or a backoff; the batch is written again
+            # later (the writes are idempotent).
+            if self.log is None:
+                self._buffer[:0] = batch
+            raise
+
+        if self.log is not None:
+            self.log.mark_synced(chat_id, [seq for _, seq, _ in batch])
+        self._waiting -= len(batch)
+        elapsed = time.perf_counter() - start
+        self.metrics["messages"] += len(batch)
+        self.metrics["batches"] += 1
+        self.metrics["flush_total"] += elapsed
+        self.metrics["flush_max"] = max(self.metrics["flush_max"], elapsed)
+        return True
+
+    def _commit(self, chat_id, batch):
+        """Blocking batched write of `batch` plus the chat document (runs in a thread)."""
+        with span("firestore.commit", messages=len(batch)):
+            self._write(chat_id, batch)
+
+    def _write(self, chat_id, batch):
+        chat = self.db.collection(self.collection).document(chat_id)
+        writes = self.db.batch()
+        for _, seq, message in batch:
+            writes.set(chat.collection("messages").document(f"{seq:06d}"), {**message, "seq": seq})
+        writes.set(chat, {
+            "chat_id": chat_id,
+            "message_count": batch[-1][1] + 1,
+            "timestamp": SERVER_TIMESTAMP,
+        }, merge=True)
+        writes.commit()
+
+    def stats(self):
+        stats = dict(self.metrics, pending=self._waiting)
+        stats["flush_avg"] = stats["flush_total"] / stats["batches"] if stats["batches"] else 0.0
+        return stats
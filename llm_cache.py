@@ -0,0 +1,158 @@
+"""Content-addressed cache for ChatGPT analysis responses.
+
+The analyses run with `temperature=0`, so the same model, prompt template and
+transcript give the same answer; re-running them after a Streamlit rerun, a
+retry or a crash only costs money and time. Responses are keyed by a hash of
+(model, template, normalized text) and kept in two tiers: an in-memory LRU in
+front of a SQLite file that survives restarts. Entries expire after a TTL, and
+both tiers are capped in size.
+"""
+import functools
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+DEFAULT_PATH = os.getenv("LLM_CACHE_PATH", "llm_cache.sqlite3")
+DEFAULT_TTL = 30 * 24 * 3600  # seconds
+
+
+def normalize_text(text):
+    """Case-fold and collapse whitespace so trivially different transcripts share a key."""
+    return " ".join(text.split()).casefold()
+
+
+class ResponseCache:
+    """Two-tier (memory LRU + SQLite) cache of LLM responses with hit/miss metrics."""
+
+    def __init__(self, path=DEFAULT_PATH, ttl=DEFAULT_TTL, max_memory_items=256,
+                 max_disk_items=10000):
+        self.path = path
+        self.ttl = ttl
+        self.max_memory_items = max_memory_items
+        self.max_disk_items = max_disk_items
+        self._memory = OrderedDict()  # key -> (created, value)
+        self._lock = threading.Lock()
+        self._db = None
+        self.metrics = {"memory_hits": 0, "disk_hits": 0, "misses": 0,
+                        "expired": 0, "evictions": 0}
+
+    @staticmethod
+    def key(model, template, text):
+        payload = json.dumps([model, template, normalize_text(text)])
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def get(self, key):
+        """Return the cached value for `key`, or None on a miss."""
+        now = time.time()
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                if now - entry[0] < self.ttl:
+                    self._memory.move_to_end(key)
+                    self.metrics["memory_hits"] += 1
+                    return entry[1]
+                del self._memory[key]
+
+            row = self._connect().execute(
+                "SELECT created, value FROM responses WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                self.metrics["misses"] += 1
+                return None
+            created, value = row
+            if now - created >= self.ttl:
+                self._db.execute("DELETE FROM responses WHERE key = ?", (key,))
+                self._db.commit()
+                self.metrics["expired"] += 1
+                self.metrics["misses"] += 1
+                return None
+            self._db.execute("UPDATE responses SET accessed = ? WHERE key = ?", (now, key))
+            self._db.commit()
+            self._remember(key, created, value)
+            self.metrics["disk_hits"] += 1
+            return value
+
+    def set(self, key, value):
+        now = time.time()
+        with self._lock:
+            self._remember(key, now, value)
+            db = self._connect()
+            db.execute("INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?)",
+                       (key, now, now, value))
+            count = db.execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+            if count > self.max_disk_items:
+                # Least recently used rows go first.
+                db.execute(
+                    "DELETE FROM responses WHERE key IN "
+                    "(SELECT key FROM responses ORDER BY accessed LIMIT ?)",
+                    (count - self.max_disk_items,))
+                self.metrics["evictions"] += count - self.max_disk_items
+            db.commit()
+
+    def cached(self, model, template):
+        """Decorate `func(text)` so its result is cached under (model, template, text)."""
+        def decorator(func):
+            @functools.wraps(func)
+            def wrapper(text):
+                key = self.key(model, template, text)
+                value = self.get(key)
+                if value is None:
+                    value = func(text)
+                    self.set(key, value)
+                return value
+            return wrapper
+        return decorator
+
+    def cached_stream(self, model, template):
+        """Like `cached`, for a generator `func(text)` yielding pieces of the response.
+
+        A hit yields the whole cached response at once; a miss streams the
+        pieces and caches their concatenation once the stream completes.
+        """
+        def decorator(func):
+            @functools.wraps(func)
+            def wrapper(text):
+                key = self.key(model, template, text)
+                value = self.get(key)
+                if value is not None:
+                    yield value
+                    return
+                pieces = []
+                for piece in func(text):
+                    pieces.append(piece)
+                    yield piece
+                self.set(key, "".join(pieces))
+            return wrapper
+        return decorator
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self.metrics)
+            stats["memory_items"] = len(self._memory)
+        lookups = stats["memory_hits"] + stats["disk_hits"] + stats["misses"]
+        stats["hit_rate"] = (lookups - stats["misses"]) / lookups if lookups else 0.0
+        return stats
+
+    def _remember(self, key, created, value):
+        self._memory[key] = (created, value)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_memory_items:
+            self._memory.popitem(last=False)
+
+    def _connect(self):
+        if self._db is None:
+            # Shared by the analysis worker threads; access is serialized by _lock.
+            self._db = sqlite3.connect(self.path, check_same_thread=False)
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS responses "
+                "(key TEXT PRIMARY KEY, created REAL, accessed REAL, value TEXT)")
+            self._db.execute(
+                "CREATE INDEX IF NOT EXISTS responses_accessed ON responses (accessed)")
+        return self._db
+
+
+# Process-wide cache shared by the apps (and across Streamlit reruns).
+response_cache = ResponseCache()
@@ -12,6 +12,14 @@ from hume.empathic_voice.types import UserInput
 from hume.core.api_error import ApiError
 from hume import MicrophoneInterface, Stream
 
+from audio_playback import AudioEventRecorder, AudioPlayer
+from conversation_log import ConversationLog
+from evi_session import EVISession
+from firestore_writer import FirestoreWriter
+from prosody import MessageRecord, encode, unknown_emotions
+from prosody_aggregator import ProsodyAggregator
+from tracing import activate, enabled, get_tracer, span
+
 # Load environment variables
 load_dotenv()
 
@@ -23,107 +31,154 @@ except ValueError:
     firebase_admin.initialize_app(cred)
 db = firestore.client()
 
+# Play EVI audio through our own jitter buffer instead of the SDK's byte stream
+# (EVI_JITTER_BUFFER_PLAYBACK=0 goes back to the SDK's player)
+JITTER_BUFFER_PLAYBACK = os.getenv("EVI_JITTER_BUFFER_PLAYBACK", "1") == "1"
+PLAYBACK_TARGET_MS = int(os.getenv("EVI_PLAYBACK_TARGET_MS", "120"))
+# Longest reply the jitter buffer may hold; EVI sends replies faster than real time
+PLAYBACK_MAX_BUFFER_MS = int(os.getenv("EVI_PLAYBACK_MAX_BUFFER_MS", "300000"))
+# Append audio_output events to this JSONL file for replay (see bench_playback.py)
+AUDIO_RECORDING_PATH = os.getenv("EVI_AUDIO_RECORDING")
+# With NEUROPY_TRACING=1, write the chat's spans here at exit (.prom for Prometheus text, else JSON)
+TRACE_EXPORT_PATH = os.getenv("NEUROPY_TRACE_EXPORT")
+
 class WebSocketHandler:
     """Handler for containing the EVI WebSocket and associated socket handling behavior."""
 
-    def __init__(self):
+    def __init__(self, writer: FirestoreWriter = None):
         """Initialize WebSocketHandler."""
         self.socket = None
         self.byte_strs = Stream.new()
+        self.player = (AudioPlayer(target_ms=PLAYBACK_TARGET_MS, max_capacity_ms=PLAYBACK_MAX_BUFFER_MS)
+                       if JITTER_BUFFER_PLAYBACK else None)
+        self.recorder = AudioEventRecorder(AUDIO_RECORDING_PATH) if AUDIO_RECORDING_PATH else None
         self.chat_id = None
-        self.messages = []
+        self.messages = []  # MessageRecord per user/assistant message
+        self.emotions = ProsodyAggregator(k=3)  # rolling prosody statistics of the chat
+        self.writer = writer
+        self._persisted = 0  # messages already handed to the writer
 
     def set_socket(self, socket: ChatWebsocketConnection):
         """Set the socket."""
         self.socket = socket
 
+    def assistant_speaking(self) -> bool:
+        """Whether our player is playing the assistant's voice (the mic is muted meanwhile)."""
+        return self.player is not None and self.player.speaking
+
     async def on_open(self):
         """WebSocket connection opened."""
         print("WebSocket connection opened.")
 
     async def on_message(self, message: SubscribeEvent):
         """Handle a WebSocket message event."""
-        scores = {}
+        with span(f"evi.{message.type}"):
+            await self._handle_message(message)
+
+    async def _handle_message(self, message: SubscribeEvent):
+        scores = None
         if message.type == "chat_metadata":
-            self.chat_id = message.chat_id
-            text = f"<CHAT_METADATA> Chat ID: {self.chat_id}"
+            # A resumed connection gets a new chat ID in the same chat group; keep logging under the first one
+            if self.chat_id is None:
+                self.chat_id = message.chat_id
+                text = f"<CHAT_METADATA> Chat ID: {self.chat_id}"
+            else:
+                text = f"<CHAT_METADATA> Resumed chat {self.chat_id} as {message.chat_id}"
+            self._persist()
         elif message.type in ["user_message", "assistant_message"]:
             role = message.message.role.upper()
             message_text = message.message.content
             text = f"{role}: {message_text}"
 
-            # Extract emotion scores if available
+            # Extract emotion scores if available (as a float32 array); emotions
+            # newer than our vocabulary are skipped and counted, not fatal
             if message.from_text is False:
-                scores = dict(message.models.prosody.scores)
+                scores = encode(dict(message.models.prosody.scores), strict=False)
+                self.emotions.update(scores, seq=len(self.messages))
 
             # Store message in memory
-            self.messages.append({
-                "role": role,
-                "message": message_text,
-                "timestamp": datetime.datetime.utcnow(),
-                "emotions": scores
-            })
+            self.messages.append(MessageRecord(role, message_text, datetime.datetime.utcnow(), scores))
+            self._persist()
         elif message.type == "audio_output":
             message_str: str = message.data
-            message_bytes = base64.b64decode(message_str.encode("utf-8"))
-            await self.byte_strs.put(message_bytes)
+            if self.recorder is not None:
+                self.recorder.record(message.type, message_str)
+            if self.player is not None:
+                self.player.feed(message_str)
+            else:
+                message_bytes = base64.b64decode(message_str.encode("utf-8"))
+                await self.byte_strs.put(message_bytes)
             return
         elif message.type == "error":
             raise ApiError(f"Error ({message.code}): {message.message}")
         else:
             text = f"<{message.type.upper()}>"
+            if message.type in ("assistant_end", "user_interruption"):
+                if self.recorder is not None:
+                    self.recorder.record(message.type)
+                if self.player is not None:
+                    if message.type == "assistant_end":
+                        self.player.mark_end()
+                    else:
+                        self.player.clear()
 
         self._print_prompt(text)
 
-        # Print and store emotions
-        if scores:
-            top_3_emotions = self._extract_top_n_emotions(scores, 3)
-            self._print_emotion_scores(top_3_emotions)
+        # Print the message's top 3 emotions and the running mood of the chat
+        if scores is not None:
+            snapshot = self.emotions.snapshot()
+            self._print_emotion_scores(snapshot["latest"])
+            self._print_emotion_scores(snapshot["ewma"], label="mood")
             print("")
 
     async def on_close(self):
-        """WebSocket connection closed. Save chat to Firestore."""
+        """WebSocket connection closed. The chat is already in the local log; sync happens in the background."""
         print("WebSocket connection closed.")
-        if self.chat_id and self.messages:
-            save_chat_to_firestore(self.chat_id, self.messages)
 
     async def on_error(self, error):
         """Handle WebSocket errors."""
         print(f"Error: {error}")
 
+    def close(self):
+        """Stop audio playback and recording at the end of the chat."""
+        if unknown_emotions:
+            print(f"Skipped prosody emotions outside the vocabulary: {dict(unknown_emotions)}")
+        if self.recorder is not None:
+            self.recorder.close()
+        if self.player is not None:
+            self.player.close()
+            stats = self.player.stats()
+            if stats["chunks"]:
+                print(f"Playback: {stats['chunks']} chunks, {stats['underruns']} underruns "
+                      f"({stats['underrun_ms']:.0f} ms), first audio p50 "
+                      f"{stats.get('first_audio_ms_p50', 0):.0f} ms")
+            if stats.get("dropped_frames") or stats["bad_chunks"]:
+                print(f"Playback: {stats.get('dropped_ms', 0):.0f} ms of audio dropped (buffer full), "
+                      f"{stats['bad_chunks']} malformed chunks skipped (last: {self.player.last_error})")
+
+    def _persist(self) -> None:
+        """Log new messages once the chat ID is known; they are synced to Firestore in the background."""
+        if self.writer is None or not self.chat_id:
+            return
+        for message in self.messages[self._persisted:]:
+            self.writer.add(self.chat_id, message.to_document())
+        self._persisted = len(self.messages)
+
     def _print_prompt(self, text: str) -> None:
         """Print a formatted message with a timestamp."""
         now_str = datetime.datetime.utcnow().strftime("%H:%M:%S")
         print(f"[{now_str}] {text}")
 
-    def _extract_top_n_emotions(self, emotion_scores: dict, n: int) -> dict:
-        """Extract top N emotions based on confidence scores."""
-        sorted_emotions = sorted(emotion_scores.items(), key=lambda item: item[1], reverse=True)
-        return {emotion: score for emotion, score in sorted_emotions[:n]}
-
-    def _print_emotion_scores(self, emotion_scores: dict) -> None:
+    def _print_emotion_scores(self, emotion_scores: dict, label: str = "") -> None:
         """Print emotions and scores."""
         formatted_emotions = ' | '.join([f"{emotion} ({score:.2f})" for emotion, score in emotion_scores.items()])
-        print(f"|{formatted_emotions}|")
-
-def save_chat_to_firestore(chat_id, messages):
-    """Save the conversation to Firestore."""
-    chat_data = {
-        "chat_id": chat_id,
-        "messages": messages,
-        "timestamp": firestore.SERVER_TIMESTAMP
-    }
-    try:
-        db.collection("Hume").document(chat_id).set(chat_data)
-        print(f"Chat {chat_id} saved to Firestore.")
-    except Exception as e:
-        print(f"Error saving chat to Firestore: {e}")
+        prefix = f"{label}: " if label else ""
+        print(f"{prefix}|{formatted_emotions}|")
 
-async def sending_handler(socket: ChatWebsocketConnection):
-    """Send a message over the WebSocket."""
+async def sending_handler(session: EVISession):
+    """Send a message over the WebSocket (resent after a reconnect until EVI acknowledges it)."""
     await asyncio.sleep(3)
-    user_input_message = UserInput(text="Hello there!")
-    await socket.send_user_input(user_input_message)
+    await session.send_user_input("Hello there!")
 
 async def main() -> None:
     load_dotenv()
@@ -133,29 +188,62 @@ async def main() -> None:
     HUME_CONFIG_ID = os.getenv("HUME_CONFIG_ID")
 
     client = AsyncHumeClient(api_key=HUME_API_KEY)
-    options = ChatConnectOptions(config_id=HUME_CONFIG_ID, secret_key=HUME_SECRET_KEY)
-
-    websocket_handler = WebSocketHandler()
-
-    async with client.empathic_voice.chat.connect_with_callbacks(
-        options=options,
-        on_open=websocket_handler.on_open,
-        on_message=websocket_handler.on_message,
-        on_close=websocket_handler.on_close,
-        on_error=websocket_handler.on_error
-    ) as socket:
-        websocket_handler.set_socket(socket)
-
-        microphone_task = asyncio.create_task(
-            MicrophoneInterface.start(
-                socket,
-                allow_user_interrupt=False,
-                byte_stream=websocket_handler.byte_strs
-            )
+    # Tasks and threads started from here (Firestore commits included) trace into this chat's tracer.
+    tracer = get_tracer("evi")
+    activate(tracer)
+
+    def connect(resumed_chat_group_id=None, **callbacks):
+        options = {"config_id": HUME_CONFIG_ID, "secret_key": HUME_SECRET_KEY}
+        if resumed_chat_group_id:
+            options["resumed_chat_group_id"] = resumed_chat_group_id
+        return client.empathic_voice.chat.connect_with_callbacks(options=ChatConnectOptions(**options), **callbacks)
+
+    # Messages go to a local write-ahead log first and are synced to Firestore
+    # in batches while the chat is running; whatever Firestore does not take
+    # (offline, shutdown) is uploaded on the next run.
+    firestore_writer = FirestoreWriter(db, collection="Hume", log=ConversationLog())
+    firestore_writer.start()
+    websocket_handler = WebSocketHandler(firestore_writer)
+
+    # The SDK's player mutes the microphone while the assistant speaks (allow_user_interrupt=False),
+    # but it never sees audio played through our jitter buffer, so the session mutes it instead.
+    session = EVISession(connect, websocket_handler, user_input=UserInput,
+                         mute_audio=websocket_handler.assistant_speaking if JITTER_BUFFER_PLAYBACK else None)
+
+    try:
+        await run_chat(session, websocket_handler)
+    finally:
+        websocket_handler.close()
+        stats = session.stats()
+        print(f"EVI: {stats['connections']} connections, {stats['reconnects']} reconnects, "
+              f"{stats['downtime_total']:.1f} s down (longest {stats['downtime_max']:.1f} s), "
+              f"{stats['muted_sends']} mic frames muted while the assistant spoke")
+        await firestore_writer.close(timeout=5)
+        stats = firestore_writer.stats()
+        print(f"Firestore: {stats['messages']} messages in {stats['batches']} batches, "
+              f"{stats['retries']} retries, {stats['pending']} waiting in the local log")
+        if enabled():
+            print(tracer.format_summary())
+            if TRACE_EXPORT_PATH:
+                tracer.export(TRACE_EXPORT_PATH)
+
+async def run_chat(session, websocket_handler):
+    """Stream the microphone to EVI until the chat ends, reconnecting when the connection drops."""
+    # The microphone task outlives individual connections: it sends through the session's proxy.
+    microphone_task = asyncio.create_task(
+        MicrophoneInterface.start(
+            session.proxy,
+            allow_user_interrupt=False,
+            byte_stream=websocket_handler.byte_strs
         )
-        
-        message_sending_task = asyncio.create_task(sending_handler(socket))
-        await asyncio.gather(microphone_task, message_sending_task)
+    )
+    message_sending_task = asyncio.create_task(sending_handler(session))
+    try:
+        await session.run()
+    finally:
+        session.stop()
+        microphone_task.cancel()
+        message_sending_task.cancel()
 
 if __name__ == "__main__":
     asyncio.run(main())
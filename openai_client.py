@@ -0,0 +1,267 @@
+"""Shared client layer for every OpenAI request.
+
+Bare `openai.ChatCompletion.create` / `openai.Audio.transcribe` calls open a
+connection per thread, fail the whole analysis on the first 429 or 5xx, and
+can be fired faster than the account's rate limit allows. `OpenAIClient`
+wraps them with:
+
+- one keep-alive `requests.Session` whose pool is shared by all threads,
+- a token bucket on requests (and optionally prompt tokens) per minute,
+- per-endpoint concurrency caps,
+- retries with jittered exponential backoff that honour Retry-After,
+- per-endpoint latency histograms and retry/failure counters.
+
+Limits can be set with the OPENAI_RPM, OPENAI_TPM and OPENAI_MAX_RETRIES
+environment variables. Point `openai.api_base` at a local stub server to
+exercise the retry path (see bench_openai_client.py).
+"""
+import bisect
+import contextlib
+import os
+import random
+import threading
+import time
+
+import openai
+import requests
+
+from tracing import span
+from transcript_chunking import count_tokens
+
+DEFAULT_RPM = float(os.getenv("OPENAI_RPM", "500"))
+DEFAULT_TPM = float(os.getenv("OPENAI_TPM", "0"))  # 0 disables the token budget
+DEFAULT_MAX_RETRIES = int(os.getenv("OPENAI_MAX_RETRIES", "5"))
+DEFAULT_CONCURRENCY = {"chat": 6, "chat_stream": 6, "transcribe": 3}
+
+# Upper bounds (seconds) of the latency histogram buckets
+LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2, 4, 8, 15, 30, 60, 120)
+
+
+class TokenBucket:
+    """Blocking token bucket refilled at `rate` tokens per second up to `capacity`."""
+
+    def __init__(self, rate, capacity):
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self, amount=1):
+        """Take `amount` tokens, sleeping until they are available; return the time waited."""
+        amount = min(amount, self.capacity)
+        waited = 0.0
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= amount:
+                    self._tokens -= amount
+                    return waited
+                delay = (amount - self._tokens) / self.rate
+            time.sleep(delay)
+            waited += delay
+
+
+class LatencyHistogram:
+    """Fixed-bucket latency histogram; percentiles are bucket upper bounds."""
+
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)  # last bucket: over the largest bound
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def observe(self, seconds):
+        self.counts[bisect.bisect_left(self.buckets, seconds)] += 1
+        self.count += 1
+        self.total += seconds
+        self.max = max(self.max, seconds)
+
+    def percentile(self, q):
+        if not self.count:
+            return 0.0
+        rank = q / 100 * self.count
+        seen = 0
+        for bound, count in zip(self.buckets, self.counts):
+            seen += count
+            if seen >= rank:
+                return bound
+        return self.max
+
+    def snapshot(self):
+        return {
+            "count": self.count,
+            "mean": self.total / self.count if self.count else 0.0,
+            "p50": self.percentile(50),
+            "p95": self.percentile(95),
+            "max": self.max,
+            "buckets": dict(zip([*map(str, self.buckets), "inf"], self.counts)),
+        }
+
+
+def is_retryable(error):
+    """True for rate limits, server errors, timeouts and dropped connections."""
+    status = getattr(error, "http_status", None)
+    if status is not None:
+        return status in (408, 409, 429) or status >= 500
+    return isinstance(error, (openai.error.APIConnectionError, openai.error.Timeout,
+                              openai.error.TryAgain, requests.ConnectionError,
+                              requests.Timeout))
+
+
+def _retry_after(error):
+    headers = getattr(error, "headers", None) or {}
+    try:
+        return float(headers.get("retry-after"))
+    except (TypeError, ValueError):
+        return None
+
+
+def _chat_tokens(kwargs):
+    """Estimated token cost of a chat request: the prompt plus the completion budget."""
+    prompt = " ".join(message["content"] for message in kwargs.get("messages", []))
+    return count_tokens(prompt, kwargs.get("model", "gpt-3.5-turbo")) + kwargs.get("max_tokens", 0)
+
+
+class OpenAIClient:
+    """Rate-limited, retrying, connection-pooled front for the OpenAI API."""
+
+    def __init__(self, requests_per_minute=DEFAULT_RPM, tokens_per_minute=DEFAULT_TPM,
+                 concurrency=None, max_retries=DEFAULT_MAX_RETRIES, base_delay=0.5,
+                 max_delay=20.0):
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        # Allow a burst of up to one second's worth of requests.
+        self._requests = TokenBucket(requests_per_minute / 60, max(1.0, requests_per_minute / 60))
+        self._tokens = (TokenBucket(tokens_per_minute / 60, tokens_per_minute / 60 * 10)
+                        if tokens_per_minute else None)
+        self.concurrency = {**DEFAULT_CONCURRENCY, **(concurrency or {})}
+        self._slots = {name: threading.BoundedSemaphore(limit)
+                       for name, limit in self.concurrency.items()}
+        self._lock = threading.Lock()
+        self._histograms = {}
+        self.metrics = {"calls": 0, "retries": 0, "failures": 0, "throttled_seconds": 0.0}
+        self._session = None
+
+    def session(self):
+        """Keep-alive session shared by every thread, installed for the openai module."""
+        if self._session is None:
+            session = requests.Session()
+            adapter = requests.adapters.HTTPAdapter(
+                pool_connections=4, pool_maxsize=sum(self.concurrency.values()))
+            session.mount("https://", adapter)
+            session.mount("http://", adapter)
+            self._session = session
+        openai.requestssession = self._session
+        return self._session
+
+    def call(self, endpoint, func, *args, tokens=0, rewind=None, hold_slot=True, **kwargs):
+        """Run `func(*args, **kwargs)` under the limits of `endpoint`, retrying transient errors.
+
+        `tokens` is the estimated token cost charged to the token budget;
+        `rewind` is called before every retry (e.g. to seek an upload back to 0).
+        With `hold_slot=False` the caller already holds the endpoint's
+        concurrency slot (see `slot`).
+        """
+        self.session()
+        slots = self.slot(endpoint) if hold_slot else contextlib.nullcontext()
+        with span(f"openai.{endpoint}") as traced:
+            for attempt in range(self.max_retries + 1):
+                if attempt and rewind:
+                    rewind()
+                throttled = self._requests.acquire()
+                if self._tokens and tokens:
+                    throttled += self._tokens.acquire(tokens)
+                with slots:
+                    start = time.perf_counter()
+                    try:
+                        result = func(*args, **kwargs)
+                    except Exception as e:
+                        error = e
+                    else:
+                        error = None
+                    elapsed = time.perf_counter() - start
+                self._record(endpoint, elapsed, throttled)
+                traced.set(attempts=attempt + 1)
+                if error is None:
+                    return result
+                if attempt == self.max_retries or not is_retryable(error):
+                    with self._lock:
+                        self.metrics["failures"] += 1
+                    raise error
+                with self._lock:
+                    self.metrics["retries"] += 1
+                time.sleep(self.backoff(attempt, _retry_after(error)))
+
+    def slot(self, endpoint):
+        """The semaphore capping concurrent requests to `endpoint`."""
+        with self._lock:
+            if endpoint not in self._slots:
+                self._slots[endpoint] = threading.BoundedSemaphore(6)
+            return self._slots[endpoint]
+
+    def backoff(self, attempt, retry_after=None):
+        """Full-jitter exponential delay, never shorter than the server's Retry-After."""
+        delay = random.uniform(0, min(self.max_delay, self.base_delay * 2 ** attempt))
+        return max(delay, retry_after or 0.0)
+
+    def chat(self, **kwargs):
+        """`openai.ChatCompletion.create` through the shared limits."""
+        return self.call("chat", openai.ChatCompletion.create, tokens=_chat_tokens(kwargs), **kwargs)
+
+    def chat_stream(self, **kwargs):
+        """Streaming chat completion: yield the content deltas as they arrive.
+
+        Opening the stream is retried like any call; an error after the first
+        delta is raised, since a retry would repeat text already shown.
+        Time to first token and total time go to the "chat_ttft" and
+        "chat_total" histograms ("chat_stream" only measures opening it).
+        The concurrency slot is held until the stream is exhausted or the
+        generator is closed, so long answers count against the cap.
+        """
+        start = time.perf_counter()
+        with self.slot("chat_stream"):
+            chunks = self.call("chat_stream", openai.ChatCompletion.create,
+                               tokens=_chat_tokens(kwargs), hold_slot=False, stream=True, **kwargs)
+            try:
+                first_token = None
+                for chunk in chunks:
+                    delta = chunk["choices"][0]["delta"].get("content") if chunk["choices"] else None
+                    if delta:
+                        if first_token is None:
+                            first_token = time.perf_counter() - start
+                            self._observe("chat_ttft", first_token)
+                        yield delta
+            finally:
+                if hasattr(chunks, "close"):
+                    chunks.close()  # hands the connection back when the reader stops early
+        self._observe("chat_total", time.perf_counter() - start)
+
+    def transcribe(self, model, audio_file, **kwargs):
+        """`openai.Audio.transcribe` through the shared limits; the file is rewound on retry."""
+        rewind = (lambda: audio_file.seek(0)) if hasattr(audio_file, "seek") else None
+        return self.call("transcribe", openai.Audio.transcribe, model, audio_file,
+                         rewind=rewind, **kwargs)
+
+    def _record(self, endpoint, elapsed, throttled):
+        with self._lock:
+            self.metrics["calls"] += 1
+            self.metrics["throttled_seconds"] += throttled
+        self._observe(endpoint, elapsed)
+
+    def _observe(self, name, seconds):
+        with self._lock:
+            self._histograms.setdefault(name, LatencyHistogram()).observe(seconds)
+
+    def stats(self):
+        with self._lock:
+            return {**self.metrics,
+                    "latency": {name: histogram.snapshot()
+                                for name, histogram in self._histograms.items()}}
+
+
+openai_client = OpenAIClient()
@@ -0,0 +1,107 @@
+"""Process-wide cache of decoded prompt clips.
+
+The opening and closing prompts used to be located and re-parsed from disk
+every time they played, and playback blocked the app until the clip ended.
+Here each clip is decoded once per process into PCM bytes (the cache
+survives Streamlit reruns because this module is only imported once), and
+`play` starts playback from memory and returns at once with simpleaudio's
+play object, so the caller decides whether to wait for it. The clips are a
+few hundred KiB each, so they are simply held in memory rather than mapped.
+"""
+import os
+import threading
+import time
+import wave
+
+try:
+    import simpleaudio as sa
+except ImportError:  # decoding and timing work without it; playing needs it
+    sa = None
+
+PROMPTS = ("tell me about your day.wav", "thanks for sharing.wav")
+
+
+class PromptClip:
+    """One decoded WAV clip."""
+
+    __slots__ = ("path", "frames", "channels", "sample_width", "sample_rate", "wave_object")
+
+    def __init__(self, path, frames, channels, sample_width, sample_rate):
+        self.path = path
+        self.frames = frames
+        self.channels = channels
+        self.sample_width = sample_width
+        self.sample_rate = sample_rate
+        self.wave_object = (sa.WaveObject(frames, channels, sample_width, sample_rate)
+                            if sa is not None else None)
+
+    @property
+    def duration(self):
+        return len(self.frames) / (self.channels * self.sample_width * self.sample_rate)
+
+
+_clips = {}
+_lock = threading.Lock()
+_metrics = {
+    "clips_loaded": 0,
+    "load_seconds": 0.0,
+    "plays": 0,
+    "play_start_total": 0.0,
+    "play_start_max": 0.0,
+}
+
+
+def decode(path):
+    """Read a WAV file into a PromptClip."""
+    with wave.open(path, "rb") as wav:
+        return PromptClip(path, wav.readframes(wav.getnframes()), wav.getnchannels(),
+                          wav.getsampwidth(), wav.getframerate())
+
+
+def get_clip(path):
+    """Return the cached clip for `path`, decoding it on first use."""
+    clip = _clips.get(path)
+    if clip is not None:
+        return clip
+    with _lock:
+        clip = _clips.get(path)
+        if clip is None:
+            start = time.perf_counter()
+            clip = decode(path)
+            _metrics["clips_loaded"] += 1
+            _metrics["load_seconds"] += time.perf_counter() - start
+            _clips[path] = clip
+    return clip
+
+
+def preload(paths=PROMPTS):
+    """Decode every clip that exists; return the paths that were not found."""
+    missing = []
+    for path in paths:
+        if os.path.exists(path):
+            get_clip(path)
+        else:
+            missing.append(path)
+    return missing
+
+
+def play(path):
+    """Start playing a clip without waiting for it; return simpleaudio's PlayObject."""
+    if sa is None:
+        raise RuntimeError("Playing prompts needs simpleaudio (pip install simpleaudio)")
+    start = time.perf_counter()
+    play_obj = get_clip(path).wave_object.play()
+    elapsed = time.perf_counter() - start
+    with _lock:
+        _metrics["plays"] += 1
+        _metrics["play_start_total"] += elapsed
+        _metrics["play_start_max"] = max(_metrics["play_start_max"], elapsed)
+    return play_obj
+
+
+def prompt_metrics():
+    """Return a copy of the decode and playback-start timings."""
+    with _lock:
+        metrics = dict(_metrics)
+    metrics["play_start_avg"] = metrics["play_start_total"] / metrics["plays"] if metrics["plays"] else 0.0
+    return metrics
@@ -0,0 +1,205 @@
+"""Compact storage of Hume prosody emotion scores.
+
+Every voiced EVI message carries ~48 float scores keyed by emotion name.
+Kept as dicts, each message costs a few KiB in memory and a nested map of
+48 named fields in Firestore. Here the emotion names form a fixed,
+versioned vocabulary (`EMOTIONS`, in the SDK's field order) and a message's
+scores are one float32 array of that length (192 bytes):
+
+- `encode` / `decode` convert between the dict form (`dict(scores)` of the
+  SDK model, or its display-name aliases) and the array; missing emotions
+  are NaN and are left out again on decode, so `decode(encode(d)) == d` for
+  any dict whose values are float32 numbers (scores given as doubles come
+  back rounded to float32, i.e. to ~7 significant digits); the live EVI
+  handler encodes with `strict=False`, so an emotion Hume adds later is
+  skipped and counted in `unknown_emotions` instead of failing every
+  message, while exports and round trips stay strict;
+- `MessageRecord` is a `__slots__` record of one message holding the array;
+- `export_npy` / `load_npy` and `export_parquet` / `load_parquet` write many
+  records as columns (a float32 score matrix plus chat_id/seq/role/time) for
+  fast aggregation across sessions; the .npy matrix can be memory-mapped.
+"""
+import heapq
+import json
+import os
+from collections import Counter
+
+import numpy as np
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # Parquet export is optional; .npy needs only NumPy
+    pa = pq = None
+
+VOCABULARY_VERSION = 1
+
+# Field names of the Hume SDK's EmotionScores model (what dict(scores) yields)
+EMOTIONS = (
+    "admiration", "adoration", "aesthetic_appreciation", "amusement", "anger", "anxiety",
+    "awe", "awkwardness", "boredom", "calmness", "concentration", "confusion",
+    "contemplation", "contempt", "contentment", "craving", "desire", "determination",
+    "disappointment", "disgust", "distress", "doubt", "ecstasy", "embarrassment",
+    "empathic_pain", "entrancement", "envy", "excitement", "fear", "guilt", "horror",
+    "interest", "joy", "love", "nostalgia", "pain", "pride", "realization", "relief",
+    "romance", "sadness", "satisfaction", "shame", "surprise_negative",
+    "surprise_positive", "sympathy", "tiredness", "triumph",
+)
+
+# Display names (the API's JSON keys and the SDK field aliases)
+LABELS = tuple(
+    {"surprise_negative": "Surprise (negative)", "surprise_positive": "Surprise (positive)"}.get(
+        name, name.replace("_", " ").title())
+    for name in EMOTIONS
+)
+
+INDEX = {name: i for i, name in enumerate(EMOTIONS)}
+INDEX.update({label: i for i, label in enumerate(LABELS)})
+
+DTYPE = np.float32
+
+# Emotion names skipped by non-strict encodes, with how often they were seen
+unknown_emotions = Counter()
+
+
+def encode(scores, strict=True):
+    """Dict of emotion -> score (field names or display names) to a float32 array.
+
+    Names outside the vocabulary raise ValueError, or with `strict=False`
+    are skipped and counted in `unknown_emotions`.
+    """
+    array = np.full(len(EMOTIONS), np.nan, dtype=DTYPE)
+    for name, score in scores.items():
+        i = INDEX.get(name)
+        if i is None:
+            if strict:
+                raise ValueError(f"Unknown prosody emotion {name!r} (vocabulary v{VOCABULARY_VERSION})")
+            unknown_emotions[name] += 1
+            continue
+        array[i] = score
+    return array
+
+
+def decode(array, labels=False):
+    """Float32 array back to a dict keyed by field name (or display name if `labels`)."""
+    names = LABELS if labels else EMOTIONS
+    return {names[i]: float(score) for i, score in enumerate(array) if not np.isnan(score)}
+
+
+def top(array, n=3, labels=True):
+    """The `n` strongest emotions of one score array as a {name: score} dict."""
+    names = LABELS if labels else EMOTIONS
+    # A heap over a plain list beats NumPy calls on 48 values.
+    scores = array.tolist()
+    present = [i for i, score in enumerate(scores) if score == score]  # skip NaN
+    return {names[i]: scores[i] for i in heapq.nlargest(n, present, key=scores.__getitem__)}
+
+
+class MessageRecord:
+    """One user/assistant message with its prosody scores as a float32 array (or None)."""
+
+    __slots__ = ("role", "message", "timestamp", "scores")
+
+    def __init__(self, role, message, timestamp, scores=None):
+        self.role = role
+        self.message = message
+        self.timestamp = timestamp
+        self.scores = scores
+
+    @classmethod
+    def from_dict(cls, data):
+        """From the dict form ({"role", "message", "timestamp", "emotions"}) or a stored document."""
+        if "prosody" in data:
+            scores = np.array([np.nan if value is None else value for value in data["prosody"]],
+                              dtype=DTYPE)
+        else:
+            scores = encode(data["emotions"]) if data.get("emotions") else None
+        return cls(data["role"], data["message"], data["timestamp"], scores)
+
+    def to_dict(self):
+        """The dict form, with emotions as a {name: score} dict."""
+        return {
+            "role": self.role,
+            "message": self.message,
+            "timestamp": self.timestamp,
+            "emotions": decode(self.scores) if self.scores is not None else {},
+        }
+
+    def to_document(self):
+        """The stored form: scores as a list in vocabulary order instead of a named map."""
+        document = {"role": self.role, "message": self.message, "timestamp": self.timestamp}
+        if self.scores is not None:
+            document["prosody"] = [None if np.isnan(score) else float(score) for score in self.scores]
+            document["prosody_vocabulary"] = VOCABULARY_VERSION
+        return document
+
+
+def to_columns(rows):
+    """Columns of (chat_id, seq, MessageRecord) rows that have prosody scores."""
+    rows = [(chat_id, seq, record) for chat_id, seq, record in rows if record.scores is not None]
+    scores = np.empty((len(rows), len(EMOTIONS)), dtype=DTYPE)
+    for i, (_, _, record) in enumerate(rows):
+        scores[i] = record.scores
+    return {
+        "chat_id": np.array([chat_id for chat_id, _, _ in rows], dtype=str),
+        "seq": np.array([seq for _, seq, _ in rows], dtype=np.int32),
+        "role": np.array([record.role for _, _, record in rows], dtype=str),
+        "timestamp": np.array([record.timestamp for _, _, record in rows], dtype="datetime64[ms]"),
+        "scores": scores,
+    }
+
+
+def export_npy(rows, directory):
+    """Write `scores.npy` (float32, one row per message), `index.npz` and `vocabulary.json`."""
+    columns = to_columns(rows)
+    os.makedirs(directory, exist_ok=True)
+    np.save(os.path.join(directory, "scores.npy"), columns.pop("scores"))
+    np.savez(os.path.join(directory, "index.npz"), **columns)
+    with open(os.path.join(directory, "vocabulary.json"), "w") as f:
+        json.dump({"version": VOCABULARY_VERSION, "emotions": EMOTIONS}, f)
+    return len(columns["seq"])
+
+
+def load_npy(directory, mmap=True):
+    """Columns written by export_npy; the score matrix is memory-mapped unless `mmap` is False."""
+    with open(os.path.join(directory, "vocabulary.json")) as f:
+        vocabulary = json.load(f)
+    if tuple(vocabulary["emotions"]) != EMOTIONS:
+        raise ValueError(f"{directory} uses prosody vocabulary v{vocabulary['version']}, "
+                         f"expected v{VOCABULARY_VERSION}")
+    with np.load(os.path.join(directory, "index.npz")) as index:
+        columns = {name: index[name] for name in index.files}
+    columns["scores"] = np.load(os.path.join(directory, "scores.npy"), mmap_mode="r" if mmap else None)
+    return columns
+
+
+def export_parquet(rows, path):
+    """Write the columns to Parquet, one float32 column per emotion."""
+    if pa is None:
+        raise RuntimeError("Parquet export needs pyarrow (pip install pyarrow)")
+    columns = to_columns(rows)
+    scores = columns.pop("scores")
+    table = pa.table({
+        **{name: pa.array(values) for name, values in columns.items()},
+        **{name: pa.array(scores[:, i]) for i, name in enumerate(EMOTIONS)},
+    })
+    table = table.replace_schema_metadata({"prosody_vocabulary": str(VOCABULARY_VERSION)})
+    pq.write_table(table, path)
+    return table.num_rows
+
+
+def load_parquet(path, emotions=EMOTIONS):
+    """Columns of a Parquet export, reading only the requested emotion columns."""
+    if pa is None:
+        raise RuntimeError("Parquet export needs pyarrow (pip install pyarrow)")
+    table = pq.read_table(path, columns=["chat_id", "seq", "role", "timestamp", *emotions])
+    columns = {name: table.column(name).to_numpy() for name in ("chat_id", "seq", "role", "timestamp")}
+    columns["scores"] = np.column_stack(
+        [table.column(name).to_numpy() for name in emotions]).astype(DTYPE, copy=False)
+    return columns
+
+
+def records_from_log(log):
+    """(chat_id, seq, MessageRecord) rows of every message in a ConversationLog."""
+    for chat_id, seq, data in log.iter_messages():
+        yield chat_id, seq, MessageRecord.from_dict(data)
@@ -0,0 +1,83 @@
+"""Rolling aggregation of a live stream of Hume prosody scores.
+
+Sorting every message's score dict just to print its top 3 keeps nothing
+about the conversation as a whole. `ProsodyAggregator` is fed each message's
+float32 score array (see prosody.py) and keeps, for the whole chat:
+
+- an exponentially weighted moving average (the current mood),
+- the mean over a rolling window of the last `window` messages,
+- the chat-wide mean and per-emotion maximum,
+- a size-k min-heap of the strongest single readings (peaks).
+
+An update is a handful of vectorized operations over the 48 emotions plus
+O(k log k) heap work. `snapshot()` returns a plain dict that is computed at
+most once per update, so the UI and the persistence layer can poll it as
+often as they like.
+"""
+import heapq
+
+import numpy as np
+
+from prosody import EMOTIONS, LABELS, top
+
+
+class ProsodyAggregator:
+    """Streaming EWMA / rolling-window / top-k statistics over prosody score arrays."""
+
+    def __init__(self, alpha=0.3, window=10, k=3):
+        size = len(EMOTIONS)
+        self.alpha = alpha
+        self.window = window
+        self.k = k
+        self.count = 0
+        self.latest = None
+        self.ewma = np.zeros(size, dtype=np.float64)
+        self.total = np.zeros(size, dtype=np.float64)
+        self.peak = np.zeros(size, dtype=np.float32)
+        self._ring = np.zeros((window, size), dtype=np.float32)
+        self._window_sum = np.zeros(size, dtype=np.float64)
+        self._peaks = []  # min-heap of (score, seq, emotion index)
+        self._snapshot = None
+
+    def update(self, scores, seq=None):
+        """Add one message's score array (missing emotions count as 0)."""
+        scores = np.nan_to_num(scores, nan=0.0)
+        seq = self.count if seq is None else seq
+        if self.count == 0:
+            self.ewma[:] = scores
+        else:
+            self.ewma += self.alpha * (scores - self.ewma)
+        slot = self.count % self.window
+        self._window_sum += scores - self._ring[slot]
+        self._ring[slot] = scores
+        self.total += scores
+        np.maximum(self.peak, scores, out=self.peak)
+        self.count += 1
+        self.latest = scores
+
+        # Only this message's k strongest readings can enter the chat-wide top k.
+        values = scores.tolist()
+        for i in heapq.nlargest(self.k, range(len(values)), key=values.__getitem__):
+            entry = (values[i], seq, i)
+            if len(self._peaks) < self.k:
+                heapq.heappush(self._peaks, entry)
+            elif entry > self._peaks[0]:
+                heapq.heapreplace(self._peaks, entry)
+        self._snapshot = None
+
+    def snapshot(self):
+        """Top-k emotions of the latest message, the EWMA, the rolling window and the chat."""
+        if self._snapshot is None:
+            if not self.count:
+                return {"messages": 0, "latest": {}, "ewma": {}, "window": {}, "chat": {}, "peaks": []}
+            k = self.k
+            self._snapshot = {
+                "messages": self.count,
+                "latest": top(self.latest, k),
+                "ewma": top(self.ewma, k),
+                "window": top(self._window_sum / min(self.count, self.window), k),
+                "chat": top(self.total / self.count, k),
+                "peaks": [{"emotion": LABELS[i], "score": score, "seq": seq}
+                          for score, seq, i in sorted(self._peaks, reverse=True)],
+            }
+        return self._snapshot
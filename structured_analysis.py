@@ -0,0 +1,236 @@
+"""Combined sentiment + entity analysis in a single structured-output call.
+
+The separate analyses send the whole transcript twice (once for sentiment,
+once for entities), although the entity prompt already asks for emotions and
+their intensity. The combined mode makes one JSON-mode ChatCompletion call
+whose answer follows `ANALYSIS_SCHEMA`, validates it locally and returns a
+dict, so the results are machine-readable instead of free-form markdown.
+"""
+import json
+
+import jsonschema
+
+from analysis import map_reduce
+from llm_cache import response_cache
+from openai_client import openai_client
+from transcript_chunking import chunk_transcript
+
+COMBINED_MODEL = "gpt-4-turbo"  # GPT-4 quality with JSON mode
+CHUNK_TOKENS = 1500       # transcript tokens per combined-analysis call
+CHUNK_CONCURRENCY = 4     # chunks analyzed at the same time
+
+EMOTIONS = ["Joy", "Trust", "Fear", "Surprise", "Sadness", "Disgust", "Anger", "Anticipation"]
+INTENSITIES = ["Low", "Medium", "High"]
+
+_string_list = {"type": "array", "items": {"type": "string"}}
+
+ANALYSIS_SCHEMA = {
+    "type": "object",
+    "required": ["people", "locations", "events", "environment", "emotions", "associations"],
+    "properties": {
+        "people": _string_list,
+        "locations": _string_list,
+        "events": _string_list,
+        "environment": _string_list,
+        "emotions": {
+            "type": "array",
+            "items": {
+                "type": "object",
+                "required": ["emotion", "intensity", "primary"],
+                "properties": {
+                    "emotion": {"enum": EMOTIONS},
+                    "intensity": {"enum": INTENSITIES},
+                    "primary": {"type": "boolean"},
+                },
+            },
+        },
+        "associations": {
+            "type": "array",
+            "items": {
+                "type": "object",
+                "required": ["emotion", "people", "locations", "events", "environment"],
+                "properties": {
+                    "emotion": {"enum": EMOTIONS},
+                    "people": _string_list,
+                    "locations": _string_list,
+                    "events": _string_list,
+                    "environment": _string_list,
+                },
+            },
+        },
+    },
+}
+
+COMBINED_PROMPT = """
+    Analyze the text below based on the circumplex model of emotions and extract its entities.
+    Respond with a single JSON object with exactly these keys:
+
+    - "people": names of people mentioned in the text.
+    - "locations": specific locations mentioned (e.g., park, apartment, city, bookstore).
+    - "events": key actions or activities described (e.g., walking, kissing, watching a movie).
+    - "environment": the surroundings or environment conditions (e.g., rainy, noisy, cold).
+    - "emotions": a list of {{"emotion", "intensity", "primary"}} objects, where emotion is one of
+      Joy, Trust, Fear, Surprise, Sadness, Disgust, Anger, Anticipation; intensity is Low, Medium
+      or High; and primary is true only for the primary emotion.
+    - "associations": for each emotion, an object with "emotion", "people", "locations",
+      "events" and "environment" lists.
+
+    Use empty lists when there is nothing to report.
+
+    Text:
+    {text}
+    """
+
+
+def _complete(text):
+    """Return the raw JSON answer for `text`."""
+    response = openai_client.chat(
+        model=COMBINED_MODEL,
+        messages=[
+            {"role": "system", "content": "You are a helpful assistant that only answers in JSON."},
+            {"role": "user", "content": COMBINED_PROMPT.format(text=text)}
+        ],
+        response_format={"type": "json_object"},
+        max_tokens=600,
+        temperature=0
+    )
+    return response["choices"][0]["message"]["content"]
+
+
+def _normalize_labels(result):
+    """Title-case emotion and intensity labels ("joy" -> "Joy") before validation."""
+    for item in result.get("emotions", []) + result.get("associations", []):
+        if isinstance(item, dict):
+            for field in ("emotion", "intensity"):
+                if isinstance(item.get(field), str):
+                    item[field] = item[field].strip().title()
+    return result
+
+
+def validate_analysis(result):
+    """Raise ValueError unless `result` matches ANALYSIS_SCHEMA."""
+    try:
+        jsonschema.validate(result, ANALYSIS_SCHEMA)
+    except jsonschema.ValidationError as e:
+        path = "/".join(str(part) for part in e.absolute_path) or "<root>"
+        raise ValueError(f"Invalid analysis at {path}: {e.message}") from None
+    return result
+
+
+def _parse(answer):
+    """Parse, normalize and validate a JSON answer; raise ValueError if it is unusable."""
+    try:
+        result = json.loads(answer)
+    except json.JSONDecodeError as e:
+        raise ValueError(f"Analysis is not valid JSON: {e}") from None
+    return validate_analysis(_normalize_labels(result))
+
+
+def analyze_transcript(text):
+    """Run the combined analysis on `text` and return the validated dict.
+
+    Only validated results are cached, so a truncated or off-schema answer
+    is retried on the next call instead of being replayed from the cache.
+    """
+    key = response_cache.key(COMBINED_MODEL, COMBINED_PROMPT, text)
+    cached = response_cache.get(key)
+    if cached is not None:
+        try:
+            return _parse(cached)
+        except ValueError:
+            pass  # written before results were validated; fetch a fresh one
+    result = _parse(_complete(text))
+    response_cache.set(key, json.dumps(result))
+    return result
+
+
+def analyze_long_transcript(text, max_tokens=CHUNK_TOKENS, concurrency=CHUNK_CONCURRENCY):
+    """Combined analysis for transcripts of any length.
+
+    Transcripts over `max_tokens` are split on sentence boundaries, the chunks
+    are analyzed in parallel and the results merged (deduplicating people,
+    locations and events across chunks).
+    """
+    chunks = chunk_transcript(text, max_tokens, model=COMBINED_MODEL)
+    if len(chunks) <= 1:
+        return analyze_transcript(text)
+    return map_reduce(chunks, analyze_transcript, merge_analyses, concurrency)
+
+
+def merge_analyses(results):
+    """Merge per-window analyses into one result with the same schema.
+
+    Entity lists are unioned (case-insensitively, first spelling wins), each
+    emotion keeps its highest intensity, and the primary emotion is the one
+    most often reported as primary, ties broken by intensity.
+    """
+    merged = {key: [] for key in ("people", "locations", "events", "environment")}
+    seen = {key: set() for key in merged}
+    emotions = {}
+    associations = {}
+
+    def add(target, target_seen, values):
+        for value in values:
+            if value.casefold() not in target_seen:
+                target_seen.add(value.casefold())
+                target.append(value)
+
+    for result in results:
+        for key in merged:
+            add(merged[key], seen[key], result[key])
+        for item in result["emotions"]:
+            entry = emotions.setdefault(item["emotion"], {"intensity": "Low", "primary_votes": 0})
+            if INTENSITIES.index(item["intensity"]) > INTENSITIES.index(entry["intensity"]):
+                entry["intensity"] = item["intensity"]
+            entry["primary_votes"] += item["primary"]
+        for item in result["associations"]:
+            entry = associations.setdefault(item["emotion"], {
+                "emotion": item["emotion"],
+                **{key: [] for key in merged},
+                "_seen": {key: set() for key in merged},
+            })
+            for key in merged:
+                add(entry[key], entry["_seen"][key], item[key])
+
+    primary = max(emotions, default=None, key=lambda name: (
+        emotions[name]["primary_votes"], INTENSITIES.index(emotions[name]["intensity"])))
+    merged["emotions"] = [
+        {"emotion": name, "intensity": entry["intensity"], "primary": name == primary}
+        for name, entry in emotions.items()
+    ]
+    merged["associations"] = [
+        {key: value for key, value in entry.items() if key != "_seen"}
+        for entry in associations.values()
+    ]
+    return merged
+
+
+def format_sentiment(result):
+    """Render the emotions of a combined analysis as markdown."""
+    if not result["emotions"]:
+        return "No clear emotion detected."
+    lines = []
+    for item in sorted(result["emotions"], key=lambda item: not item["primary"]):
+        label = "Primary" if item["primary"] else "Secondary"
+        lines.append(f"- **{label}**: {item['emotion']} ({item['intensity']})")
+    return "\n".join(lines)
+
+
+def format_entities(result):
+    """Render the entities and emotion associations of a combined analysis as markdown."""
+    def listing(values):
+        return ", ".join(values) if values else "N/A"
+
+    lines = [
+        f"- **People**: {listing(result['people'])}",
+        f"- **Locations**: {listing(result['locations'])}",
+        f"- **Events**: {listing(result['events'])}",
+        f"- **Environment Conditions**: {listing(result['environment'])}",
+    ]
+    for association in result["associations"]:
+        lines.append(f"- **{association['emotion']}**: "
+                     f"people {listing(association['people'])}; "
+                     f"locations {listing(association['locations'])}; "
+                     f"events {listing(association['events'])}; "
+                     f"environment {listing(association['environment'])}")
+    return "\n".join(lines)
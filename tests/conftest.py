@@ -0,0 +1,375 @@
+"""Shared fixtures and fakes for the tests.
+
+The fakes stand in for the network services (OpenAI, Firestore, EVI) and
+are kept here rather than imported from the bench scripts, so the
+benchmarks can change without breaking the tests.
+"""
+import asyncio
+import contextlib
+import json
+import os
+import random
+import sys
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from types import SimpleNamespace
+from urllib.parse import parse_qs, urlparse
+
+import openai
+import pytest
+import websockets
+
+# The modules live at the top of the repository, next to the apps.
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+@pytest.fixture
+def transcript():
+    """Build a punctuated transcript of `sentences` varied sentences."""
+    def build(sentences, seed=0):
+        rng = random.Random(seed)
+        return " ".join(
+            f"then i was {rng.choice(['walking', 'shopping', 'cooking', 'reading'])} with "
+            f"{rng.choice(['Logan', 'Sam', 'Mia'])} at the {rng.choice(['park', 'bookstore', 'cafe'])} "
+            f"and it felt {rng.choice(['nice', 'weird', 'calm'])}."
+            for _ in range(sentences))
+    return build
+
+
+class FakeFirestore:
+    """The part of the Firestore client FirestoreWriter uses, with injected faults.
+
+    Commits fail at `fail_rate` (or always while `down`) before anything is
+    written; with `lose_acks`, every other commit is applied but reported as
+    failed, like a timeout after the write landed.
+    """
+
+    def __init__(self, fail_rate=0.0, lose_acks=False, seed=0):
+        self.fail_rate = fail_rate
+        self.lose_acks = lose_acks
+        self.down = False
+        self.rng = random.Random(seed)
+        self.documents = {}  # path -> data
+        self.commits = 0
+        self.failures = 0
+        self._lock = threading.Lock()
+
+    def collection(self, name):
+        return _FakeReference(self, name)
+
+    def batch(self):
+        return _FakeBatch(self)
+
+    def messages(self, chat_id, collection="Hume"):
+        """(seq, text) of every stored message of `chat_id`, in seq order."""
+        prefix = f"{collection}/{chat_id}/messages/"
+        return sorted((data["seq"], data["text"]) for path, data in self.documents.items()
+                      if path.startswith(prefix))
+
+    def _apply(self, writes):
+        with self._lock:
+            if self.down or self.rng.random() < self.fail_rate:
+                self.failures += 1
+                raise ConnectionError("injected Firestore failure")
+            for path, data, merge in writes:
+                self.documents[path] = {**(self.documents.get(path, {}) if merge else {}), **data}
+            self.commits += 1
+            if self.lose_acks and self.commits % 2:
+                raise ConnectionError("injected lost acknowledgement")
+
+
+class _FakeReference:
+    def __init__(self, db, path):
+        self.db = db
+        self.path = path
+
+    def collection(self, name):
+        return _FakeReference(self.db, f"{self.path}/{name}")
+
+    def document(self, name):
+        return _FakeReference(self.db, f"{self.path}/{name}")
+
+    def set(self, data, merge=False):
+        self.db._apply([(self.path, data, merge)])
+
+
+class _FakeBatch:
+    def __init__(self, db):
+        self.db = db
+        self.writes = []
+
+    def set(self, reference, data, merge=False):
+        self.writes.append((reference.path, data, merge))
+
+    def commit(self):
+        self.db._apply(self.writes)
+
+
+@pytest.fixture
+def firestore():
+    """Factory for FakeFirestore clients."""
+    return FakeFirestore
+
+
+def message(type, **fields):
+    """An EVI event with attribute access, like the SDK's parsed messages."""
+    return SimpleNamespace(type=type, **fields)
+
+
+class FakeEVISocket:
+    """Records what is sent over one fake EVI connection."""
+
+    def __init__(self, evi, on_message, on_close):
+        self.evi = evi
+        self.sent = []  # (method name, payload)
+        self.closed = False
+        self._on_message = on_message
+        self._on_close = on_close
+
+    async def send_user_input(self, payload):
+        self.sent.append(("send_user_input", payload))
+        if self.evi.echo:
+            await self._on_message(message("user_message", from_text=True,
+                                           message=SimpleNamespace(role="user", content=payload["text"])))
+
+    async def send_session_settings(self, payload):
+        self.sent.append(("send_session_settings", payload))
+
+    async def send_audio_input(self, payload):
+        self.sent.append(("send_audio_input", payload))
+
+    async def _send(self, data):
+        # hume's MicrophoneInterface sends raw PCM bytes this way
+        self.sent.append(("_send", data))
+
+    def names(self):
+        return [name for name, _ in self.sent]
+
+    async def drop(self):
+        """The connection fails, as if the network went away."""
+        self.closed = True
+        await self._on_close()
+
+
+class FakeEVI:
+    """In-process stand-in for `connect_with_callbacks`, with one FakeEVISocket per connection.
+
+    Connection attempts raise the exceptions queued in `failures` first.
+    With `echo`, user inputs are echoed back as user_messages, as EVI does.
+    """
+
+    def __init__(self, echo=True):
+        self.echo = echo
+        self.failures = []
+        self.sockets = []
+        self.resumed = []  # resumed_chat_group_id of every connection
+
+    def connect(self, resumed_chat_group_id=None, on_open=None, on_message=None, on_close=None, on_error=None):
+        @contextlib.asynccontextmanager
+        async def connection():
+            if self.failures:
+                raise self.failures.pop(0)
+            socket = FakeEVISocket(self, on_message, on_close)
+            self.sockets.append(socket)
+            self.resumed.append(resumed_chat_group_id)
+            await on_open()
+            await on_message(message("chat_metadata", chat_id=f"chat-{len(self.sockets)}",
+                                     chat_group_id=resumed_chat_group_id or "group-1"))
+            yield socket
+        return connection()
+
+
+class RecordingHandler:
+    """WebSocketHandler stand-in that keeps every message it is given."""
+
+    def __init__(self):
+        self.socket = None
+        self.messages = []
+
+    def set_socket(self, socket):
+        self.socket = socket
+
+    async def on_open(self):
+        pass
+
+    async def on_message(self, message):
+        self.messages.append(message)
+
+    async def on_close(self):
+        pass
+
+    async def on_error(self, error):
+        pass
+
+
+@pytest.fixture
+def evi():
+    return FakeEVI()
+
+
+@pytest.fixture
+def handler():
+    return RecordingHandler()
+
+
+def _namespace(value):
+    if isinstance(value, dict):
+        return SimpleNamespace(**{key: _namespace(item) for key, item in value.items()})
+    return value
+
+
+class StandInEVIServer:
+    """A local WebSocket server speaking just enough EVI for EVISession.
+
+    Sends chat_metadata on connect (resuming the group named by the
+    resumed_chat_group_id query parameter) and echoes user_input back as a
+    user_message. Handshakes are answered with the HTTP statuses queued in
+    `rejections` first; `drop()` aborts the current connection.
+    """
+
+    def __init__(self):
+        self.rejections = []
+        self.groups = []  # chat group of every accepted connection
+        self.inputs = []
+        self.url = None
+        self._connections = []
+
+    @contextlib.asynccontextmanager
+    async def serve(self):
+        async with websockets.serve(self._handle, "127.0.0.1", 0, process_request=self._process_request) as server:
+            self.url = f"ws://127.0.0.1:{server.sockets[0].getsockname()[1]}/v0/evi/chat"
+            yield self
+
+    async def drop(self):
+        self._connections[-1].transport.abort()
+
+    async def _process_request(self, path, headers):
+        if self.rejections:
+            return self.rejections.pop(0), [], b"rejected\n"
+        return None
+
+    async def _handle(self, ws, path=None):
+        path = path or ws.path
+        group = parse_qs(urlparse(path).query).get("resumed_chat_group_id", [f"group-{len(self.groups) + 1}"])[0]
+        self.groups.append(group)
+        self._connections.append(ws)
+        await ws.send(json.dumps({"type": "chat_metadata", "chat_id": f"chat-{len(self.groups)}",
+                                  "chat_group_id": group}))
+        with contextlib.suppress(websockets.ConnectionClosed):
+            async for raw in ws:
+                event = json.loads(raw)
+                if event["type"] == "user_input":
+                    self.inputs.append(event["text"])
+                    await ws.send(json.dumps({"type": "user_message", "from_text": True,
+                                              "message": {"role": "user", "content": event["text"]}}))
+
+    def connect(self, resumed_chat_group_id=None, on_open=None, on_message=None, on_close=None, on_error=None):
+        """A connect_with_callbacks equivalent for this server."""
+        query = f"?resumed_chat_group_id={resumed_chat_group_id}" if resumed_chat_group_id else ""
+
+        @contextlib.asynccontextmanager
+        async def connection():
+            async with websockets.connect(self.url + query) as ws:
+                async def receive():
+                    try:
+                        async for raw in ws:
+                            await on_message(_namespace(json.loads(raw)))
+                    except websockets.ConnectionClosed as error:
+                        await on_error(error)
+                    await on_close()
+
+                await on_open()
+                receiver = asyncio.create_task(receive())
+                try:
+                    yield _StandInSocket(ws)
+                finally:
+                    receiver.cancel()
+        return connection()
+
+
+class _StandInSocket:
+    def __init__(self, ws):
+        self.ws = ws
+
+    async def send_user_input(self, payload):
+        await self.ws.send(json.dumps({"type": "user_input", **payload}))
+
+
+@pytest.fixture
+def evi_server():
+    return StandInEVIServer()
+
+
+class StubOpenAIServer(ThreadingHTTPServer):
+    """Local stand-in for the chat-completions endpoint.
+
+    Answers with the HTTP statuses queued in `statuses` first (429s with
+    Retry-After: 0), then with `answer`, streamed as one chunk per word
+    when the request asks for a stream.
+    """
+
+    def __init__(self):
+        super().__init__(("127.0.0.1", 0), _StubOpenAIHandler)
+        self.statuses = []
+        self.answer = "stub answer"
+        self.requests = []  # decoded request bodies
+        self.lock = threading.Lock()
+
+    @property
+    def url(self):
+        return f"http://127.0.0.1:{self.server_address[1]}/v1"
+
+
+class _StubOpenAIHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def do_POST(self):
+        body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))))
+        with self.server.lock:
+            self.server.requests.append(body)
+            status = self.server.statuses.pop(0) if self.server.statuses else 200
+        if status != 200:
+            self._reply(status, {"error": {"message": f"stub error {status}", "type": "stub"}},
+                        {"Retry-After": "0"} if status == 429 else {})
+        elif body.get("stream"):
+            self.send_response(200)
+            self.send_header("Content-Type", "text/event-stream")
+            self.send_header("Connection", "close")
+            self.end_headers()
+            for word in self.server.answer.split(" "):
+                chunk = {"object": "chat.completion.chunk", "model": "stub",
+                         "choices": [{"index": 0, "delta": {"content": word + " "}, "finish_reason": None}]}
+                self.wfile.write(f"data: {json.dumps(chunk)}\n\n".encode("utf-8"))
+            self.wfile.write(b"data: [DONE]\n\n")
+            self.close_connection = True
+        else:
+            self._reply(200, {"object": "chat.completion", "model": "stub",
+                              "choices": [{"index": 0, "finish_reason": "stop",
+                                           "message": {"role": "assistant", "content": self.server.answer}}]})
+
+    def _reply(self, status, payload, headers=None):
+        data = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, format, *args):
+        pass
+
+
+@pytest.fixture
+def openai_stub(monkeypatch):
+    """A running StubOpenAIServer that the openai module is pointed at."""
+    server = StubOpenAIServer()
+    thread = threading.Thread(target=server.serve_forever, args=(0.01,), daemon=True)
+    thread.start()
+    monkeypatch.setattr(openai, "api_base", server.url)
+    monkeypatch.setattr(openai, "api_key", "sk-stub")
+    monkeypatch.setattr(openai, "requestssession", None)
+    yield server
+    server.shutdown()
+    server.server_close()
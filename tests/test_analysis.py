@@ -0,0 +1,125 @@
+import threading
+
+import pytest
+
+import analysis
+from analysis import IncrementalAnalyzer, run_analyses
+
+WAIT = 5  # seconds before a test gives up on a worker
+
+
+@pytest.fixture
+def release():
+    """An event the analyses block on; set at teardown so no worker stays stuck."""
+    event = threading.Event()
+    yield event
+    event.set()
+
+
+def test_calls_run_concurrently_and_arrive_in_completion_order(release):
+    both_started = threading.Barrier(2, timeout=WAIT)
+
+    def sentiment(text):
+        both_started.wait()  # raises BrokenBarrierError if the calls ran one after the other
+        release.wait(WAIT)
+        return f"sentiment of {text}"
+
+    def entities(text):
+        both_started.wait()
+        return f"entities of {text}"
+
+    results = run_analyses({"Sentiment Analysis": sentiment, "Entity Extraction": entities}, "hi", timeout=WAIT)
+
+    first = next(results)
+    assert (first.name, first.value, first.error) == ("Entity Extraction", "entities of hi", None)
+    release.set()
+    second = next(results)
+    assert (second.name, second.value, second.error) == ("Sentiment Analysis", "sentiment of hi", None)
+    assert next(results, None) is None
+
+
+def test_per_name_timeout_reports_only_the_slow_call(release):
+    def stuck(text):
+        release.wait(WAIT)
+        return "too late"
+
+    timeouts = {"Sentiment Analysis": 0.05, "Entity Extraction": WAIT}
+    results = list(run_analyses({"Sentiment Analysis": stuck, "Entity Extraction": str.upper}, "hi", timeouts))
+    by_name = {result.name: result for result in results}
+
+    assert by_name["Entity Extraction"].value == "HI"
+    sentiment = by_name["Sentiment Analysis"]
+    assert isinstance(sentiment.error, TimeoutError)
+    assert sentiment.value is None
+    assert sentiment.elapsed >= 0.05
+
+
+def test_a_single_timeout_applies_to_every_call(release):
+    def stuck(text):
+        release.wait(WAIT)
+
+    results = list(run_analyses({"A": stuck, "B": stuck}, "hi", timeout=0.05))
+
+    assert sorted(result.name for result in results) == ["A", "B"]
+    assert all(isinstance(result.error, TimeoutError) for result in results)
+
+
+def test_no_timeout_means_the_default():
+    results = list(run_analyses({"Echo": str.upper}, "hi", timeout=None))
+
+    assert [(result.value, result.error) for result in results] == [("HI", None)]
+    assert analysis._timeout_for("Echo", None) == analysis.DEFAULT_TIMEOUT
+
+
+def test_failures_are_reported_not_raised():
+    def broken(text):
+        raise RuntimeError("rate limited")
+
+    results = list(run_analyses({"Broken": broken, "Echo": str.upper}, "hi", timeout=WAIT))
+    errors = {result.name: result.error for result in results}
+
+    assert isinstance(errors["Broken"], RuntimeError)
+    assert errors["Echo"] is None
+    assert next(result.value for result in results if result.name == "Echo") == "HI"
+
+
+def test_incremental_windows_are_merged_at_the_end():
+    analyzer = IncrementalAnalyzer(str.split, lambda results: results, window=2)
+    for utterance in ["one", " ", "two", "three"]:
+        analyzer.add(utterance)
+
+    assert analyzer.finish(timeout=WAIT) == [["one", "two"], ["three"]]
+
+
+def test_failed_windows_are_left_out_of_the_merge():
+    def analyze(text):
+        if text == "bad":
+            raise ValueError("invalid analysis")
+        return text
+
+    analyzer = IncrementalAnalyzer(analyze, list, window=1)
+    for utterance in ["good", "bad"]:
+        analyzer.add(utterance)
+
+    assert analyzer.finish(timeout=WAIT) == ["good"]
+    assert [str(error) for error in analyzer.errors] == ["invalid analysis"]
+
+
+def test_finish_running_on_every_shared_worker_does_not_starve_the_windows():
+    # As when every session renders its incremental analysis at once: each
+    # finish() runs as an analysis, occupying the whole shared pool.
+    workers = analysis._executor._max_workers
+    all_busy = threading.Barrier(workers, timeout=WAIT)
+
+    def finish(analyzer):
+        all_busy.wait()
+        return analyzer.finish(timeout=WAIT)
+
+    analyzers = []
+    for i in range(workers):
+        analyzer = IncrementalAnalyzer(str.upper, list, window=10)
+        analyzer.add(f"session {i}")  # submitted by finish()
+        analyzers.append(analyzer)
+
+    futures = [analysis._executor.submit(finish, analyzer) for analyzer in analyzers]
+    assert [future.result(WAIT * 2) for future in futures] == [[f"SESSION {i}"] for i in range(workers)]
@@ -0,0 +1,148 @@
+import queue
+
+import numpy as np
+import pytest
+
+from audio_buffer import BACKPRESSURE, MERGE, SampleRing
+
+# 1000 samples in ten blocks of 100
+RING = {"seconds": 1, "fs": 1000, "block_samples": 100}
+
+
+def samples(start, count):
+    return np.arange(start, start + count, dtype=np.int16).reshape(-1, 1)
+
+
+def test_blocks_come_out_in_order_across_the_wraparound():
+    ring = SampleRing(**RING)
+    written = read = 0
+    for _ in range(5):  # 1500 samples through a ring of 1000
+        assert ring.write(samples(written, 300))
+        written += 300
+        for _ in range(3):
+            block = np.frombuffer(ring.read(timeout=0), dtype=np.int16)
+            assert np.array_equal(block, np.arange(read, read + 100))
+            read += 100
+
+    stats = ring.stats()
+    assert stats["overruns"] == stats["skipped_samples"] == 0
+    assert stats["depth"] == 100  # the block handed out last is still held
+
+
+def test_one_dimensional_writes_that_wrap():
+    ring = SampleRing(**RING, max_lag=1)
+    ring.write(samples(0, 900))
+    for _ in range(9):
+        ring.read(timeout=0)
+    ring.write(np.arange(900, 1100, dtype=np.int16))  # wraps after 100 samples
+
+    assert np.array_equal(np.frombuffer(ring.read(timeout=0), dtype=np.int16), np.arange(900, 1000))
+    assert np.array_equal(np.frombuffer(ring.read(timeout=0), dtype=np.int16), np.arange(1000, 1100))
+
+
+def test_drop_oldest_skips_whole_blocks_beyond_max_lag():
+    ring = SampleRing(**RING)  # max_lag defaults to half the capacity
+    ring.write(samples(0, 950))
+
+    block = np.frombuffer(ring.read(timeout=0), dtype=np.int16)
+
+    assert block[0] == 400  # (950 - 500) rounded down to whole blocks
+    assert ring.stats()["skipped_samples"] == 400
+
+
+def test_drop_oldest_honours_max_lag():
+    ring = SampleRing(**RING, max_lag=0.2)
+    ring.write(samples(0, 600))
+
+    assert np.frombuffer(ring.read(timeout=0), dtype=np.int16)[0] == 400
+    assert ring.stats()["lag_last"] == pytest.approx(0.2)
+
+
+def test_a_full_ring_drops_new_samples():
+    ring = SampleRing(**RING)
+    assert ring.write(samples(0, 1000))
+
+    assert not ring.write(samples(1000, 10))
+    stats = ring.stats()
+    assert stats["overruns"] == 1
+    assert stats["dropped_samples"] == 10
+    assert stats["max_depth"] == 1000
+
+
+def test_the_held_block_is_not_overwritten():
+    ring = SampleRing(**RING, max_lag=1)  # nothing is skipped
+    ring.write(samples(0, 1000))
+    for _ in range(9):
+        ring.read(timeout=0)
+    last = ring.read(timeout=0)
+
+    assert ring.write(samples(1000, 900))
+    assert not ring.write(samples(1900, 100))  # would overwrite the held block
+    assert np.array_equal(np.frombuffer(last, dtype=np.int16), np.arange(900, 1000))
+
+
+def test_merge_hands_out_the_backlog_in_larger_blocks():
+    ring = SampleRing(**RING, policy=MERGE, max_merge_blocks=4)
+    ring.write(samples(0, 700))
+
+    first = np.frombuffer(ring.read(timeout=0), dtype=np.int16)
+    second = np.frombuffer(ring.read(timeout=0), dtype=np.int16)
+
+    assert np.array_equal(np.concatenate([first, second]), np.arange(700))
+    assert (first.size, second.size) == (400, 300)
+    stats = ring.stats()
+    assert stats["merged_reads"] == 2
+    assert stats["skipped_samples"] == 0
+
+
+def test_merged_blocks_stop_at_the_end_of_the_buffer():
+    ring = SampleRing(**RING, policy=MERGE, max_merge_blocks=4)
+    ring.write(samples(0, 800))
+    for _ in range(2):
+        ring.read(timeout=0)  # 400 + 400
+    ring.write(samples(800, 400))
+
+    assert len(ring.read(timeout=0)) == 200  # 800..1000, then the wraparound
+    assert np.frombuffer(ring.read(timeout=0), dtype=np.int16)[0] == 1000
+
+
+def test_backpressure_is_raised_when_full_and_cleared_at_half():
+    ring = SampleRing(**RING, policy=BACKPRESSURE)
+    for i in range(10):
+        assert ring.write(samples(i * 100, 100))
+    assert not ring.backpressure.is_set()
+
+    assert not ring.write(samples(1000, 100))
+    assert ring.backpressure.is_set()
+
+    for _ in range(6):
+        ring.read(timeout=0)
+    assert ring.backpressure.is_set()
+    ring.read(timeout=0)  # releases the sixth block: 400 left
+    assert not ring.backpressure.is_set()
+    assert ring.stats()["skipped_samples"] == 0
+
+
+def test_read_times_out_without_a_whole_block():
+    ring = SampleRing(**RING)
+    ring.write(samples(0, 50))
+
+    with pytest.raises(queue.Empty):
+        ring.read(timeout=0.01)
+
+
+def test_unknown_policy_is_rejected():
+    with pytest.raises(ValueError, match="Unknown policy"):
+        SampleRing(**RING, policy="drop_newest")
+
+
+def test_free_counts_the_held_block_as_used():
+    ring = SampleRing(**RING)
+    assert ring.free() == 1000
+
+    ring.write(samples(0, 300))
+    ring.read(timeout=0)
+    assert ring.free() == 700
+
+    ring.read(timeout=0)  # hands the first block back
+    assert ring.free() == 800
@@ -0,0 +1,125 @@
+import base64
+import io
+import wave
+
+import numpy as np
+import pytest
+
+from audio_playback import AudioPlayer, JitterBuffer, parse_wav
+
+FS = 1000  # 1 frame per millisecond
+
+
+def frames(start, count):
+    return np.arange(start, start + count, dtype=np.int16).reshape(-1, 1)
+
+
+def wav_chunk(samples, fs=FS):
+    data = io.BytesIO()
+    with wave.open(data, "wb") as wav:
+        wav.setnchannels(1)
+        wav.setsampwidth(2)
+        wav.setframerate(fs)
+        wav.writeframes(np.asarray(samples, dtype=np.int16).tobytes())
+    return base64.b64encode(data.getvalue()).decode("ascii")
+
+
+@pytest.fixture
+def player(monkeypatch):
+    monkeypatch.setattr(AudioPlayer, "_open", lambda self, fs, channels: None)  # no audio device
+    return AudioPlayer(target_ms=0, capacity_ms=100, max_capacity_ms=1000)
+
+
+def test_parse_wav_finds_the_pcm_frames():
+    fs, channels, pcm = parse_wav(base64.b64decode(wav_chunk([1, 2, 3])))
+
+    assert (fs, channels) == (FS, 1)
+    assert np.frombuffer(pcm, dtype=np.int16).tolist() == [1, 2, 3]
+
+
+def test_buffer_plays_in_order_across_the_wraparound():
+    buffer = JitterBuffer(FS, target_ms=0, capacity_ms=100)
+    out = np.empty((30, 1), dtype=np.int16)
+    played = []
+    for i in range(10):
+        assert buffer.write(frames(i * 30, 30))
+        buffer.read(out)
+        played.extend(out[:, 0])
+
+    assert played == list(range(300))
+    assert buffer.metrics["grows"] == 0
+
+
+def test_buffer_grows_for_a_reply_sent_faster_than_real_time():
+    buffer = JitterBuffer(FS, target_ms=0, capacity_ms=100, max_capacity_ms=1000)
+    out = np.empty((50, 1), dtype=np.int16)
+    buffer.write(frames(0, 80))
+    buffer.read(out)  # the read position is now inside the buffer, so growing must unwrap
+    for i in range(9):
+        assert buffer.write(frames(80 + i * 50, 50))
+
+    stats = buffer.stats()
+    assert stats["dropped_frames"] == 0
+    assert stats["grows"] == 3  # 100 -> 200 -> 400 -> 800 frames
+    assert stats["capacity_ms"] == 800
+    played = [out[:, 0].tolist()]
+    while buffer.stats()["depth_ms"]:
+        buffer.read(out)
+        played.append(out[:, 0].tolist())
+    assert sum(played, [])[:530] == list(range(530))
+
+
+def test_audio_beyond_the_maximum_is_dropped_and_counted():
+    buffer = JitterBuffer(FS, capacity_ms=100, max_capacity_ms=300)
+
+    assert buffer.write(frames(0, 250))
+    assert not buffer.write(frames(250, 100))
+    stats = buffer.stats()
+    assert stats["overruns"] == 1
+    assert stats["dropped_ms"] == 100
+    assert stats["capacity_ms"] == 300
+
+
+def test_speaking_until_the_buffer_has_played_out():
+    buffer = JitterBuffer(FS, target_ms=0, capacity_ms=100)
+    out = np.empty((50, 1), dtype=np.int16)
+    assert not buffer.speaking
+    buffer.write(frames(0, 20))
+    assert buffer.speaking
+    buffer.clear()
+    assert not buffer.speaking
+    assert buffer.stats()["cleared_frames"] == 20
+    buffer.read(out)
+    assert not out.any()
+
+
+def test_player_feeds_chunks_into_its_buffer(player):
+    assert player.feed(wav_chunk(range(50)))
+    assert player.feed(wav_chunk(range(50, 250)))  # more than the initial capacity
+
+    stats = player.stats()
+    assert stats["chunks"] == 2
+    assert stats["depth_ms"] == 250
+    assert stats["bad_chunks"] == 0
+
+
+@pytest.mark.parametrize("payload", [
+    "not base64!",
+    base64.b64encode(b"RIFF\0\0\0\0WAVEjunk").decode("ascii"),
+    wav_chunk(range(10))[:30],
+])
+def test_malformed_chunks_are_skipped_and_counted(player, payload):
+    assert not player.feed(payload)
+    assert player.feed(wav_chunk(range(10)))
+
+    stats = player.stats()
+    assert stats["bad_chunks"] == 1
+    assert stats["chunks"] == 1
+    assert player.last_error is not None
+
+
+def test_chunks_in_another_format_are_skipped(player):
+    player.feed(wav_chunk(range(10)))
+
+    assert not player.feed(wav_chunk(range(10), fs=2 * FS))
+    assert player.bad_chunks == 1
@@ -0,0 +1,39 @@
+import numpy as np
+
+import audio_source
+from audio_buffer import MERGE, SampleRing
+from audio_codec import encode_wav
+
+FS = 16000
+BLOCK = 4000
+
+
+def write_clip(path, seconds):
+    samples = (np.arange(int(seconds * FS)) % 1000).astype(np.int16)
+    path.write_bytes(encode_wav(samples, FS).getvalue())
+    return samples
+
+
+def test_throttled_fast_replay_does_not_overrun_the_ring(tmp_path, monkeypatch):
+    clip = write_clip(tmp_path / "clip.wav", 5)  # five times the ring
+    monkeypatch.setattr(audio_source, "REPLAY_FILES", [str(tmp_path / "clip.wav")])
+    monkeypatch.setattr(audio_source, "REPLAY_SPEED", 0)
+    ring = SampleRing(1, FS, BLOCK, policy=MERGE)
+
+    received = []
+    with audio_source.input_stream(samplerate=FS, callback=lambda indata, *_: ring.write(indata),
+                                   throttle=lambda: ring.free() > BLOCK):
+        while sum(block.size for block in received) < clip.size:
+            received.append(np.frombuffer(ring.read(timeout=5), dtype=np.int16).copy())
+
+    assert ring.stats()["overruns"] == 0
+    assert np.array_equal(np.concatenate(received)[:clip.size], clip)
+
+
+def test_the_throttle_only_holds_back_a_fast_replay(tmp_path):
+    write_clip(tmp_path / "clip.wav", 0.5)
+    source = audio_source.WavReplaySource(str(tmp_path / "clip.wav"), FS, speed=50,
+                                          callback=lambda *_: None, throttle=lambda: False)
+
+    with source:
+        assert source.finished.wait(5)
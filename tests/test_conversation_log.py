@@ -0,0 +1,37 @@
+import datetime
+
+from conversation_log import ConversationLog
+
+
+def test_sequences_continue_after_a_restart(tmp_path):
+    path = str(tmp_path / "conversations.sqlite3")
+    log = ConversationLog(path)
+    assert [log.append("chat", {"text": str(i)}) for i in range(3)] == [0, 1, 2]
+
+    reopened = ConversationLog(path)
+    assert reopened.append("chat", {"text": "3"}) == 3
+    assert reopened.append("other", {"text": "a"}) == 0
+    assert [message["text"] for message in reopened.messages("chat")] == ["0", "1", "2", "3"]
+
+
+def test_datetimes_round_trip(tmp_path):
+    log = ConversationLog(str(tmp_path / "conversations.sqlite3"))
+    sent = datetime.datetime(2024, 5, 1, 12, 30, 15, 250000)
+    log.append("chat", {"text": "hi", "timestamp": sent})
+
+    assert log.messages("chat") == [{"text": "hi", "timestamp": sent}]
+
+
+def test_unsynced_returns_one_chat_in_order_until_marked(tmp_path):
+    log = ConversationLog(str(tmp_path / "conversations.sqlite3"))
+    for i in range(3):
+        log.append("first", {"text": str(i)})
+    log.append("second", {"text": "a"})
+
+    batch = log.unsynced(limit=2)
+    assert [(chat_id, seq) for chat_id, seq, _ in batch] == [("first", 0), ("first", 1)]
+    log.mark_synced("first", [0, 1])
+    assert [(chat_id, seq) for chat_id, seq, _ in log.unsynced()] == [("first", 2)]
+    log.mark_synced("first", [2])
+    assert [(chat_id, seq) for chat_id, seq, _ in log.unsynced()] == [("second", 0)]
+    assert log.pending() == 1
@@ -0,0 +1,44 @@
+import json
+import pathlib
+
+import pytest
+
+from emotion_backends import LexiconEmotionBackend, format_emotions
+from structured_analysis import EMOTIONS, INTENSITIES
+
+SAMPLE = pathlib.Path(__file__).resolve().parent.parent / "emotion_sample.jsonl"
+
+
+@pytest.fixture
+def lexicon():
+    return LexiconEmotionBackend()
+
+
+def emotions(backend, text):
+    return [item["emotion"] for item in backend.analyze(text)]
+
+
+def test_negated_emotion_words_are_ignored(lexicon):
+    assert emotions(lexicon, "I was not afraid at all") == []
+
+
+@pytest.mark.parametrize("text", ["We closed the door and walked down the street.",
+                                  "I'm looking at apartments next week."])
+def test_everyday_phrases_are_neutral(lexicon, text):
+    assert format_emotions(lexicon.analyze(text)) == "Neutral"
+
+
+def test_hedges_lower_the_intensity(lexicon):
+    assert lexicon.analyze("I'm kind of sad")[0]["intensity"] == "Low"
+    assert lexicon.analyze("I'm really really sad")[0]["intensity"] == "Medium"
+
+
+def test_the_labelled_sample_is_well_formed():
+    rows = [json.loads(line) for line in SAMPLE.read_text().splitlines() if line.strip()]
+
+    assert len(rows) == 40
+    for row in rows:
+        labels = row["emotions"]
+        assert all(item["emotion"] in EMOTIONS and item["intensity"] in INTENSITIES for item in labels)
+        assert sum(item["primary"] for item in labels) == (1 if labels else 0)
+        assert labels == [] or labels[0]["primary"]
@@ -0,0 +1,176 @@
+import asyncio
+
+import pytest
+from websockets.exceptions import InvalidStatusCode
+
+from evi_session import EVISession, status_code
+
+
+async def until(condition, timeout=5):
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + timeout
+    while not condition():
+        assert loop.time() < deadline, "timed out waiting for the session"
+        await asyncio.sleep(0.001)
+
+
+def session_for(evi, handler, **kwargs):
+    kwargs.setdefault("base_delay", 0.001)
+    return EVISession(evi.connect, handler, **kwargs)
+
+
+async def connected(session, count=1):
+    await until(lambda: session.socket is not None and session.metrics["connections"] >= count)
+
+
+def test_audio_is_muted_on_both_send_paths_while_the_assistant_speaks(evi, handler):
+    speaking = True
+    session = session_for(evi, handler, mute_audio=lambda: speaking)
+
+    async def main():
+        nonlocal speaking
+        runner = asyncio.create_task(session.run())
+        await connected(session)
+        await session.proxy._send(b"echo of the assistant")
+        await session.proxy.send_audio_input({"data": "echo of the assistant"})
+        speaking = False
+        await session.proxy._send(b"user speech")
+        session.stop()
+        await runner
+
+    asyncio.run(main())
+
+    assert evi.sockets[0].sent == [("_send", b"user speech")]
+    assert session.stats()["muted_sends"] == 2
+
+
+def test_user_inputs_are_resent_after_a_reconnect_until_echoed(evi, handler):
+    evi.echo = False
+    session = session_for(evi, handler)
+
+    async def main():
+        runner = asyncio.create_task(session.run())
+        await connected(session)
+        await session.send_user_input("hello")
+        assert session.stats()["pending_inputs"] == 1
+        evi.echo = True
+        await evi.sockets[0].drop()
+        await connected(session, 2)
+        session.stop()
+        await runner
+
+    asyncio.run(main())
+
+    assert [socket.sent for socket in evi.sockets] == [[("send_user_input", {"text": "hello"})]] * 2
+    stats = session.stats()
+    assert stats["pending_inputs"] == 0
+    assert stats["replayed_inputs"] == 1
+
+
+def test_reconnects_resume_the_chat_group_and_replay_the_settings(evi, handler):
+    session = session_for(evi, handler)
+    settings = {"audio": {"encoding": "linear16", "sample_rate": 16000, "channels": 1}}
+
+    async def main():
+        runner = asyncio.create_task(session.run())
+        await connected(session)
+        await session.proxy.send_session_settings(settings)
+        await evi.sockets[0].drop()
+        await connected(session, 2)
+        session.stop()
+        await runner
+
+    asyncio.run(main())
+
+    assert evi.resumed == [None, "group-1"]
+    assert evi.sockets[1].sent == [("send_session_settings", settings)]
+    assert handler.socket is session.proxy
+    assert session.chat_id == "chat-1"
+    assert session.stats()["reconnects"] == 1
+
+
+def test_audio_sent_while_disconnected_is_dropped(evi, handler):
+    session = session_for(evi, handler, base_delay=60)
+
+    async def main():
+        runner = asyncio.create_task(session.run())
+        await connected(session)
+        await evi.sockets[0].drop()
+        await until(lambda: session.socket is None)
+        await session.proxy._send(b"stale speech")
+        session.stop()
+        await runner
+
+    asyncio.run(main())
+
+    assert evi.sockets[0].sent == []
+    assert session.stats()["dropped_sends"] == 1
+
+
+def test_rejected_handshakes_are_backed_off_and_retried(evi_server, handler):
+    evi_server.rejections = [503, 429]
+    session = EVISession(evi_server.connect, handler, base_delay=0.001)
+
+    async def main():
+        async with evi_server.serve():
+            runner = asyncio.create_task(session.run())
+            await connected(session)
+            await session.send_user_input("hello")
+            await until(lambda: not session.stats()["pending_inputs"])
+            session.stop()
+            await runner
+
+    asyncio.run(main())
+
+    assert evi_server.inputs == ["hello"]
+    stats = session.stats()
+    assert stats["failed_connects"] == 2
+    assert stats["connections"] == 1
+    assert status_code(session.last_error) == 429
+
+
+def test_an_authentication_failure_is_fatal(evi_server, handler):
+    evi_server.rejections = [401]
+    session = EVISession(evi_server.connect, handler, base_delay=0.001)
+
+    async def main():
+        async with evi_server.serve():
+            await session.run()
+
+    with pytest.raises(InvalidStatusCode) as error:
+        asyncio.run(main())
+
+    assert error.value.status_code == 401
+    assert session.stats()["failed_connects"] == 1
+
+
+def test_a_dropped_connection_resumes_its_chat_group(evi_server, handler):
+    session = EVISession(evi_server.connect, handler, base_delay=0.001)
+
+    async def main():
+        async with evi_server.serve():
+            runner = asyncio.create_task(session.run())
+            await connected(session)
+            await evi_server.drop()
+            await connected(session, 2)
+            await session.send_user_input("still there?")
+            await until(lambda: not session.stats()["pending_inputs"])
+            session.stop()
+            await runner
+
+    asyncio.run(main())
+
+    assert evi_server.groups == ["group-1", "group-1"]
+    assert evi_server.inputs == ["still there?"]
+    assert session.chat_id == "chat-1"
+    assert session.stats()["reconnects"] == 1
+
+
+def test_giving_up_after_max_attempts(evi, handler):
+    evi.failures = [ConnectionRefusedError("refused")] * 3
+    session = session_for(evi, handler, max_attempts=2)
+
+    with pytest.raises(ConnectionError, match="failed 2 times in a row"):
+        asyncio.run(session.run())
+
+    assert session.stats()["failed_connects"] == 3
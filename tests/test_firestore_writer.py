@@ -0,0 +1,136 @@
+import asyncio
+
+from conversation_log import ConversationLog
+from firestore_writer import FirestoreWriter
+
+
+def message(i):
+    return {"role": "USER" if i % 2 == 0 else "ASSISTANT", "text": f"message {i}"}
+
+
+def writer_for(db, **kwargs):
+    return FirestoreWriter(db, flush_interval=0.01, base_delay=0.001, max_delay=0.01, **kwargs)
+
+
+def expected(count):
+    return [(i, f"message {i}") for i in range(count)]
+
+
+async def chat(writer, chat_id, count):
+    for i in range(count):
+        writer.add(chat_id, message(i))
+        await asyncio.sleep(0)
+
+
+def test_every_message_is_stored_exactly_once_despite_failures(firestore):
+    db = firestore(fail_rate=0.3, seed=1)
+    writer = writer_for(db, max_batch=7, max_retries=20)
+
+    async def main():
+        async with writer:
+            await chat(writer, "chat", 60)
+
+    asyncio.run(main())
+
+    assert db.failures > 0
+    assert db.messages("chat") == expected(60)
+    assert db.documents["Hume/chat"]["message_count"] == 60
+    stats = writer.stats()
+    assert stats["messages"] == 60
+    assert stats["pending"] == 0
+
+
+def test_retried_commits_that_did_land_leave_no_duplicates(firestore):
+    db = firestore(lose_acks=True)
+    writer = writer_for(db, max_batch=5)
+
+    async def main():
+        async with writer:
+            await chat(writer, "chat", 20)
+
+    asyncio.run(main())
+
+    assert db.messages("chat") == expected(20)
+    assert db.commits > writer.stats()["batches"]
+
+
+def test_batches_hold_one_chat_and_at_most_max_batch_messages(firestore):
+    db = firestore()
+    writer = writer_for(db, max_batch=4)
+
+    async def main():
+        for i in range(10):
+            writer.add("a" if i % 2 else "b", message(i))
+        await writer.flush()
+
+    asyncio.run(main())
+
+    assert [seq for seq, _ in db.messages("a")] == [seq for seq, _ in db.messages("b")] == list(range(5))
+    assert db.commits == 4  # 4 + 1 messages of each chat
+    assert writer.stats()["batches"] == 4
+
+
+def test_messages_are_kept_when_firestore_stays_down(firestore):
+    db = firestore()
+    db.down = True
+    writer = writer_for(db, max_retries=2)
+
+    async def main():
+        for i in range(3):
+            writer.add("chat", message(i))
+        await writer.flush()
+        assert writer.stats()["pending"] == 3
+        db.down = False
+        await writer.flush()
+
+    asyncio.run(main())
+
+    assert writer.metrics["failed_flushes"] == 1
+    assert db.messages("chat") == expected(3)
+    assert writer.stats()["pending"] == 0
+
+
+def test_closing_during_a_retry_backoff_keeps_the_batch(firestore, monkeypatch):
+    monkeypatch.setattr("firestore_writer.random.uniform", lambda low, high: high)
+    db = firestore()
+    db.down = True
+    writer = FirestoreWriter(db, flush_interval=0, base_delay=60, max_delay=60)
+
+    async def main():
+        async with writer:
+            await chat(writer, "chat", 3)
+            while not db.failures:  # the first commit failed; the writer is backing off
+                await asyncio.sleep(0.001)
+            db.down = False
+
+    asyncio.run(main())
+
+    assert db.messages("chat") == expected(3)
+    assert writer.stats()["pending"] == 0
+
+
+def test_the_log_is_caught_up_by_the_next_writer(firestore, tmp_path):
+    path = str(tmp_path / "conversations.sqlite3")
+    db = firestore()
+    db.down = True
+
+    async def first_run():
+        writer = writer_for(db, log=ConversationLog(path), max_retries=1)
+        async with writer:
+            await chat(writer, "chat", 8)
+
+    async def second_run():
+        writer = writer_for(db, log=ConversationLog(path))
+        assert writer.stats()["pending"] == 8
+        async with writer:
+            pass
+        return writer
+
+    asyncio.run(first_run())
+    assert db.messages("chat") == []
+    db.down = False
+    writer = asyncio.run(second_run())
+
+    assert db.messages("chat") == expected(8)
+    assert writer.stats()["pending"] == 0
+    assert ConversationLog(path).pending() == 0
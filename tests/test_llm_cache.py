@@ -0,0 +1,111 @@
+import pytest
+
+import llm_cache
+from llm_cache import ResponseCache
+
+
+class Clock:
+    def __init__(self, now=1000.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(llm_cache.time, "time", clock)
+    return clock
+
+
+def test_keys_ignore_case_and_whitespace():
+    assert ResponseCache.key("gpt-4", "t", "I went  to\nthe Park") == ResponseCache.key("gpt-4", "t", "i went to the park")
+    assert ResponseCache.key("gpt-4", "t", "park") != ResponseCache.key("gpt-3.5-turbo", "t", "park")
+
+
+def test_responses_survive_a_restart(tmp_path, clock):
+    path = str(tmp_path / "cache.sqlite3")
+    ResponseCache(path).set("k", "answer")
+
+    cache = ResponseCache(path)
+    assert cache.get("k") == "answer"
+    assert cache.get("k") == "answer"
+    assert cache.get("missing") is None
+    stats = cache.stats()
+    assert (stats["disk_hits"], stats["memory_hits"], stats["misses"]) == (1, 1, 1)
+
+
+def test_entries_expire_after_the_ttl(tmp_path, clock):
+    path = str(tmp_path / "cache.sqlite3")
+    cache = ResponseCache(path, ttl=60)
+    cache.set("k", "answer")
+
+    clock.now += 59
+    assert cache.get("k") == "answer"
+    clock.now += 1
+    assert cache.get("k") is None
+    assert cache.metrics["expired"] == 1
+
+    # The expired row is gone from disk too.
+    assert ResponseCache(path, ttl=10 ** 9).get("k") is None
+
+
+def test_memory_tier_is_lru(clock):
+    cache = ResponseCache(":memory:", max_memory_items=2)
+    cache.set("a", "1")
+    cache.set("b", "2")
+    cache.get("a")
+    cache.set("c", "3")  # "b" is the least recently used
+
+    assert cache.stats()["memory_items"] == 2
+    assert cache.get("b") == "2"
+    assert cache.metrics["disk_hits"] == 1
+    assert cache.metrics["memory_hits"] == 1
+
+
+def test_disk_tier_evicts_the_least_recently_used_rows(clock):
+    cache = ResponseCache(":memory:", max_memory_items=0, max_disk_items=2)
+    cache.set("a", "1")
+    clock.now += 1
+    cache.set("b", "2")
+    clock.now += 1
+    cache.get("a")
+    clock.now += 1
+    cache.set("c", "3")
+
+    assert cache.metrics["evictions"] == 1
+    assert cache.get("b") is None
+    assert cache.get("a") == "1"
+    assert cache.get("c") == "3"
+
+
+def test_cached_calls_the_function_once_per_text(clock):
+    cache = ResponseCache(":memory:")
+    calls = []
+
+    @cache.cached("gpt-4", "template")
+    def analyze(text):
+        calls.append(text)
+        return text.upper()
+
+    assert analyze("hello") == "HELLO"
+    assert analyze("  Hello ") == "HELLO"
+    assert calls == ["hello"]
+
+
+def test_cached_stream_caches_only_complete_streams(clock):
+    cache = ResponseCache(":memory:")
+
+    @cache.cached_stream("gpt-4", "template")
+    def stream(text):
+        yield "one "
+        if text == "broken":
+            raise ConnectionError("stream cut")
+        yield "two"
+
+    assert list(stream("fine")) == ["one ", "two"]
+    assert list(stream("fine")) == ["one two"]
+    with pytest.raises(ConnectionError):
+        list(stream("broken"))
+    assert cache.get(cache.key("gpt-4", "template", "broken")) is None
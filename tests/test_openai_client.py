@@ -0,0 +1,76 @@
+import openai
+import pytest
+
+from openai_client import OpenAIClient
+
+MESSAGES = [{"role": "user", "content": "How was my day?"}]
+
+
+@pytest.fixture
+def client():
+    return OpenAIClient(requests_per_minute=60000, base_delay=0.001, max_delay=0.01,
+                        concurrency={"chat_stream": 1})
+
+
+def test_transient_errors_are_retried(openai_stub, client):
+    openai_stub.statuses = [429, 503]
+
+    response = client.chat(model="gpt-4", messages=MESSAGES, max_tokens=10)
+
+    assert response["choices"][0]["message"]["content"] == "stub answer"
+    assert len(openai_stub.requests) == 3
+    stats = client.stats()
+    assert (stats["calls"], stats["retries"], stats["failures"]) == (3, 2, 0)
+    assert stats["latency"]["chat"]["count"] == 3
+
+
+def test_client_errors_are_not_retried(openai_stub, client):
+    openai_stub.statuses = [400]
+
+    with pytest.raises(openai.error.InvalidRequestError):
+        client.chat(model="gpt-4", messages=MESSAGES)
+
+    assert len(openai_stub.requests) == 1
+    assert client.stats()["failures"] == 1
+
+
+def test_retries_give_up_after_max_retries(openai_stub):
+    openai_stub.statuses = [500] * 3
+    client = OpenAIClient(max_retries=2, base_delay=0.001)
+
+    with pytest.raises(openai.error.APIError):
+        client.chat(model="gpt-4", messages=MESSAGES)
+
+    assert len(openai_stub.requests) == 3
+
+
+def test_streams_yield_the_answer_and_record_first_token_latency(openai_stub, client):
+    openai_stub.statuses = [429]
+    openai_stub.answer = "a streamed answer"
+
+    assert "".join(client.chat_stream(model="gpt-4", messages=MESSAGES)) == "a streamed answer "
+    latency = client.stats()["latency"]
+    assert latency["chat_ttft"]["count"] == latency["chat_total"]["count"] == 1
+    assert openai_stub.requests[-1]["stream"] is True
+
+
+def test_a_stream_holds_its_concurrency_slot_until_it_is_finished(openai_stub, client):
+    slot = client.slot("chat_stream")
+    stream = client.chat_stream(model="gpt-4", messages=MESSAGES)
+
+    assert next(stream) == "stub "
+    assert not slot.acquire(blocking=False)  # still taken while the answer streams
+    assert "".join(stream) == "answer "
+    assert slot.acquire(blocking=False)
+    slot.release()
+
+
+def test_closing_a_stream_early_releases_its_slot(openai_stub, client):
+    slot = client.slot("chat_stream")
+    stream = client.chat_stream(model="gpt-4", messages=MESSAGES)
+    next(stream)
+
+    stream.close()
+
+    assert slot.acquire(blocking=False)
+    slot.release()
@@ -0,0 +1,89 @@
+import datetime
+from collections import Counter
+
+import numpy as np
+import pytest
+
+import prosody
+from prosody import EMOTIONS, MessageRecord, decode, encode, export_npy, load_npy, top
+from prosody_aggregator import ProsodyAggregator
+
+SCORES = {"joy": 0.5, "calmness": 0.25, "surprise_negative": 0.125}
+WHEN = datetime.datetime(2024, 5, 1, 12, 30)
+
+
+def test_encode_decode_round_trip():
+    array = encode(SCORES)
+
+    assert array.dtype == np.float32
+    assert array.shape == (len(EMOTIONS),)
+    assert decode(array) == SCORES
+
+
+def test_display_names_are_accepted_and_returned():
+    array = encode({"Joy": 0.5, "Surprise (negative)": 0.125})
+
+    assert decode(array) == {"joy": 0.5, "surprise_negative": 0.125}
+    assert decode(array, labels=True) == {"Joy": 0.5, "Surprise (negative)": 0.125}
+
+
+def test_doubles_come_back_rounded_to_float32():
+    assert decode(encode({"joy": 0.1}))["joy"] == pytest.approx(0.1, rel=1e-7)
+
+
+def test_unknown_emotions_raise_unless_not_strict(monkeypatch):
+    monkeypatch.setattr(prosody, "unknown_emotions", Counter())
+
+    with pytest.raises(ValueError, match="Unknown prosody emotion 'wonder'"):
+        encode({"joy": 0.5, "wonder": 0.25})
+    assert decode(encode({"joy": 0.5, "wonder": 0.25}, strict=False)) == {"joy": 0.5}
+    assert prosody.unknown_emotions == {"wonder": 1}
+
+
+def test_top_skips_missing_emotions():
+    assert top(encode(SCORES), n=2) == {"Joy": 0.5, "Calmness": 0.25}
+    assert top(encode({"joy": 0.5}), n=3) == {"Joy": 0.5}
+
+
+def test_message_records_round_trip_through_documents_and_dicts():
+    record = MessageRecord("USER", "hello", WHEN, encode(SCORES))
+
+    stored = MessageRecord.from_dict(record.to_document())
+    assert stored.to_dict() == {"role": "USER", "message": "hello", "timestamp": WHEN, "emotions": SCORES}
+    assert MessageRecord.from_dict(record.to_dict()).to_dict() == stored.to_dict()
+    assert MessageRecord("ASSISTANT", "hi", WHEN).to_document() == {
+        "role": "ASSISTANT", "message": "hi", "timestamp": WHEN}
+
+
+def test_npy_export_round_trip(tmp_path):
+    rows = [("chat", 0, MessageRecord("USER", "a", WHEN, encode(SCORES))),
+            ("chat", 1, MessageRecord("ASSISTANT", "b", WHEN)),  # no prosody: not exported
+            ("chat", 2, MessageRecord("USER", "c", WHEN, encode({"joy": 1.0})))]
+
+    assert export_npy(rows, tmp_path) == 2
+    columns = load_npy(tmp_path)
+    assert columns["seq"].tolist() == [0, 2]
+    assert columns["role"].tolist() == ["USER", "USER"]
+    assert [decode(row) for row in columns["scores"]] == [SCORES, {"joy": 1.0}]
+
+
+def test_parquet_export_round_trip(tmp_path):
+    pytest.importorskip("pyarrow")
+    rows = [("chat", 0, MessageRecord("USER", "a", WHEN, encode(SCORES)))]
+    path = str(tmp_path / "prosody.parquet")
+
+    assert prosody.export_parquet(rows, path) == 1
+    columns = prosody.load_parquet(path, emotions=("joy", "calmness"))
+    assert columns["scores"].tolist() == [[0.5, 0.25]]
+
+
+def test_aggregator_tracks_mood_and_peaks():
+    aggregator = ProsodyAggregator(alpha=0.5, window=2, k=2)
+    aggregator.update(encode({"joy": 1.0}))
+    aggregator.update(encode({"joy": 0.0, "anger": 0.8}))
+
+    snapshot = aggregator.snapshot()
+    assert snapshot["messages"] == 2
+    assert snapshot["ewma"]["Joy"] == pytest.approx(0.5)
+    assert snapshot["chat"]["Anger"] == pytest.approx(0.4)
+    assert [(peak["emotion"], peak["seq"]) for peak in snapshot["peaks"]] == [("Joy", 0), ("Anger", 1)]
@@ -0,0 +1,123 @@
+import json
+
+import pytest
+
+import structured_analysis
+from llm_cache import ResponseCache
+from structured_analysis import analyze_transcript, merge_analyses, validate_analysis
+
+
+def analysis(people=(), locations=(), events=(), emotions=(), associations=()):
+    return {
+        "people": list(people),
+        "locations": list(locations),
+        "events": list(events),
+        "environment": [],
+        "emotions": [{"emotion": name, "intensity": intensity, "primary": primary}
+                     for name, intensity, primary in emotions],
+        "associations": list(associations),
+    }
+
+
+@pytest.fixture
+def answers(monkeypatch):
+    """Queue of raw model answers returned by the combined call, on a fresh cache."""
+    queued = []
+    monkeypatch.setattr(structured_analysis, "response_cache", ResponseCache(":memory:"))
+    monkeypatch.setattr(structured_analysis, "_complete", lambda text: queued.pop(0))
+    return queued
+
+
+def test_validation_names_the_offending_field():
+    bad = analysis(emotions=[("Happiness", "High", True)])
+
+    with pytest.raises(ValueError, match="emotions/0/emotion"):
+        validate_analysis(bad)
+
+
+def test_labels_are_normalized_before_validation(answers):
+    answer = analysis(emotions=[("joy", " high", True)])
+    answers.append(json.dumps(answer))
+
+    assert analyze_transcript("a nice day")["emotions"] == [
+        {"emotion": "Joy", "intensity": "High", "primary": True}]
+
+
+def test_valid_results_are_cached(answers):
+    answers.append(json.dumps(analysis(people=["Logan"])))
+
+    first = analyze_transcript("I saw Logan")
+    assert analyze_transcript("i saw  logan") == first
+    assert answers == []
+
+
+@pytest.mark.parametrize("answer", ['{"people": ["Logan"', json.dumps({"people": "Logan"})])
+def test_invalid_answers_raise_and_are_not_cached(answers, answer):
+    answers.extend([answer, json.dumps(analysis(people=["Logan"]))])
+
+    with pytest.raises(ValueError):
+        analyze_transcript("I saw Logan")
+    assert analyze_transcript("I saw Logan")["people"] == ["Logan"]
+
+
+def test_an_invalid_cached_entry_is_replaced(answers):
+    cache = structured_analysis.response_cache
+    key = cache.key(structured_analysis.COMBINED_MODEL, structured_analysis.COMBINED_PROMPT, "hi")
+    cache.set(key, "not json")
+    answers.append(json.dumps(analysis()))
+
+    assert analyze_transcript("hi") == analysis()
+    assert json.loads(cache.get(key)) == analysis()
+
+
+def association(emotion, people=()):
+    return {"emotion": emotion, "people": list(people), "locations": [], "events": [], "environment": []}
+
+
+def test_entities_are_unioned_case_insensitively():
+    merged = merge_analyses([
+        analysis(people=["Logan"], locations=["park"]),
+        analysis(people=["logan", "Sam"], locations=["Park", "bookstore"]),
+    ])
+
+    assert merged["people"] == ["Logan", "Sam"]
+    assert merged["locations"] == ["park", "bookstore"]
+
+
+def test_emotions_keep_their_highest_intensity_and_the_most_voted_primary():
+    merged = merge_analyses([
+        analysis(emotions=[("Joy", "Low", True), ("Fear", "Medium", False)]),
+        analysis(emotions=[("Joy", "High", True), ("Fear", "High", True)]),
+        analysis(emotions=[("Joy", "Medium", False)]),
+    ])
+
+    assert merged["emotions"] == [
+        {"emotion": "Joy", "intensity": "High", "primary": True},
+        {"emotion": "Fear", "intensity": "High", "primary": False},
+    ]
+
+
+def test_primary_tie_is_broken_by_intensity():
+    merged = merge_analyses([
+        analysis(emotions=[("Joy", "Low", True)]),
+        analysis(emotions=[("Sadness", "High", True)]),
+    ])
+
+    assert [item["emotion"] for item in merged["emotions"] if item["primary"]] == ["Sadness"]
+
+
+def test_associations_are_merged_per_emotion():
+    merged = merge_analyses([
+        analysis(associations=[association("Joy", ["Logan"])]),
+        analysis(associations=[association("Joy", ["LOGAN", "Sam"]), association("Fear")]),
+    ])
+
+    assert merged["associations"] == [association("Joy", ["Logan", "Sam"]), association("Fear")]
+    validate_analysis(merged)
+
+
+def test_merging_nothing_gives_an_empty_valid_analysis():
+    merged = merge_analyses([])
+
+    assert merged == analysis()
+    validate_analysis(merged)
@@ -0,0 +1,36 @@
+import pytest
+
+import tracing
+from tracing import drop_tracer, get_tracer, to_prometheus
+
+
+@pytest.fixture(autouse=True)
+def registry(monkeypatch):
+    monkeypatch.setattr(tracing, "_tracers", tracing.OrderedDict())
+    monkeypatch.setattr(tracing, "MAX_SESSIONS", 2)
+
+
+def test_a_session_keeps_its_tracer():
+    assert get_tracer("a") is get_tracer("a")
+
+
+def test_the_least_recently_used_session_is_evicted():
+    a, b = get_tracer("a"), get_tracer("b")
+    get_tracer("a")  # b is now the least recently used
+    get_tracer("c")
+
+    assert list(tracing._tracers) == ["a", "c"]
+    assert get_tracer("a") is a
+    assert get_tracer("b") is not b
+
+
+def test_dropped_sessions_leave_the_export():
+    get_tracer("a").record("stage", 0.0, 0.1)
+    get_tracer("b").record("stage", 0.0, 0.1)
+
+    drop_tracer("a")
+    drop_tracer("unknown")
+
+    text = to_prometheus()
+    assert 'session="b"' in text
+    assert 'session="a"' not in text
@@ -0,0 +1,47 @@
+import structured_analysis
+from transcript_chunking import chunk_transcript, count_tokens
+
+
+def test_short_transcript_is_one_chunk():
+    text = "I went to the park. It was sunny!"
+
+    assert chunk_transcript(text, max_tokens=100) == [text]
+
+
+def test_chunks_fit_and_keep_every_sentence_whole(transcript):
+    text = transcript(60)
+    chunks = chunk_transcript(text, max_tokens=80)
+
+    assert len(chunks) > 1
+    assert all(count_tokens(chunk) <= 80 for chunk in chunks)
+    assert all(chunk.endswith(".") for chunk in chunks)
+    assert " ".join(chunks) == text
+
+
+def test_unpunctuated_transcript_is_split_between_words():
+    text = " ".join(f"word{i}" for i in range(400))
+    chunks = chunk_transcript(text, max_tokens=50)
+
+    assert len(chunks) > 1
+    assert all(count_tokens(chunk) <= 50 for chunk in chunks)
+    assert " ".join(chunks).split() == text.split()
+
+
+def test_empty_transcript_has_no_chunks():
+    assert chunk_transcript("   ") == []
+
+
+def test_long_transcripts_are_analyzed_per_chunk_and_merged(monkeypatch, transcript):
+    analyzed = []
+
+    def analyze(chunk):
+        analyzed.append(chunk)
+        return {"people": [name for name in ("Logan", "Sam", "Mia") if name in chunk],
+                "locations": [], "events": [], "environment": [], "emotions": [], "associations": []}
+
+    monkeypatch.setattr(structured_analysis, "analyze_transcript", analyze)
+    text = transcript(60)
+    result = structured_analysis.analyze_long_transcript(text, max_tokens=80, concurrency=3)
+
+    assert sorted(analyzed) == sorted(chunk_transcript(text, 80, model=structured_analysis.COMBINED_MODEL))
+    assert sorted(result["people"]) == ["Logan", "Mia", "Sam"]
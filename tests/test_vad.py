@@ -0,0 +1,72 @@
+import numpy as np
+
+from vad import VadSegmenter
+
+FRAME = 480  # 30 ms at 16 kHz
+
+
+def frames(count, level=0):
+    return np.full(count * FRAME, level, dtype=np.int16)
+
+
+def speech(count):
+    return frames(count, 1000)
+
+
+def feed_all(segmenter, *parts):
+    return segmenter.feed(np.concatenate(parts))
+
+
+def test_segment_ends_after_the_silence_duration_with_preroll():
+    segmenter = VadSegmenter()  # 0.8 s of silence = 27 frames, 0.2 s of padding = 7 frames
+
+    segments = feed_all(segmenter, frames(10), speech(50), frames(30))
+
+    assert len(segments) == 1
+    assert segments[0].size == (7 + 50 + 27) * FRAME
+    assert np.count_nonzero(segments[0]) == 50 * FRAME
+    assert segmenter.emitted == 1
+
+
+def test_silence_does_not_end_a_segment_before_min_segment():
+    segmenter = VadSegmenter(min_segment=2.0)  # 67 frames
+
+    assert feed_all(segmenter, speech(12), frames(50)) == []
+    segments = segmenter.feed(frames(10))
+
+    assert [segment.size for segment in segments] == [67 * FRAME]
+
+
+def test_long_speech_is_cut_at_max_segment():
+    segmenter = VadSegmenter(max_segment=15.0)  # 500 frames
+
+    segments = segmenter.feed(speech(600))
+
+    assert [segment.size for segment in segments] == [500 * FRAME]
+    assert segmenter.flush().size == 100 * FRAME
+
+
+def test_clicks_below_min_speech_are_dropped():
+    segmenter = VadSegmenter()  # 0.3 s of speech = 10 frames
+
+    assert feed_all(segmenter, speech(3), frames(60)) == []
+    segmenter.feed(speech(4))
+    assert segmenter.flush() is None
+
+    assert segmenter.dropped == 2
+    assert segmenter.emitted == 0
+
+
+def test_block_boundaries_do_not_change_the_segments():
+    audio = np.concatenate([frames(10), speech(50), frames(30), speech(20), frames(5)])
+    whole = VadSegmenter()
+    expected = whole.feed(audio) + [whole.flush()]
+
+    pieces = VadSegmenter()
+    segments = []
+    for start in range(0, audio.size, 1234):
+        segments += pieces.feed(audio[start:start + 1234])
+    segments.append(pieces.flush())
+
+    assert [segment.size for segment in segments] == [segment.size for segment in expected]
+    assert all(np.array_equal(a, b) for a, b in zip(segments, expected))
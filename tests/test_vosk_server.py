@@ -0,0 +1,82 @@
+import asyncio
+import json
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+import vosk_server
+
+
+class FakeRecognizer:
+    def __init__(self):
+        self.resets = 0
+
+    def AcceptWaveform(self, data):
+        return False
+
+    def PartialResult(self):
+        return json.dumps({"partial": "hello"})
+
+    def FinalResult(self):
+        return json.dumps({"text": "hello"})
+
+    def Reset(self):
+        self.resets += 1
+
+
+class FakeWebSocket:
+    def __init__(self, *messages):
+        self.messages = list(messages)
+        self.sent = []
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        if not self.messages:
+            raise StopAsyncIteration
+        return self.messages.pop(0)
+
+    async def send(self, message):
+        self.sent.append(message)
+
+
+@pytest.fixture
+def server(monkeypatch):
+    """A RecognitionServer whose 'worker' is a thread running the worker-side functions."""
+    monkeypatch.setattr(vosk_server, "_recognizers", {})
+    monkeypatch.setattr(vosk_server, "_idle", [])
+    monkeypatch.setattr(vosk_server, "_config", {"model_path": "model", "sample_rate": 16000})
+    monkeypatch.setattr(vosk_server, "new_recognizer", lambda path, rate: FakeRecognizer())
+    server = vosk_server.RecognitionServer("model", processes=1)
+    server.workers = [ThreadPoolExecutor(max_workers=1)]
+    server.streams_per_worker = [0]
+    yield server
+    server.shutdown()
+
+
+def test_a_finished_stream_returns_its_recognizer_to_the_pool(server):
+    websocket = FakeWebSocket(b"\0" * 3200, '{"eof" : 1}')
+
+    asyncio.run(server.handle(websocket))
+
+    assert [json.loads(message) for message in websocket.sent] == [{"partial": "hello"}, {"text": "hello"}]
+    assert len(vosk_server._idle) == 1 and vosk_server._idle[0].resets == 1
+    assert server.stats["streams_active"] == 0
+
+
+def test_a_stream_that_never_opened_reports_the_open_error(server, monkeypatch):
+    def broken(path, rate):
+        raise RuntimeError("model not loaded")
+    monkeypatch.setattr(vosk_server, "new_recognizer", broken)
+
+    with pytest.raises(RuntimeError, match="model not loaded"):
+        asyncio.run(server.handle(FakeWebSocket(b"\0" * 3200)))
+
+    assert server.stats["streams_active"] == 0
+    assert server.streams_per_worker == [0]
+
+
+def test_closing_an_unknown_stream_is_a_no_op(server):
+    assert vosk_server._close_stream(42) is None
+    assert vosk_server._idle == []
@@ -0,0 +1,83 @@
+import threading
+
+import numpy as np
+import pytest
+
+from whisper_pipeline import TranscriptionPipeline
+
+
+class FakeStream:
+    """sd.InputStream stand-in that serves `blocks` reads and then fails with `error`."""
+
+    def __init__(self, blocks, error=None):
+        self.blocks = blocks
+        self.error = error
+        self.closed = threading.Event()
+
+    def start(self):
+        pass
+
+    def read(self, frames):
+        if self.blocks == 0:
+            if self.error is not None:
+                raise self.error
+            self.closed.wait(0.01)  # silence, at roughly the device's pace
+            return np.zeros((frames, 1), dtype=np.int16), False
+        self.blocks -= 1
+        return np.ones((frames, 1), dtype=np.int16), False
+
+    def stop(self):
+        self.closed.set()
+
+    def close(self):
+        self.closed.set()
+
+
+def count_samples(recording, fs):
+    return str(recording.shape[0])
+
+
+def test_capture_error_ends_results_after_the_recorded_chunks():
+    # 0.1 s blocks, 0.2 s chunks: two full chunks before the device fails.
+    stream = FakeStream(blocks=5, error=OSError("device unplugged"))
+    pipeline = TranscriptionPipeline(count_samples, chunk_duration=0.2, fs=1000, stream=stream)
+    pipeline.start()
+
+    transcripts = []
+    with pytest.raises(OSError, match="device unplugged"):
+        for transcript, error in pipeline.results():
+            transcripts.append(transcript)
+
+    assert transcripts == ["200", "200"]
+    assert stream.closed.is_set()
+    assert not any(t.is_alive() for t in pipeline._worker_threads)
+
+
+def test_stop_after_a_capture_error_is_quiet():
+    class BrokenStream(FakeStream):
+        def stop(self):
+            raise OSError("stream already closed")
+
+    pipeline = TranscriptionPipeline(count_samples, chunk_duration=0.2, fs=1000,
+                                     stream=BrokenStream(blocks=0, error=OSError("device unplugged")))
+    pipeline.start()
+    pipeline._capture_thread.join()
+
+    pipeline.stop()
+
+    assert isinstance(pipeline.error, OSError)
+    with pytest.raises(OSError, match="device unplugged"):
+        list(pipeline.results())
+
+
+def test_results_end_without_error_when_stopped():
+    stream = FakeStream(blocks=2)
+    pipeline = TranscriptionPipeline(count_samples, chunk_duration=0.2, fs=1000, stream=stream)
+    pipeline.start()
+
+    results = pipeline.results()
+    assert next(results) == ("200", None)
+    pipeline.stop()
+
+    assert list(results) == []
+    assert pipeline.error is None
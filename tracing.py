@@ -0,0 +1,257 @@
+"""Lightweight latency tracing across the voice pipeline.
+
+Stages (audio capture, AcceptWaveform, Whisper uploads, ChatCompletion
+calls, Firestore commits, Streamlit rendering) are wrapped in spans:
+
+    with span("vosk.accept_waveform"):
+        recognizer.AcceptWaveform(block)
+
+Each span records its duration, its parent span and attributes into the
+session's `Tracer`, which is found through a context variable, so one
+Streamlit session or EVI chat does not mix with another. Threads and
+executor jobs started through `context_run`, asyncio tasks and
+`asyncio.to_thread` calls inherit it; anything else lands in the
+process-wide default tracer. A tracer keeps a bounded number of spans and
+per-stage durations and exports them as JSON, as Prometheus text (a summary
+per stage), or as a percentile table. The registry behind `get_tracer`
+keeps the NEUROPY_TRACE_SESSIONS most recently used sessions, since a
+Streamlit session does not say when it ends.
+
+Tracing is off unless NEUROPY_TRACING=1 (or `enable()` is called). When it
+is off, `span` returns a shared no-op context manager, which costs well
+under a microsecond per call (see bench_tracing.py).
+"""
+import contextvars
+import functools
+import json
+import os
+import threading
+import time
+from collections import OrderedDict, deque
+
+import numpy as np
+
+_enabled = os.getenv("NEUROPY_TRACING", "0") == "1"
+# Session tracers kept by get_tracer; the least recently used one is dropped beyond this
+MAX_SESSIONS = int(os.getenv("NEUROPY_TRACE_SESSIONS", "64"))
+
+QUANTILES = (0.5, 0.9, 0.95, 0.99)
+
+
+class _NullSpan:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def set(self, **attrs):
+        pass
+
+
+_NULL_SPAN = _NullSpan()
+
+
+class Span:
+    """One timed stage; use as a context manager. `set()` adds attributes."""
+
+    __slots__ = ("tracer", "name", "attrs", "parent", "start", "_token")
+
+    def __init__(self, tracer, name, attrs):
+        self.tracer = tracer
+        self.name = name
+        self.attrs = attrs
+        self.parent = None
+        self.start = 0.0
+        self._token = None
+
+    def __enter__(self):
+        self.parent = _current_span.get()
+        self._token = _current_span.set(self.name)
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        duration = time.perf_counter() - self.start
+        _current_span.reset(self._token)
+        if exc_type is not None:
+            self.attrs["error"] = exc_type.__name__
+        self.tracer.record(self.name, self.start, duration, self.parent, self.attrs)
+        return False
+
+    def set(self, **attrs):
+        self.attrs.update(attrs)
+
+
+class Tracer:
+    """Spans and per-stage durations of one session."""
+
+    def __init__(self, session="process", max_spans=10000, max_samples=5000):
+        self.session = session
+        self.created = time.time()
+        self._origin = time.perf_counter()  # span starts are exported relative to this
+        self._spans = deque(maxlen=max_spans)
+        self._durations = {}  # stage -> deque of recent durations
+        self._counts = {}  # stage -> [count, total seconds]
+        self._max_samples = max_samples
+        self._lock = threading.Lock()
+
+    def span(self, name, **attrs):
+        return Span(self, name, attrs)
+
+    def record(self, name, start, duration, parent=None, attrs=None):
+        """Add a finished span (also usable for durations measured elsewhere)."""
+        thread = threading.current_thread().name
+        with self._lock:
+            self._spans.append((name, start - self._origin, duration, parent, thread, attrs or None))
+            durations = self._durations.get(name)
+            if durations is None:
+                durations = self._durations[name] = deque(maxlen=self._max_samples)
+                self._counts[name] = [0, 0.0]
+            durations.append(duration)
+            counts = self._counts[name]
+            counts[0] += 1
+            counts[1] += duration
+
+    def summary(self):
+        """Per stage: count, total and mean seconds, percentiles (of recent spans) and max."""
+        with self._lock:
+            stages = {name: (list(durations), *self._counts[name]) for name, durations in self._durations.items()}
+        summary = {}
+        for name, (durations, count, total) in sorted(stages.items()):
+            values = np.percentile(durations, [q * 100 for q in QUANTILES])
+            summary[name] = {"count": count, "total": total, "mean": total / count, "max": max(durations),
+                             **{f"p{int(q * 100)}": float(v) for q, v in zip(QUANTILES, values)}}
+        return summary
+
+    def format_summary(self):
+        """The summary as a fixed-width table in milliseconds."""
+        lines = [f"{'stage':<28} {'count':>6} {'p50':>8} {'p95':>8} {'p99':>8} {'max':>8} {'total s':>8}"]
+        for name, stats in self.summary().items():
+            lines.append(f"{name:<28} {stats['count']:>6} {stats['p50'] * 1000:>8.1f} "
+                         f"{stats['p95'] * 1000:>8.1f} {stats['p99'] * 1000:>8.1f} "
+                         f"{stats['max'] * 1000:>8.1f} {stats['total']:>8.2f}")
+        return "\n".join(lines)
+
+    def to_dict(self):
+        with self._lock:
+            spans = list(self._spans)
+        return {
+            "session": self.session,
+            "created": self.created,
+            "spans": [{"name": name, "start": start, "duration": duration, "parent": parent,
+                       "thread": thread, **({"attrs": attrs} if attrs else {})}
+                      for name, start, duration, parent, thread, attrs in spans],
+            "summary": self.summary(),
+        }
+
+    def to_json(self):
+        return json.dumps(self.to_dict(), default=str)
+
+    def export(self, path):
+        """Write the trace to `path`: Prometheus text for .prom, JSON otherwise."""
+        with open(path, "w") as f:
+            f.write(to_prometheus([self]) if path.endswith(".prom") else self.to_json())
+
+
+_default = Tracer()
+_current = contextvars.ContextVar("tracer", default=_default)
+_current_span = contextvars.ContextVar("span", default=None)
+_tracers = OrderedDict()  # session -> Tracer, least recently used first
+_tracers_lock = threading.Lock()
+
+
+def enable(on=True):
+    global _enabled
+    _enabled = on
+
+
+def enabled():
+    return _enabled
+
+
+def get_tracer(session):
+    """The process-wide Tracer of `session`, created on first use.
+
+    Only the MAX_SESSIONS most recently used sessions are kept; an evicted
+    session starts over with a new tracer if it comes back.
+    """
+    with _tracers_lock:
+        tracer = _tracers.get(session)
+        if tracer is None:
+            tracer = _tracers[session] = Tracer(session)
+            while len(_tracers) > MAX_SESSIONS:
+                _tracers.popitem(last=False)
+        else:
+            _tracers.move_to_end(session)
+        return tracer
+
+
+def drop_tracer(session):
+    """Forget `session`'s tracer (e.g. when its chat or browser session ends)."""
+    with _tracers_lock:
+        _tracers.pop(session, None)
+
+
+def activate(tracer):
+    """Make `tracer` the current one in this context (and threads/tasks started from it)."""
+    return _current.set(tracer)
+
+
+def deactivate(token):
+    """Undo an `activate` (pass the token it returned)."""
+    _current.reset(token)
+
+
+def current():
+    return _current.get()
+
+
+def span(name, **attrs):
+    """A span of the current tracer, or a no-op when tracing is off."""
+    if not _enabled:
+        return _NULL_SPAN
+    return Span(_current.get(), name, attrs)
+
+
+def traced(name):
+    """Decorator form of `span`."""
+    def decorate(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if not _enabled:
+                return func(*args, **kwargs)
+            with Span(_current.get(), name, {}):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorate
+
+
+def context_run(func):
+    """Wrap `func` to run in (a copy of) the caller's context, e.g. in threads and executors."""
+    context = contextvars.copy_context()
+
+    @functools.wraps(func)
+    def run(*args, **kwargs):
+        # A context can only be entered by one thread at a time, so every call gets its own copy.
+        return context.copy().run(func, *args, **kwargs)
+    return run
+
+
+def to_prometheus(tracers=None):
+    """Prometheus text exposition: one summary per session and stage."""
+    if tracers is None:
+        with _tracers_lock:
+            tracers = [_default, *_tracers.values()]
+    lines = ["# HELP neuropy_stage_seconds Duration of traced pipeline stages.",
+             "# TYPE neuropy_stage_seconds summary"]
+    for tracer in tracers:
+        for name, stats in tracer.summary().items():
+            labels = f'session="{tracer.session}",stage="{name}"'
+            for q in QUANTILES:
+                lines.append(f'neuropy_stage_seconds{{{labels},quantile="{q}"}} {stats[f"p{int(q * 100)}"]:.6f}')
+            lines.append(f"neuropy_stage_seconds_sum{{{labels}}} {stats['total']:.6f}")
+            lines.append(f"neuropy_stage_seconds_count{{{labels}}} {stats['count']}")
+    return "\n".join(lines) + "\n"
@@ -0,0 +1,79 @@
+"""Token-aware chunking of long transcripts.
+
+A 20-minute diary entry does not fit comfortably in one prompt. Transcripts
+are split on sentence boundaries into chunks of at most `max_tokens` tokens
+(counted with tiktoken when it is available), so each chunk can be analyzed
+on its own and the results merged.
+"""
+import re
+
+try:
+    import tiktoken
+except ImportError:  # fall back to a character-based estimate
+    tiktoken = None
+
+_SENTENCE_END = re.compile(r"(?<=[.!?])\s+")
+_encodings = {}
+
+
+def _encoding(model):
+    if tiktoken is None:
+        return None
+    if model not in _encodings:
+        try:
+            _encodings[model] = tiktoken.encoding_for_model(model)
+        except Exception:
+            # Unknown model name, or the BPE file cannot be downloaded.
+            _encodings[model] = None
+    return _encodings[model]
+
+
+def count_tokens(text, model="gpt-3.5-turbo"):
+    """Count the tokens `text` costs for `model` (about 4 characters per token without tiktoken)."""
+    encoding = _encoding(model)
+    if encoding is None:
+        return max(1, round(len(text) / 4)) if text else 0
+    return len(encoding.encode(text))
+
+
+def split_sentences(text):
+    """Split on sentence-ending punctuation; Vosk transcripts have none and stay whole."""
+    return [sentence for sentence in _SENTENCE_END.split(text.strip()) if sentence]
+
+
+def chunk_transcript(text, max_tokens=1500, model="gpt-3.5-turbo"):
+    """Split `text` into chunks of at most `max_tokens` tokens on sentence boundaries.
+
+    Sentences longer than `max_tokens` (including unpunctuated transcripts) are
+    split between words instead.
+    """
+    chunks, current, current_tokens = [], [], 0
+    for sentence in split_sentences(text):
+        tokens = count_tokens(sentence, model)
+        pieces = [(sentence, tokens)] if tokens <= max_tokens else _split_words(sentence, max_tokens, model)
+        for piece, piece_tokens in pieces:
+            # +1 for the space that joins it to the chunk
+            if current and current_tokens + piece_tokens + 1 > max_tokens:
+                chunks.append(" ".join(current))
+                current, current_tokens = [], 0
+            current.append(piece)
+            current_tokens += piece_tokens + (1 if current_tokens else 0)
+    if current:
+        chunks.append(" ".join(current))
+    return chunks
+
+
+def _split_words(sentence, max_tokens, model):
+    """Split one over-long sentence into word runs of at most about `max_tokens` tokens."""
+    pieces, words, tokens = [], [], 0
+    for word in sentence.split():
+        # Counted per word (with its leading space) to keep this linear.
+        word_tokens = count_tokens(" " + word, model)
+        if words and tokens + word_tokens > max_tokens:
+            pieces.append((" ".join(words), tokens))
+            words, tokens = [], 0
+        words.append(word)
+        tokens += word_tokens
+    if words:
+        pieces.append((" ".join(words), tokens))
+    return pieces
@@ -0,0 +1,105 @@
+"""Energy-based voice activity detection for chunking the microphone stream.
+
+Instead of cutting the stream into fixed windows, `VadSegmenter` closes a
+segment after a run of silence (bounded by minimum and maximum segment
+lengths) and drops segments that contain too little speech to be worth
+uploading for transcription.
+"""
+from collections import deque
+
+import numpy as np
+
+
+class VadSegmenter:
+    """Split a stream of int16 samples into speech segments on silence."""
+
+    def __init__(self, fs=16000, frame_ms=30, threshold=300, silence_duration=0.8,
+                 min_segment=1.0, max_segment=15.0, min_speech=0.3, padding=0.2):
+        """
+        A frame is voiced when its RMS level reaches `threshold` (int16 units).
+        A segment ends after `silence_duration` seconds of unvoiced frames once
+        it is at least `min_segment` seconds long, and is cut unconditionally at
+        `max_segment` seconds. Segments with less than `min_speech` seconds of
+        voiced frames are dropped. `padding` seconds of audio before the first
+        voiced frame are kept so word onsets are not clipped.
+        """
+        self.fs = fs
+        self.frame_len = int(fs * frame_ms / 1000)
+        self.threshold = threshold
+        self.silence_frames = self._frames(silence_duration)
+        self.min_frames = self._frames(min_segment)
+        self.max_frames = self._frames(max_segment)
+        self.min_speech_frames = self._frames(min_speech)
+
+        self._preroll = deque(maxlen=self._frames(padding))
+        self._remainder = np.empty(0, dtype=np.int16)
+        self._segment = []
+        self._voiced = 0
+        self._silence_run = 0
+        self.dropped = 0
+        self.emitted = 0
+
+    def _frames(self, seconds):
+        return max(1, int(round(seconds * self.fs / self.frame_len)))
+
+    def feed(self, samples):
+        """Add samples to the stream and return the list of finished segments."""
+        samples = np.asarray(samples, dtype=np.int16).reshape(-1)
+        if self._remainder.size:
+            samples = np.concatenate([self._remainder, samples])
+        n_frames = samples.size // self.frame_len
+        used = n_frames * self.frame_len
+        self._remainder = samples[used:].copy()
+        if not n_frames:
+            return []
+
+        frames = samples[:used].reshape(n_frames, self.frame_len)
+        levels = np.sqrt(np.mean(frames.astype(np.float32) ** 2, axis=1))
+
+        segments = []
+        for frame, level in zip(frames, levels):
+            segment = self._push(frame, level >= self.threshold)
+            if segment is not None:
+                segments.append(segment)
+        return segments
+
+    def flush(self):
+        """Close the current segment at end of stream; returns it or None."""
+        self._remainder = np.empty(0, dtype=np.int16)
+        return self._close()
+
+    def _push(self, frame, voiced):
+        if not self._segment:
+            if not voiced:
+                self._preroll.append(frame)
+                return None
+            self._segment.extend(self._preroll)
+            self._preroll.clear()
+
+        self._segment.append(frame)
+        if voiced:
+            self._voiced += 1
+            self._silence_run = 0
+        else:
+            self._silence_run += 1
+
+        length = len(self._segment)
+        if length >= self.max_frames:
+            return self._close()
+        if self._silence_run >= self.silence_frames and length >= self.min_frames:
+            return self._close()
+        return None
+
+    def _close(self):
+        segment, voiced = self._segment, self._voiced
+        self._segment = []
+        self._voiced = 0
+        self._silence_run = 0
+        if not segment:
+            return None
+        if voiced < self.min_speech_frames:
+            # Clicks and background noise: not worth an API call.
+            self.dropped += 1
+            return None
+        self.emitted += 1
+        return np.concatenate(segment)
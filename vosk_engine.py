@@ -0,0 +1,128 @@
+"""Process-wide Vosk model cache.
+
+Loading a Vosk model takes seconds and hundreds of megabytes, but a loaded
+`Model` can be shared by any number of `KaldiRecognizer`s. Models are loaded
+lazily, once per process, and survive Streamlit reruns because this module is
+only imported once. Recognizers hold per-stream decoding state and must not be
+shared between sessions; `StreamingTranscript` wraps one recognizer and turns
+its results into a live transcript.
+"""
+import json
+import threading
+import time
+
+from vosk import KaldiRecognizer, Model
+
+from tracing import span
+
+try:
+    from vosk import _ffi
+except ImportError:  # older vosk builds without the cffi handle
+    _ffi = None
+
+_models = {}
+_lock = threading.Lock()
+_metrics = {
+    "model_loads": 0,
+    "model_load_seconds": 0.0,
+    "recognizers_created": 0,
+    "last_recognizer_seconds": 0.0,
+}
+
+
+def get_model(model_path):
+    """Return the shared Model for `model_path`, loading it on first use."""
+    model = _models.get(model_path)
+    if model is not None:
+        return model
+    with _lock:
+        model = _models.get(model_path)
+        if model is None:
+            start = time.perf_counter()
+            model = Model(model_path)
+            _metrics["model_loads"] += 1
+            _metrics["model_load_seconds"] += time.perf_counter() - start
+            _models[model_path] = model
+    return model
+
+
+def new_recognizer(model_path, sample_rate=16000):
+    """Create a KaldiRecognizer for one stream on top of the shared model."""
+    model = get_model(model_path)
+    start = time.perf_counter()
+    recognizer = KaldiRecognizer(model, sample_rate)
+    with _lock:
+        _metrics["recognizers_created"] += 1
+        _metrics["last_recognizer_seconds"] = time.perf_counter() - start
+    return recognizer
+
+
+def startup_metrics():
+    """Return a copy of the model-load and recognizer-creation timings."""
+    with _lock:
+        return dict(_metrics)
+
+
+def accept_buffer(recognizer, block):
+    """Feed any contiguous buffer (e.g. a memoryview into a ring) to AcceptWaveform.
+
+    KaldiRecognizer only accepts `bytes`; wrapping the buffer with cffi avoids
+    copying it into a new bytes object for every block.
+    """
+    if isinstance(block, bytes):
+        return recognizer.AcceptWaveform(block)
+    if _ffi is None:
+        return recognizer.AcceptWaveform(bytes(block))
+    return recognizer.AcceptWaveform(_ffi.from_buffer(block))
+
+
+class StreamingTranscript:
+    """Incremental transcript built from a recognizer's final and partial results.
+
+    Finished utterances are collected in a list and joined on demand instead of
+    growing a string with `+=`. With `use_partials`, every block also updates
+    the live partial hypothesis, and the stop phrase is caught as soon as it
+    appears there rather than only when the utterance ends.
+    """
+
+    def __init__(self, recognizer, stop_phrase="that's it", use_partials=True):
+        self.recognizer = recognizer
+        self.stop_phrase = stop_phrase
+        self.use_partials = use_partials
+        self.parts = []
+        self.partial = ""
+        self.stopped = False
+        self.stop_source = None  # "partial" or "final"
+
+    @property
+    def text(self):
+        return " ".join(self.parts)
+
+    def accept(self, block):
+        """Decode one block; returns the text of an utterance it finished, else None."""
+        with span("vosk.accept_waveform"):
+            finished = accept_buffer(self.recognizer, block)
+        if finished:
+            text = json.loads(self.recognizer.Result()).get("text", "")
+            self.partial = ""
+            if text:
+                self.parts.append(text)
+            self._check_stop(text, "final")
+            return text
+        if self.use_partials:
+            self.partial = json.loads(self.recognizer.PartialResult()).get("partial", "")
+            self._check_stop(self.partial, "partial")
+        return None
+
+    def finish(self):
+        """Flush the utterance in progress into the transcript; returns its text."""
+        text = json.loads(self.recognizer.FinalResult()).get("text", "")
+        self.partial = ""
+        if text:
+            self.parts.append(text)
+        return text
+
+    def _check_stop(self, text, source):
+        if not self.stopped and self.stop_phrase in text.lower():
+            self.stopped = True
+            self.stop_source = source
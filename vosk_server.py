@@ -0,0 +1,157 @@
+"""Multi-stream Vosk recognition server.
+
+Serves many concurrent 16 kHz int16 PCM streams (one per room/microphone)
+from a single hub box. Clients connect over a local WebSocket or Unix socket
+and use the vosk-server protocol: binary messages carry PCM audio, the text
+message '{"eof" : 1}' ends the stream, and every message is answered with a
+JSON partial or final result.
+
+Decoding is spread over a pool of worker processes. The model is loaded once
+in the parent before the workers start, so on Linux (fork) every worker shares
+its memory. Each worker keeps a pool of recognizers that are reset and reused
+when streams end. A stream stays pinned to one worker for its whole life,
+because the recognizer state lives in that process.
+
+    python vosk_server.py --model vosk-model-small-en-us-0.15 --port 2700
+"""
+import argparse
+import asyncio
+import itertools
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import websockets
+
+from vosk_engine import get_model, new_recognizer
+
+# ------------------------------------------------
+# Worker-process side: one recognizer per open stream, reused after close.
+_config = {}
+_recognizers = {}
+_idle = []
+
+
+def _init_worker(model_path, sample_rate):
+    _config["model_path"] = model_path
+    _config["sample_rate"] = sample_rate
+    get_model(model_path)
+
+
+def _open_stream(stream_id):
+    recognizer = _idle.pop() if _idle else new_recognizer(
+        _config["model_path"], _config["sample_rate"])
+    _recognizers[stream_id] = recognizer
+
+
+def _accept(stream_id, data):
+    recognizer = _recognizers[stream_id]
+    if recognizer.AcceptWaveform(data):
+        return recognizer.Result()
+    return recognizer.PartialResult()
+
+
+def _close_stream(stream_id):
+    recognizer = _recognizers.pop(stream_id, None)
+    if recognizer is None:
+        return None  # the stream never opened (e.g. its recognizer could not be created)
+    result = recognizer.FinalResult()
+    recognizer.Reset()
+    _idle.append(recognizer)
+    return result
+
+
+# ------------------------------------------------
+class RecognitionServer:
+    """Accept PCM streams and decode them on a pool of worker processes."""
+
+    def __init__(self, model_path, sample_rate=16000, processes=None):
+        self.model_path = model_path
+        self.sample_rate = sample_rate
+        self.processes = processes or os.cpu_count() or 1
+        self.workers = []
+        self.streams_per_worker = []
+        self._ids = itertools.count()
+        self.stats = {"streams_opened": 0, "streams_active": 0, "bytes_received": 0}
+
+    def start(self):
+        """Load the model and start the worker processes."""
+        # Loaded before the workers fork so they share the model's memory.
+        get_model(self.model_path)
+        for _ in range(self.processes):
+            # One process per executor keeps each stream's calls in order on
+            # the process that owns its recognizer.
+            executor = ProcessPoolExecutor(
+                max_workers=1, initializer=_init_worker,
+                initargs=(self.model_path, self.sample_rate))
+            self.workers.append(executor)
+            self.streams_per_worker.append(0)
+
+    def shutdown(self):
+        for executor in self.workers:
+            executor.shutdown(cancel_futures=True)
+
+    async def handle(self, websocket):
+        """Serve one client connection as one audio stream."""
+        loop = asyncio.get_running_loop()
+        index = min(range(len(self.workers)), key=self.streams_per_worker.__getitem__)
+        executor = self.workers[index]
+        stream_id = next(self._ids)
+
+        self.streams_per_worker[index] += 1
+        self.stats["streams_opened"] += 1
+        self.stats["streams_active"] += 1
+        try:
+            await loop.run_in_executor(executor, _open_stream, stream_id)
+            async for message in websocket:
+                if isinstance(message, bytes):
+                    self.stats["bytes_received"] += len(message)
+                    result = await loop.run_in_executor(executor, _accept, stream_id, message)
+                    await websocket.send(result)
+                elif json.loads(message).get("eof"):
+                    break
+            result = await loop.run_in_executor(executor, _close_stream, stream_id)
+            stream_id = None
+            await websocket.send(result)
+        finally:
+            if stream_id is not None:
+                # Client went away mid-stream; still return the recognizer to the pool.
+                await loop.run_in_executor(executor, _close_stream, stream_id)
+            self.streams_per_worker[index] -= 1
+            self.stats["streams_active"] -= 1
+
+    async def serve(self, host="127.0.0.1", port=2700, unix_path=None):
+        """Serve until cancelled, on TCP or (if `unix_path` is given) a Unix socket."""
+        if unix_path:
+            server = websockets.unix_serve(self.handle, unix_path, max_size=None)
+        else:
+            server = websockets.serve(self.handle, host, port, max_size=None)
+        async with server:
+            await asyncio.Future()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Multi-stream Vosk recognition server")
+    parser.add_argument("--model", default="vosk-model-small-en-us-0.15")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=2700)
+    parser.add_argument("--unix", help="serve on this Unix socket path instead of TCP")
+    parser.add_argument("--processes", type=int, default=None,
+                        help="decoder processes (default: one per CPU core)")
+    parser.add_argument("--sample-rate", type=int, default=16000)
+    args = parser.parse_args()
+
+    server = RecognitionServer(args.model, args.sample_rate, args.processes)
+    server.start()
+    where = args.unix or f"ws://{args.host}:{args.port}"
+    print(f"Serving {args.model} on {where} with {server.processes} decoder processes")
+    try:
+        asyncio.run(server.serve(args.host, args.port, args.unix))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
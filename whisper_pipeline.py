@@ -0,0 +1,177 @@
+"""Pipelined Whisper transcription.
+
+A capture thread keeps reading fixed-length chunks from the microphone into a
+bounded queue while a pool of workers transcribes them, so recording never
+pauses for an upload. Transcripts are handed back in capture order. If the
+capture thread fails (device error, stream closed), the pipeline stops:
+`results()` yields what was already recorded and then raises the error.
+"""
+import queue
+import threading
+
+import numpy as np
+
+from audio_source import input_stream
+from tracing import context_run, span
+
+_STOP = object()
+
+
+class TranscriptionPipeline:
+    """Capture audio chunks continuously and transcribe them concurrently."""
+
+    def __init__(self, transcribe, chunk_duration=10, fs=16000, workers=2,
+                 max_chunks=4, stream=None, segmenter=None):
+        """
+        `transcribe` is called as transcribe(recording, fs) with an int16
+        array of samples and returns the transcript text. `stream` is anything
+        with the `sd.InputStream` read/start/stop/close interface; by default
+        `audio_source.input_stream` (the microphone, or the AUDIO_REPLAY
+        files) is opened when the pipeline starts. When a `segmenter` (see
+        vad.VadSegmenter) is given, chunks are cut on silence instead of every
+        `chunk_duration` seconds and silent chunks are never transcribed.
+        """
+        self.transcribe = transcribe
+        self.fs = fs
+        self.chunk_frames = int(chunk_duration * fs)
+        self.block_frames = max(1, fs // 10)
+        self.stream = stream
+        self.segmenter = segmenter
+        self.workers = workers
+        self.chunks = queue.Queue(maxsize=max_chunks)
+        self.transcripts = queue.Queue()
+        self.overflows = 0
+        self.error = None  # exception that ended the capture thread
+        self._stop = threading.Event()
+        self._stopped = False
+        self._capture_thread = None
+        self._worker_threads = []
+
+    def start(self):
+        """Open the input stream and start the capture and worker threads."""
+        if self.stream is None:
+            self.stream = input_stream(samplerate=self.fs, channels=1, dtype="int16")
+        self.stream.start()
+
+        self._capture_thread = threading.Thread(
+            target=context_run(self._capture), name="whisper-capture", daemon=True)
+        self._capture_thread.start()
+        for i in range(self.workers):
+            worker = threading.Thread(
+                target=context_run(self._work), name=f"whisper-worker-{i}", daemon=True)
+            worker.start()
+            self._worker_threads.append(worker)
+
+    def stop(self):
+        """Stop capturing and drop chunks that have not been picked up yet."""
+        if self._stopped:
+            return
+        self._stopped = True
+        self._stop.set()
+        if self._capture_thread is not None:
+            self._capture_thread.join()
+        if self.stream is not None:
+            try:
+                self.stream.stop()
+                self.stream.close()
+            except Exception:
+                if self.error is None:
+                    raise  # after a capture error the stream may not close cleanly
+
+        # Anything still queued was recorded after the caller decided to stop;
+        # after a capture error it was recorded before it, so it is kept.
+        if self.error is None:
+            try:
+                while True:
+                    self.chunks.get_nowait()
+            except queue.Empty:
+                pass
+        for _ in self._worker_threads:
+            self.chunks.put(_STOP)
+
+    def results(self):
+        """Yield (transcript, error) for each chunk in the order it was recorded.
+
+        Runs until the pipeline is stopped and every in-flight chunk is done,
+        then raises the capture thread's exception if it failed.
+        """
+        waiting = {}
+        next_seq = 0
+        while True:
+            while next_seq in waiting:
+                yield waiting.pop(next_seq)
+                next_seq += 1
+            try:
+                seq, transcript, error = self.transcripts.get(timeout=0.1)
+            except queue.Empty:
+                if self.error is not None:
+                    self.stop()  # lets the workers finish what was recorded and exit
+                workers_done = not any(t.is_alive() for t in self._worker_threads)
+                if self._stop.is_set() and workers_done and self.transcripts.empty():
+                    if self.error is not None:
+                        raise self.error
+                    return
+                continue
+            waiting[seq] = (transcript, error)
+
+    def _capture(self):
+        """Run the capture loop; a failure is kept for `results()` and stops the pipeline."""
+        try:
+            if self.segmenter is not None:
+                self._capture_segments()
+            else:
+                self._capture_chunks()
+        except Exception as e:
+            self.error = e
+            self._stop.set()
+
+    def _capture_chunks(self):
+        """Read the stream in short blocks and queue each finished chunk."""
+        seq = 0
+        while not self._stop.is_set():
+            recording = np.empty((self.chunk_frames, 1), dtype=np.int16)
+            filled = 0
+            while filled < self.chunk_frames and not self._stop.is_set():
+                frames = min(self.block_frames, self.chunk_frames - filled)
+                recording[filled:filled + frames] = self._read(frames)
+                filled += frames
+            if filled < self.chunk_frames:
+                break
+            self._queue(seq, recording)
+            seq += 1
+
+    def _capture_segments(self):
+        """Feed the stream to the segmenter and queue each speech segment."""
+        seq = 0
+        while not self._stop.is_set():
+            for segment in self.segmenter.feed(self._read(self.block_frames)):
+                self._queue(seq, segment)
+                seq += 1
+
+    def _read(self, frames):
+        with span("capture.read"):
+            data, overflowed = self.stream.read(frames)
+        if overflowed:
+            self.overflows += 1
+        return data
+
+    def _queue(self, seq, recording):
+        """Queue a chunk, blocking (backpressure) while every slot is taken."""
+        while not self._stop.is_set():
+            try:
+                self.chunks.put((seq, recording), timeout=0.1)
+                return
+            except queue.Full:
+                continue
+
+    def _work(self):
+        """Transcribe queued chunks until told to stop."""
+        while True:
+            item = self.chunks.get()
+            if item is _STOP:
+                return
+            seq, recording = item
+            try:
+                self.transcripts.put((seq, self.transcribe(recording, self.fs), None))
+            except Exception as e:
+                self.transcripts.put((seq, "", e))